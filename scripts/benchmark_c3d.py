@@ -0,0 +1,122 @@
+import argparse
+import os
+import StringIO
+import sys
+import tempfile
+import timeit
+import xml.etree.cElementTree as et
+
+import c3d
+import numpy as np
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
+import django
+django.setup()
+
+from dataset.models import MotionFile
+from dataset import motionformat
+from dataset.management.commands.importmotions import parse_motion, pose_matrix, SUPPORTED_MARKER_NAMES
+
+
+def baseline_parse_motion(c3d_data, mmm_data, downsample_factor, marker_set):
+    # Mirrors how importmotions used to parse motions: every frame is decoded, including the analog channels, every
+    # `downsample_factor`-th frame is kept and every marker is transformed separately. The interval is truncated to
+    # whole milliseconds, so for e.g. 120 fps the kept frames are 16.7 ms apart but played back every 16 ms.
+    c3d_reader = c3d.Reader(StringIO.StringIO(c3d_data))
+    xml_root = et.fromstring(mmm_data)
+    pose_pos = [float(x) for x in xml_root.find('./Motion/MotionFrames/MotionFrame/RootPosition').text.split(' ')]
+    pose_rot = [float(x) for x in xml_root.find('./Motion/MotionFrames/MotionFrame/RootRotation').text.split(' ')]
+    xml_timesteps = xml_root.findall('./Motion/MotionFrames/MotionFrame/Timestep')
+    step0 = float(xml_timesteps[0].text)
+    step1 = float(xml_timesteps[1].text)
+    fps = np.round(1. / (step1 - step0))
+    if fps / downsample_factor <= 40.:
+        downsample_factor = 1.
+    interval = int((step1 - step0) * 1000. * float(downsample_factor))
+
+    marker_names = [marker.rstrip().split(':')[-1] for marker in c3d_reader.point_labels]
+    supported_indexes = [idx for idx, name in enumerate(marker_names) if name in SUPPORTED_MARKER_NAMES[marker_set]]
+    markers = [marker_names[idx] for idx in supported_indexes]
+
+    frames = []
+    for idx, points, _ in c3d_reader.read_frames():
+        frames.append(points[supported_indexes, 0:3].flatten())
+    frames = np.array(frames)[::downsample_factor, :]
+
+    n_frames = len(frames)
+    pose_inv = np.linalg.inv(pose_matrix([pose_pos[0], pose_pos[1], 0.], [0., 0., pose_rot[2]]))
+    for i in xrange(len(markers)):
+        start_idx = i * 3
+        pos = np.hstack([frames[:, start_idx:start_idx + 3], np.ones((n_frames, 1))])
+        frames[:, start_idx:start_idx + 3] = np.dot(pose_inv, pos.T).T[:, 0:3]
+    frames /= 100.
+    return markers, frames, interval
+
+
+def synthetic_motion(marker_set, n_frames, fps):
+    # The c3d module can only write float point data without analog channels and names the markers M000, M001 and
+    # so on, so the labels are replaced afterwards.
+    names = SUPPORTED_MARKER_NAMES[marker_set]
+    writer = c3d.Writer(point_rate=float(fps))
+    offsets = np.random.uniform(-50., 50., size=(len(names), 1))
+    t = np.arange(n_frames) / float(fps)
+    for i in xrange(n_frames):
+        points = np.zeros((len(names), 5), dtype='float32')
+        points[:, 0:3] = offsets + 20. * np.sin(t[i] + np.arange(3))
+        writer.add_frames([(points, np.zeros((0, 0)))])
+    handle, path = tempfile.mkstemp(suffix='.c3d')
+    os.close(handle)
+    try:
+        with open(path, 'wb') as f:
+            writer.write(f)
+        with open(path, 'rb') as f:
+            c3d_data = f.read()
+    finally:
+        os.remove(path)
+    labels = ''.join('M%03d ' % i for i in xrange(len(names)))
+    c3d_data = c3d_data.replace(labels, ''.join('{:<5}'.format(name) for name in names))
+
+    mmm_data = '''<MMM><Motion><MotionFrames>
+        <MotionFrame><RootPosition>120 -35 950</RootPosition><RootRotation>0 0 0.7</RootRotation><Timestep>0</Timestep></MotionFrame>
+        <MotionFrame><RootPosition>120 -35 950</RootPosition><RootRotation>0 0 0.7</RootRotation><Timestep>{}</Timestep></MotionFrame>
+        </MotionFrames></Motion></MMM>'''.format(1. / fps)
+    return c3d_data, mmm_data
+
+
+def main(args):
+    motions = []
+    for marker_set, files in [(MotionFile.MARKER_SET_KIT, args.kit), (MotionFile.MARKER_SET_CMU, args.cmu)]:
+        for c3d_path, mmm_path in files or []:
+            with open(c3d_path, 'rb') as f:
+                c3d_data = f.read()
+            with open(mmm_path, 'r') as f:
+                mmm_data = f.read()
+            motions.append((os.path.basename(c3d_path), marker_set, c3d_data, mmm_data))
+    if len(motions) == 0:
+        print('no motions given, using synthetic ones')
+        motions.append(('synthetic kit', MotionFile.MARKER_SET_KIT) + synthetic_motion(MotionFile.MARKER_SET_KIT, args.frames, 100))
+        motions.append(('synthetic cmu', MotionFile.MARKER_SET_CMU) + synthetic_motion(MotionFile.MARKER_SET_CMU, args.frames, 120))
+
+    rows = []
+    for name, marker_set, c3d_data, mmm_data in motions:
+        markers, frames, interval = parse_motion(c3d_data, mmm_data, args.downsample_factor, marker_set)
+        _, baseline_frames, _ = baseline_parse_motion(c3d_data, mmm_data, args.downsample_factor, marker_set)
+        baseline_time = timeit.timeit(lambda: baseline_parse_motion(c3d_data, mmm_data, args.downsample_factor, marker_set), number=args.repeat) / args.repeat
+        vectorized_time = timeit.timeit(lambda: parse_motion(c3d_data, mmm_data, args.downsample_factor, marker_set), number=args.repeat) / args.repeat
+        # The vectorized parsing resamples the motion at the interval instead of keeping every n-th frame, so the
+        # frames can only be compared if there are as many.
+        max_error = motionformat.max_error(baseline_frames, frames) * 1e3 if len(baseline_frames) == len(frames) else None
+        rows.append([name, len(baseline_frames), len(frames), len(markers), baseline_time * 1e3, vectorized_time * 1e3, baseline_time / vectorized_time, max_error])
+    print(tabulate(rows, headers=['motion', 'baseline frames', 'frames', 'markers', 'baseline (ms)', 'vectorized (ms)', 'speedup', 'max error (mm)'], floatfmt='.2f'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares the old and the vectorized C3D parsing of importmotions.')
+    parser.add_argument('--kit', nargs=2, action='append', metavar=('C3D', 'MMM'), help='a KIT motion as C3D and MMM file')
+    parser.add_argument('--cmu', nargs=2, action='append', metavar=('C3D', 'MMM'), help='a CMU motion as C3D and MMM file')
+    parser.add_argument('--downsample-factor', type=int, default=2)
+    parser.add_argument('--frames', type=int, default=3000, help='number of frames of the synthetic motions')
+    parser.add_argument('--repeat', type=int, default=5)
+    main(parser.parse_args())
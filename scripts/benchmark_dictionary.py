@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import timeit
+
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from dataset.models import Annotation
+from dataset.dictionary import load_dictionary
+
+
+SAMPLE_DESCRIPTIONS = [
+    'A human performs a jump to the left.',
+    'Someone jumps to the left.',
+    'A person jumps approximately 10 centimeters to the left.',
+    'A person walks forward, turns around and walks back.',
+    'The subject waves with his right hand.',
+    'a persn wlks slowely in a circel',
+    'asdf qwer yxcv',
+]
+
+
+def main(args):
+    if args.from_db:
+        descriptions = list(Annotation.objects.values_list('description', flat=True)[:args.limit])
+    else:
+        descriptions = SAMPLE_DESCRIPTIONS
+    annotations = [Annotation(description=d) for d in descriptions]
+
+    backends = {
+        'enchant': {'BACKEND': 'dataset.dictionary.EnchantDictionary'},
+        'word index': settings.ANNOTATION_DICTIONARY,
+    }
+    rows = []
+    verdicts = {}
+    for name in args.backends:
+        config = backends[name]
+        load_time = timeit.timeit(lambda: load_dictionary(config), number=1)
+        dictionary = load_dictionary(config)
+        verdicts[name] = [a.is_valid(dictionary) for a in annotations]
+        n_validations = len(annotations) * args.repeat
+        validation_time = timeit.timeit(lambda: [a.is_valid(dictionary) for a in annotations], number=args.repeat)
+        rows.append([name, load_time * 1e3, n_validations / validation_time])
+    print(tabulate(rows, headers=['backend', 'load (ms)', 'validations per second'], floatfmt='.1f'))
+
+    if len(verdicts) == 2:
+        a, b = verdicts.values()
+        print('')
+        print('{} of {} descriptions are judged differently'.format(sum(x != y for x, y in zip(a, b)), len(annotations)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the dictionary backends used to validate annotations.')
+    parser.add_argument('--backends', nargs='+', choices=['enchant', 'word index'], default=['enchant', 'word index'])
+    parser.add_argument('--from-db', action='store_true', help='use the stored annotations instead of sample descriptions')
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=100)
+    main(parser.parse_args())
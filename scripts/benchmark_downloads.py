@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from dataset.management.util import connect_directly, fetch_motions, read_file
+from dataset.management.downloads import DownloadScheduler, download_motion_files
+
+
+def select_pairs(motion, files):
+    # Like importmotions.select_files, but without looking at the database of this tool.
+    mmm_files = dict((f.originatedFrom.id, f) for f in files if f.fileType == 'Converted MMM Motion' and f.originatedFrom is not None)
+    return [(f, mmm_files[f.id]) for f in files if f.fileType == 'Vicon C3D File' and f.id in mmm_files]
+
+
+def download_sequentially(db, motions):
+    # Mirrors how importmotions used to download files: one call after the other.
+    size = 0
+    for motion in motions:
+        files = db.listFiles(motion.id)
+        for c3d_file, mmm_file in select_pairs(motion, files):
+            for f in (mmm_file, c3d_file):
+                reader = db.getFileReader(f.id)
+                size += len(read_file(reader))
+                reader.destroy()
+    return size
+
+
+def download_scheduled(db, motions, max_open_files, lookahead):
+    scheduler = DownloadScheduler(db, max_open_files=max_open_files)
+    size = 0
+    for motion, downloaded_files, error in download_motion_files(scheduler, motions, select_pairs, lookahead=lookahead):
+        if error is not None:
+            raise error
+        size += sum(len(c3d_data) + len(mmm_data) for _, c3d_data, mmm_data in downloaded_files)
+    return size
+
+
+def main(args):
+    db = connect_directly(args.proxy)
+    try:
+        motions = fetch_motions(db)[:args.limit]
+
+        rows = []
+        runs = [('sequential', lambda: download_sequentially(db, motions))]
+        for max_open_files in args.max_open_files:
+            runs.append(('scheduled, {} open files'.format(max_open_files), lambda n=max_open_files: download_scheduled(db, motions, n, args.lookahead)))
+        for name, run in runs:
+            start = time.time()
+            size = run()
+            duration = time.time() - start
+            rows.append([name, len(motions), size / 1e6, duration, size / 1e6 / duration])
+    finally:
+        db.ice_getCommunicator().destroy()
+    print(tabulate(rows, headers=['download', 'motions', 'MB', 'time (s)', 'MB/s'], floatfmt='.2f'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares sequential and scheduled downloads from the motion database, e.g. from scripts/fake_motiondb.py.')
+    parser.add_argument('--proxy', default='MotionDatabase:tcp -h 127.0.0.1 -p 10000')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--max-open-files', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--lookahead', type=int, default=8)
+    main(parser.parse_args())
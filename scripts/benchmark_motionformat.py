@@ -0,0 +1,40 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from dataset import motionformat
+
+
+DEFAULT_MOTIONS_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'dataset', 'static', 'motions')
+
+
+def main(args):
+    paths = args.files or sorted(glob.glob(os.path.join(DEFAULT_MOTIONS_PATH, '*.json')))[:args.limit]
+    if len(paths) == 0:
+        print('no JSON motions found')
+        return
+
+    json_blobs = [open(path, 'r').read() for path in paths]
+    motions = [json.loads(blob) for blob in json_blobs]
+    binary_blobs = [motionformat.dumps(m['markers'], m['frames'], m['interval'], m.get('marker_set', 'kit')) for m in motions]
+
+    rows = []
+    for name, blobs, decode in [('json', json_blobs, json.loads), ('binary', binary_blobs, motionformat.loads)]:
+        size = sum(len(blob) for blob in blobs)
+        decode_time = timeit.timeit(lambda: [decode(blob) for blob in blobs], number=args.repeat) / args.repeat
+        rows.append([name, size / 1e6, size / 1e3 / len(blobs), decode_time * 1e3 / len(blobs)])
+    print(tabulate(rows, headers=['format', 'total (MB)', 'per motion (kB)', 'decode per motion (ms)'], floatfmt='.2f'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares the size and decoding time of JSON and binary motions.')
+    parser.add_argument('files', nargs='*', help='JSON motion files (default: the motions in dataset/static/motions)')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    main(parser.parse_args())
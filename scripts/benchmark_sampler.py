@@ -0,0 +1,60 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from dataset.structures import SortedIntArray, WeightedIndex
+
+
+def baseline_draw(values, annotated, skip_id):
+    # Mirrors the perplexity-based sampling that views.index used to perform on every request, without the
+    # time spent in the database.
+    ids = [v[0] for v in values if v[0] != skip_id and v[0] not in annotated]
+    perplexities = np.array([v[1] for v in values if v[0] != skip_id and v[0] not in annotated])
+    probabilities = perplexities / np.sum(perplexities)
+    return np.random.choice(ids, p=probabilities)
+
+
+def benchmark(n_motions, n_annotated, repeat):
+    ids = np.random.permutation(n_motions * 2)[:n_motions] + 1
+    perplexities = np.random.lognormal(mean=3., sigma=1., size=n_motions)
+    values = list(zip(ids.tolist(), perplexities.tolist()))
+    annotated_ids = np.random.choice(ids, size=n_annotated, replace=False)
+    annotated_set = set(annotated_ids.tolist())
+    annotated = SortedIntArray(annotated_ids)
+    skip_id = int(ids[0])
+
+    baseline_time = timeit.timeit(lambda: baseline_draw(values, annotated_set, skip_id), number=repeat) / repeat
+    build_time = timeit.timeit(lambda: WeightedIndex(values), number=1)
+    index = WeightedIndex(values)
+    draw_time = timeit.timeit(lambda: index.sample(annotated), number=repeat * 100) / (repeat * 100)
+    keys = ids.tolist()
+    update_time = timeit.timeit(lambda: index.__setitem__(random.choice(keys), random.uniform(1., 100.)), number=repeat * 100) / (repeat * 100)
+
+    # Fraction of the total weight carried by the motions the user has already annotated.
+    excluded_weight = sum(index[key] for key in annotated if key in index) / index.total()
+    return [n_motions, n_annotated, baseline_time * 1e3, build_time * 1e3, draw_time * 1e6, update_time * 1e6,
+            baseline_time / draw_time, excluded_weight]
+
+
+def main(args):
+    rows = []
+    for n_motions in args.motions:
+        n_annotated = min(n_motions - 1, int(n_motions * args.annotated_fraction))
+        rows.append(benchmark(n_motions, n_annotated, args.repeat))
+    headers = ['motions', 'annotated by user', 'baseline draw (ms)', 'build (ms)', 'draw (us)', 'update (us)',
+               'speedup', 'excluded weight']
+    print(tabulate(rows, headers=headers, floatfmt='.3f'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks perplexity-based motion sampling.')
+    parser.add_argument('--motions', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--annotated-fraction', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=10)
+    main(parser.parse_args())
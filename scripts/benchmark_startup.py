@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+
+from tabulate import tabulate
+
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+MODULES = [
+    'dataset.models',
+    'dataset.views',
+    'dataset.auth',
+    'dataset.management.commands.importmotions',
+    'dataset.management.commands.exportdataset',
+    'dataset.management.commands.removenonpublicmotions',
+    'dataset.management.commands.updateperplexity',
+    'proj.wsgi',
+]
+
+# Every measurement runs in a fresh interpreter so that nothing is cached from a previous import.
+MEASURE_IMPORT = '''
+import os, sys, time
+sys.path.insert(0, {src_path!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proj.settings')
+start = time.time()
+import django
+django.setup()
+setup_done = time.time()
+__import__({module!r})
+import_done = time.time()
+if {preload!r}:
+    from dataset.preload import preload
+    preload()
+print('%f %f %f' % (setup_done - start, import_done - setup_done, time.time() - import_done))
+'''
+
+
+def measure(module, preload, repeat):
+    timings = []
+    for _ in range(repeat):
+        code = MEASURE_IMPORT.format(src_path=SRC_PATH, module=module, preload=preload)
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=SRC_PATH)
+        timings.append([float(x) for x in output.decode('utf-8').strip().split('\n')[-1].split(' ')])
+    timings.sort(key=lambda t: t[1])
+    return timings[len(timings) // 2]  # median by import time
+
+
+def main(args):
+    rows = []
+    for module in args.modules:
+        setup_time, import_time, preload_time = measure(module, args.preload, args.repeat)
+        row = [module, setup_time * 1e3, import_time * 1e3]
+        if args.preload:
+            row.append(preload_time * 1e3)
+        rows.append(row)
+    headers = ['module', 'django.setup() (ms)', 'import (ms)']
+    if args.preload:
+        headers.append('preload (ms)')
+    print(tabulate(rows, headers=headers, floatfmt='.1f'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reports the import time of the modules that are loaded on startup.')
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--preload', action='store_true', help='also measure dataset.preload.preload()')
+    main(parser.parse_args())
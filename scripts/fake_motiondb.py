@@ -0,0 +1,159 @@
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+
+import Ice
+
+SLICE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'dataset', 'management', 'commands', 'MotionDatabase.ice'))
+Ice.loadSlice('-I%s %s' % (Ice.getSliceDir(), SLICE_PATH))
+import MotionDatabase
+
+
+class FileReaderI(MotionDatabase.FileReader):
+    def __init__(self, server, data):
+        self.server = server
+        self.data = data
+        self.position = 0
+
+    def destroy(self, current=None):
+        self.server.close_reader(current)
+
+    def getSize(self, current=None):
+        self.server.wait()
+        return len(self.data)
+
+    def readChunk(self, length, current=None):
+        self.server.wait()
+        chunk = self.data[self.position:self.position + length]
+        self.position += len(chunk)
+        return chunk
+
+    def seek(self, pos, current=None):
+        self.position = pos
+
+
+class MotionDatabaseSessionI(MotionDatabase.MotionDatabaseSession):
+    """Serves the same few C3D and MMM files for any number of motions, with a fixed delay for every call.
+
+    The delay stands in for the round-trip time to the real database, which dominates the time it takes to import
+    motions. Like the real database, only a limited number of files can be open at once.
+    """
+
+    def __init__(self, pairs, n_motions, latency, max_open_files):
+        self.latency = latency
+        self.max_open_files = max_open_files
+        self.open_files = 0
+        self.lock = threading.Lock()
+        self.contents = {}
+        self.files = {}
+        self.motions = []
+        kit = MotionDatabase.Institution(1, 'KIT', 'Karlsruhe Institute of Technology')
+        for motion_id in xrange(1, n_motions + 1):
+            self.motions.append(MotionDatabase.Motion(id=motion_id, associatedInstitution=kit, associatedSubjects=[], associatedObjects=[]))
+            self.files[motion_id] = []
+            for name, c3d_data, mmm_data in pairs:
+                c3d_file = self.add_file(motion_id, name + '.c3d', 'Vicon C3D File', c3d_data)
+                self.add_file(motion_id, name + '.xml', 'Converted MMM Motion', mmm_data, originated_from=c3d_file)
+
+    def add_file(self, motion_id, name, file_type, data, originated_from=None):
+        file_id = len(self.contents) + 1
+        self.contents[file_id] = data
+        f = MotionDatabase.File(id=file_id, fileName=name, fileType=file_type, attachedToId=motion_id,
+                                visibility=MotionDatabase.VisibilityLevel.Public, originatedFrom=originated_from)
+        self.files[motion_id].append(f)
+        return f
+
+    def wait(self):
+        time.sleep(self.latency)
+
+    def close_reader(self, current):
+        current.adapter.remove(current.id)
+        with self.lock:
+            self.open_files -= 1
+
+    def pingServer(self, echo_string, current=None):
+        return echo_string
+
+    def countMotions(self, filter_description, filter_project, filter_institution, filter_subject, filter_object, search_term, current=None):
+        self.wait()
+        return len(self.motions)
+
+    def listMotions(self, filter_description, filter_project, filter_institution, filter_subject, filter_object, search_term, sort_field, limit, offset, current=None):
+        self.wait()
+        return self.motions[offset:offset + limit]
+
+    def listFiles(self, database_object_id, current=None):
+        self.wait()
+        return self.files.get(database_object_id, [])
+
+    def getFileReader(self, file_id, current=None):
+        self.wait()
+        with self.lock:
+            if self.open_files >= self.max_open_files:
+                raise MotionDatabase.TooManyOpenFilesException()
+            self.open_files += 1
+        reader = FileReaderI(self, self.contents[file_id])
+        return MotionDatabase.FileReaderPrx.uncheckedCast(current.adapter.addWithUUID(reader))
+
+    def destroy(self, current=None):
+        pass
+
+
+def load_pairs(path):
+    pairs = []
+    for c3d_path in sorted(glob.glob(os.path.join(path, '*.c3d'))):
+        name = os.path.splitext(os.path.basename(c3d_path))[0]
+        mmm_path = os.path.splitext(c3d_path)[0] + '.xml'
+        if not os.path.exists(mmm_path):
+            continue
+        with open(c3d_path, 'rb') as f:
+            c3d_data = f.read()
+        with open(mmm_path, 'r') as f:
+            mmm_data = f.read()
+        pairs.append((name, c3d_data, mmm_data))
+    return pairs
+
+
+def main(args):
+    if args.data is not None:
+        pairs = load_pairs(args.data)
+    else:
+        from benchmark_c3d import synthetic_motion
+        from dataset.models import MotionFile
+        pairs = [('synthetic',) + synthetic_motion(MotionFile.MARKER_SET_KIT, args.frames, 100)]
+    if len(pairs) == 0:
+        print('no C3D files with matching MMM files found')
+        return
+
+    properties = Ice.createProperties(sys.argv)
+    properties.setProperty('Ice.ThreadPool.Server.Size', str(args.threads))
+    properties.setProperty('Ice.ThreadPool.Server.SizeMax', str(args.threads))
+    properties.setProperty('Ice.MessageSizeMax', '65536')
+    init_data = Ice.InitializationData()
+    init_data.properties = properties
+    ic = Ice.initialize(init_data)
+    try:
+        adapter = ic.createObjectAdapterWithEndpoints('MotionDatabase', args.endpoints)
+        session = MotionDatabaseSessionI(pairs, args.motions, args.latency / 1000., args.max_open_files)
+        proxy = adapter.add(session, ic.stringToIdentity('MotionDatabase'))
+        adapter.activate()
+        print('Serving {} motions with {} files each, use:'.format(args.motions, 2 * len(pairs)))
+        print('  python manage.py importmotions --proxy "{}"'.format(ic.proxyToString(proxy)))
+        ic.waitForShutdown()
+    finally:
+        ic.destroy()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='A local stand-in for the KIT motion database to measure imports offline.')
+    parser.add_argument('--data', default=None, help='directory with C3D files and MMM files of the same name (default: a synthetic motion)')
+    parser.add_argument('--motions', type=int, default=50)
+    parser.add_argument('--frames', type=int, default=1000, help='number of frames of the synthetic motion')
+    parser.add_argument('--latency', type=float, default=50., help='delay of every call in milliseconds')
+    parser.add_argument('--max-open-files', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--endpoints', default='tcp -h 127.0.0.1 -p 10000')
+    main(parser.parse_args())
@@ -0,0 +1,3 @@
+#!/bin/bash
+source ~/dataset-web/bin/activate
+python ~/dataset-web/src/manage.py updatestatistics &> /dev/null
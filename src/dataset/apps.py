@@ -5,3 +5,12 @@ from django.apps import AppConfig
 
 class DatasetConfig(AppConfig):
     name = 'dataset'
+
+    def ready(self):
+        # Connect signal handlers.
+        from . import signals
+
+        # Make sure that the configured dictionary can be loaded.
+        from django.core.checks import register
+        from .dictionary import check_dictionary
+        register(check_dictionary)
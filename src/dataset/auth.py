@@ -1,22 +1,34 @@
 from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-import logging, requests
+import logging
 
 
 access_logger = logging.getLogger('motiondb_access')
 logger = logging.getLogger(__name__)
 
-# TODO: Using PyOpenSSL is necessary to work around problems in ssl module of Python < 2.7.9. Later, this can be removed again.
-#       (see https://urllib3.readthedocs.org/en/latest/security.html#insecureplatformwarning)
-import urllib3.contrib.pyopenssl
-urllib3.contrib.pyopenssl.inject_into_urllib3()
+_is_pyopenssl_injected = False
+
+
+def inject_pyopenssl():
+    # TODO: Using PyOpenSSL is necessary to work around problems in ssl module of Python < 2.7.9. Later, this can be removed again.
+    #       (see https://urllib3.readthedocs.org/en/latest/security.html#insecureplatformwarning)
+    # This module is imported on every request to look up the session's user, so only pay for it once it's needed.
+    global _is_pyopenssl_injected
+    if not _is_pyopenssl_injected:
+        import urllib3.contrib.pyopenssl
+        urllib3.contrib.pyopenssl.inject_into_urllib3()
+        _is_pyopenssl_injected = True
+
 
 class RedmineBackend(ModelBackend):
     def authenticate(self, username=None, password=None):
         if not username or not password:
             return None
 
+        inject_pyopenssl()
+        import requests
+
         access_logger.debug('Attempting Redmine login for username "%s"...' % username)
         result = requests.get(settings.REDMINE_AUTH_REST_URL, auth=(username, password), verify=True)
 
@@ -0,0 +1,110 @@
+import gzip
+import os
+import StringIO
+from tempfile import NamedTemporaryFile
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+
+# Content codings of the precompressed variants and their file extensions, in order of preference.
+VARIANTS = [
+	('br', '.br'),
+	('gzip', '.gz'),
+]
+
+
+def compress_gzip(data):
+	buf = StringIO.StringIO()
+	# Use a fixed modification time so that the output only depends on the input.
+	with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as f:
+		f.write(data)
+	return buf.getvalue()
+
+
+def compress_brotli(data):
+	return brotli.compress(data, quality=11)
+
+
+def write_atomically(path, data):
+	# The file might be served while it is being replaced.
+	directory = os.path.dirname(os.path.abspath(path))
+	with NamedTemporaryFile(dir=directory, delete=False) as f:
+		f.write(data)
+		tmp_path = f.name
+	os.chmod(tmp_path, 0o644)
+	os.rename(tmp_path, path)
+
+
+def write_compressed_variants(path, data=None):
+	"""Writes the gzip and, if the brotli module is installed, brotli compressed variants of the file next to it.
+
+	Both are compressed at the highest level, since this only happens once per file. Returns the paths of the
+	written variants.
+	"""
+	if data is None:
+		with open(path, 'rb') as f:
+			data = f.read()
+	compressors = {'gzip': compress_gzip}
+	if brotli is not None:
+		compressors['br'] = compress_brotli
+	paths = []
+	for encoding, extension in VARIANTS:
+		if encoding not in compressors:
+			continue
+		write_atomically(path + extension, compressors[encoding](data))
+		paths.append(path + extension)
+	return paths
+
+
+def remove_compressed_variants(path):
+	for _, extension in VARIANTS:
+		if os.path.exists(path + extension):
+			os.remove(path + extension)
+
+
+def has_compressed_variants(path):
+	# Variants are out-of-date if the file has been modified after they were written.
+	mtime = os.path.getmtime(path)
+	for encoding, extension in VARIANTS:
+		if encoding == 'br' and brotli is None:
+			continue
+		variant_path = path + extension
+		if not os.path.exists(variant_path) or os.path.getmtime(variant_path) < mtime:
+			return False
+	return True
+
+
+def parse_accept_encoding(header):
+	# Returns the quality value of every content coding, e.g. {'gzip': 1.0, 'br': 0.5}.
+	qualities = {}
+	for item in header.split(','):
+		parts = item.strip().split(';')
+		coding = parts[0].strip().lower()
+		if not coding:
+			continue
+		quality = 1.
+		for param in parts[1:]:
+			name, _, value = param.strip().partition('=')
+			if name.strip() == 'q':
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.
+		qualities[coding] = quality
+	return qualities
+
+
+def select_variant(path, accept_encoding):
+	"""Selects the smallest variant of the file that the client accepts.
+
+	Returns the path of the variant and its content coding, which is None for the file itself.
+	"""
+	qualities = parse_accept_encoding(accept_encoding or '')
+	for encoding, extension in VARIANTS:
+		quality = qualities.get(encoding, qualities.get('*', 0.))
+		if quality > 0. and os.path.exists(path + extension):
+			return path + extension, encoding
+	return path, None
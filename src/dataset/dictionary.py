@@ -0,0 +1,282 @@
+import io
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+WORD_INDEX_MAGIC = b'MATWORDS'
+WORD_INDEX_VERSION = 1
+WORD_INDEX_HEADER = struct.Struct('<8sIII')  # magic, version, number of words, number of slots
+WORD_INDEX_SLOT = struct.Struct('<I')
+WORD_INDEX_LENGTH = struct.Struct('<H')
+
+
+def tokenize(text):
+	# Follows the rules of enchant's English tokenizer: a word is a run of alphabetic characters that may contain
+	# apostrophes, but does not end with one.
+	offset = 0
+	n = len(text)
+	while offset < n:
+		while offset < n and not text[offset].isalpha():
+			offset += 1
+		start = offset
+		while offset < n and (text[offset].isalpha() or text[offset] == '\''):
+			offset += 1
+		end = offset
+		while end > start and text[end - 1] == '\'':
+			end -= 1
+		if end > start:
+			yield (text[start:end], start)
+
+
+class EnchantDictionary(object):
+	def __init__(self, tag='en_US'):
+		from enchant import Dict
+		from enchant.tokenize import get_tokenizer
+		self.dictionary = Dict(tag)
+		self.tokenizer = get_tokenizer(tag)
+
+	def tokenize(self, text):
+		return self.tokenizer(text)
+
+	def check(self, word):
+		return self.dictionary.check(word)
+
+
+class WordIndexDictionary(object):
+	"""Frozen set of words stored as an open-addressing hash table that is memory-mapped from disk.
+
+	The index is created by the `builddictionary` command. Since the file is mapped read-only, all worker processes
+	share the same pages and loading it does not depend on the size of the word list. Looking up a word usually
+	touches a single slot.
+	"""
+
+	def __init__(self, path):
+		if not os.path.exists(path):
+			raise ImproperlyConfigured(missing_word_index_message(path))
+		with open(path, 'rb') as f:
+			self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, version, self.n_words, self.n_slots = WORD_INDEX_HEADER.unpack_from(self.data, 0)
+		if magic != WORD_INDEX_MAGIC or version != WORD_INDEX_VERSION:
+			raise ValueError('"{}" is not a word index'.format(path))
+		self.mask = self.n_slots - 1
+		self.slots_start = WORD_INDEX_HEADER.size
+		self.words_start = self.slots_start + self.n_slots * WORD_INDEX_SLOT.size
+
+	def __len__(self):
+		return self.n_words
+
+	def __contains__(self, word):
+		key = word.encode('utf-8')
+		slot = word_hash(key) & self.mask
+		while True:
+			offset = WORD_INDEX_SLOT.unpack_from(self.data, self.slots_start + slot * WORD_INDEX_SLOT.size)[0]
+			if offset == 0:
+				return False
+			start = self.words_start + offset - 1
+			length = WORD_INDEX_LENGTH.unpack_from(self.data, start)[0]
+			start += WORD_INDEX_LENGTH.size
+			if length == len(key) and self.data[start:start + length] == key:
+				return True
+			slot = (slot + 1) & self.mask
+
+	def tokenize(self, text):
+		return tokenize(text)
+
+	def check(self, word):
+		if word in self:
+			return True
+		# Like hunspell, accept capitalized or upper-case spellings of lower-case words.
+		return word != word.lower() and word.lower() in self
+
+
+def missing_word_index_message(path):
+	return 'The word index "{}" does not exist, run `python manage.py builddictionary` to create it.'.format(path)
+
+
+def word_hash(key):
+	return zlib.crc32(key) & 0xffffffff
+
+
+def write_word_index(words, path):
+	encoded_words = sorted(set(w.encode('utf-8') for w in words))
+	n_slots = 8
+	while n_slots < 2 * len(encoded_words):
+		n_slots *= 2
+	mask = n_slots - 1
+
+	# Slots store the offset of the word (plus one, so that zero marks an empty slot); collisions are resolved by
+	# linear probing.
+	slots = [0] * n_slots
+	chunks = []
+	offset = 0
+	for key in encoded_words:
+		slot = word_hash(key) & mask
+		while slots[slot] != 0:
+			slot = (slot + 1) & mask
+		slots[slot] = offset + 1
+		chunks.append(WORD_INDEX_LENGTH.pack(len(key)))
+		chunks.append(key)
+		offset += WORD_INDEX_LENGTH.size + len(key)
+
+	# Write to a temporary file first and then replace the index atomically, since running processes might have
+	# the old index mapped.
+	directory = os.path.dirname(os.path.abspath(path))
+	with NamedTemporaryFile(dir=directory, delete=False) as f:
+		f.write(WORD_INDEX_HEADER.pack(WORD_INDEX_MAGIC, WORD_INDEX_VERSION, len(encoded_words), n_slots))
+		f.write(b''.join(WORD_INDEX_SLOT.pack(slot) for slot in slots))
+		f.write(b''.join(chunks))
+		tmp_path = f.name
+	os.chmod(tmp_path, 0o644)
+	os.rename(tmp_path, path)
+	return len(encoded_words)
+
+
+class Affix(object):
+	def __init__(self, kind, flag, cross_product, strip, add, continuation_flags, condition):
+		self.kind = kind
+		self.flag = flag
+		self.cross_product = cross_product
+		self.strip = strip
+		self.add = add
+		self.continuation_flags = continuation_flags
+		# Conditions are a sequence of characters and character classes like in regular expressions.
+		condition = ''.join(c if c in '[]^' else re.escape(c) for c in condition) if condition != '.' else ''
+		self.condition = re.compile('^' + condition if kind == 'PFX' else condition + '$', re.UNICODE)
+
+	def apply(self, word):
+		# Returns the affixed word or None if the affix does not apply to the word.
+		if not self.condition.search(word):
+			return None
+		if self.kind == 'PFX':
+			if not word.startswith(self.strip):
+				return None
+			return self.add + word[len(self.strip):]
+		if not word.endswith(self.strip) or len(self.strip) >= len(word):
+			return None
+		return word[:len(word) - len(self.strip)] + self.add
+
+
+def parse_flags(flags, flag_type):
+	if flag_type == 'long':
+		return [flags[i:i + 2] for i in xrange(0, len(flags), 2)]
+	if flag_type == 'num':
+		return [flag for flag in flags.split(',') if flag]
+	return list(flags)
+
+
+def read_hunspell_dictionary(dic_path, aff_path):
+	"""Returns all words of a hunspell dictionary, including those that are formed with prefixes and suffixes.
+
+	Like hunspell's `unmunch`, this applies the affixes of every word, combines prefixes and suffixes that allow
+	cross products and applies affixes that are allowed by the continuation flags of suffixes once more. Words that
+	are only valid within compounds, need an affix or are forbidden are left out. Compounds themselves are not
+	generated.
+	"""
+	encoding = 'utf-8'
+	flag_type = 'char'
+	special_flags = {}
+	affixes = {}
+	cross_products = {}
+	with io.open(aff_path, encoding='utf-8', errors='ignore') as f:
+		for line in f:
+			fields = line.split()
+			if len(fields) < 2 or fields[0].startswith('#'):
+				continue
+			if fields[0] == 'SET':
+				encoding = fields[1]
+			elif fields[0] == 'FLAG':
+				flag_type = fields[1].lower() if fields[1].lower() in ('long', 'num') else 'char'
+			elif fields[0] in ('NEEDAFFIX', 'ONLYINCOMPOUND', 'FORBIDDENWORD'):
+				special_flags[fields[0]] = fields[1]
+			elif fields[0] in ('PFX', 'SFX') and len(fields) >= 4:
+				flag = fields[1]
+				if flag not in cross_products:
+					# The first line of an affix class states whether it can be combined with others.
+					cross_products[flag] = fields[2] == 'Y'
+					affixes[flag] = []
+					continue
+				add, _, continuation_flags = fields[3].partition('/')
+				affixes[flag].append(Affix(fields[0], flag, cross_products[flag], '' if fields[2] == '0' else fields[2],
+					'' if add == '0' else add, parse_flags(continuation_flags, flag_type), fields[4] if len(fields) > 4 else '.'))
+	excluded_flags = set(special_flags.get(name) for name in ('ONLYINCOMPOUND', 'FORBIDDENWORD'))
+	need_affix_flag = special_flags.get('NEEDAFFIX')
+
+	def affixed_words(word, flags, kind):
+		# Yields (affix, affixed word) for all affixes of the kind that are allowed by the flags.
+		for flag in flags:
+			for affix in affixes.get(flag, []):
+				if affix.kind != kind:
+					continue
+				affixed_word = affix.apply(word)
+				if affixed_word is not None:
+					yield affix, affixed_word
+
+	words = set()
+	forbidden_words = set()
+	with io.open(dic_path, encoding=encoding, errors='ignore') as f:
+		for idx, line in enumerate(f):
+			fields = line.split()
+			if len(fields) == 0 or (idx == 0 and fields[0].isdigit()):
+				# The first line is the number of words.
+				continue
+			word, _, flags = fields[0].partition('/')
+			flags = parse_flags(flags, flag_type)
+			if special_flags.get('FORBIDDENWORD') in flags:
+				forbidden_words.add(word)
+			if excluded_flags.intersection(flags):
+				continue
+			if need_affix_flag not in flags:
+				words.add(word)
+			for suffix, suffixed_word in affixed_words(word, flags, 'SFX'):
+				words.add(suffixed_word)
+				# Twofold suffixes and prefixes that are allowed by the suffix.
+				for _, word_with_two_suffixes in affixed_words(suffixed_word, suffix.continuation_flags, 'SFX'):
+					words.add(word_with_two_suffixes)
+				if suffix.cross_product:
+					prefix_flags = flags + suffix.continuation_flags
+					for prefix, prefixed_word in affixed_words(suffixed_word, prefix_flags, 'PFX'):
+						# The condition of the prefix applies to the word itself.
+						if prefix.cross_product and prefix.apply(word) is not None:
+							words.add(prefixed_word)
+			for _, prefixed_word in affixed_words(word, flags, 'PFX'):
+				words.add(prefixed_word)
+	return words - forbidden_words
+
+
+def load_dictionary(config):
+	backend = import_string(config['BACKEND'])
+	return backend(**config.get('OPTIONS', {}))
+
+
+def check_dictionary(app_configs, **kwargs):
+	# Fails `manage.py check` and the startup of the development server instead of every annotation request.
+	from django.core.checks import Error
+	config = settings.ANNOTATION_DICTIONARY
+	if import_string(config['BACKEND']) is not WordIndexDictionary:
+		return []
+	path = config.get('OPTIONS', {}).get('path')
+	if path is not None and os.path.exists(path):
+		return []
+	return [Error(missing_word_index_message(path), hint='Or use dataset.dictionary.EnchantDictionary in ANNOTATION_DICTIONARY.',
+		id='dataset.E001')]
+
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+
+def get_dictionary():
+	global _dictionary
+	with _dictionary_lock:
+		if _dictionary is None:
+			_dictionary = load_dictionary(settings.ANNOTATION_DICTIONARY)
+		return _dictionary
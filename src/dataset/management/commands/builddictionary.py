@@ -0,0 +1,69 @@
+import io
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dataset.models import Annotation
+from dataset.dictionary import EnchantDictionary, WordIndexDictionary, read_hunspell_dictionary, write_word_index
+
+
+class Command(BaseCommand):
+	help = 'Builds the memory-mapped word index that is used to validate annotations from one or more word lists.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('wordlists', nargs='+', help='files with one word per line, e.g. the en_US word list, or hunspell dictionaries (.dic) with their affix files (.aff) next to them')
+		parser.add_argument('--output', default=settings.ANNOTATION_WORD_INDEX_PATH)
+		parser.add_argument('--verify', action='store_true', help='compare the verdicts with enchant for all annotations')
+
+	def handle(self, *args, **options):
+		output = options['output']
+		if output is None:
+			raise CommandError('no output path given')
+
+		self.stdout.write('Reading word lists ...', ending=' ')
+		self.stdout.flush()
+		words = set()
+		for path in options['wordlists']:
+			if os.path.splitext(path)[1] == '.dic':
+				# Hunspell dictionaries only contain stems, whose inflections are described by the affix file.
+				aff_path = os.path.splitext(path)[0] + '.aff'
+				if not os.path.exists(aff_path):
+					raise CommandError('"{}" is a hunspell dictionary, but its affix file "{}" is missing'.format(path, aff_path))
+				words.update(word for word in read_hunspell_dictionary(path, aff_path) if not word.isdigit())
+				continue
+			with io.open(path, encoding='utf-8', errors='ignore') as f:
+				for line in f:
+					word = line.strip()
+					if len(word) > 0 and not word.isdigit():
+						words.add(word)
+		self.stdout.write('done, {} words'.format(len(words)))
+
+		self.stdout.write('Writing word index to "{}" ...'.format(output), ending=' ')
+		self.stdout.flush()
+		directory = os.path.dirname(os.path.abspath(output))
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		start = time.time()
+		n_words = write_word_index(words, output)
+		self.stdout.write('done, wrote {} words in {:.2f}s ({} bytes)'.format(n_words, time.time() - start, os.path.getsize(output)))
+
+		if options['verify']:
+			self.verify(WordIndexDictionary(output))
+
+	def verify(self, word_index):
+		self.stdout.write('Comparing verdicts with enchant ...')
+		enchant = EnchantDictionary()
+		n_annotations = 0
+		n_disagreements = 0
+		words = set()
+		for annotation in Annotation.objects.all().iterator():
+			n_annotations += 1
+			if annotation.is_valid(enchant) != annotation.is_valid(word_index):
+				n_disagreements += 1
+				self.stdout.write('  annotation {}: "{}"'.format(annotation.id, annotation.description))
+			words.update(w for w, _ in enchant.tokenize(annotation.description.lower()))
+		unknown_words = sorted(w for w in words if enchant.check(w) and not word_index.check(w))
+		if len(unknown_words) > 0:
+			self.stdout.write('  words accepted by enchant but missing from the index: {}'.format(', '.join(unknown_words)))
+		self.stdout.write('done, {} of {} annotations are judged differently'.format(n_disagreements, n_annotations))
@@ -0,0 +1,56 @@
+import glob
+import os
+
+from tabulate import tabulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dataset import motionformat
+from dataset.management.commands.convertmotions import read_motion
+
+
+class Command(BaseCommand):
+	help = 'Reports how well the motions in MOTION_FILES_ROOT compress with the quantized delta encoding'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--precision', type=float, default=0.0001, help='in meters')
+		parser.add_argument('--keyframe-interval', type=int, default=motionformat.DEFAULT_KEYFRAME_INTERVAL)
+		parser.add_argument('--per-motion', action='store_true', help='list every motion instead of only the summary')
+
+	def handle(self, *args, **options):
+		root = settings.MOTION_FILES_ROOT
+		paths = sorted(glob.glob(os.path.join(root, '*.json')) + glob.glob(os.path.join(root, '*' + motionformat.MOTION_EXTENSION)))
+		paths = [path for path in paths if not motionformat.is_level_of_detail(path)]
+		if len(paths) == 0:
+			raise CommandError('no motions found in "{}"'.format(root))
+
+		rows = []
+		total_size, total_float32_size, total_encoded_size, max_error = 0, 0, 0, 0.
+		for path in paths:
+			data = read_motion(path)
+			if data.get('encoding') == motionformat.MOTION_ENCODING_DELTA16:
+				# Already quantized, there is no reference to compare against.
+				continue
+			args = (data['markers'], data['frames'], data['interval'], data['marker_set'])
+			float32_size = len(motionformat.dumps(*args))
+			encoded = motionformat.dumps(*args, precision=options['precision'], keyframe_interval=options['keyframe_interval'])
+			error = motionformat.max_error(data['frames'], motionformat.loads(encoded)['frames'])
+
+			size = os.path.getsize(path)
+			total_size += size
+			total_float32_size += float32_size
+			total_encoded_size += len(encoded)
+			max_error = max(max_error, error)
+			rows.append([os.path.basename(path), size / 1e3, len(encoded) / 1e3, float(size) / len(encoded), error * 1e3])
+
+		headers = ['motion', 'size (kB)', 'encoded (kB)', 'ratio', 'max. error (mm)']
+		if options['per_motion']:
+			self.stdout.write(tabulate(rows, headers=headers, floatfmt='.3f'))
+			self.stdout.write('')
+		self.stdout.write('{} motions, precision {} mm, keyframe every {} frames'.format(len(rows), options['precision'] * 1e3, options['keyframe_interval']))
+		if len(rows) == 0:
+			return
+		self.stdout.write('  stored:  {:.1f} MB'.format(total_size / 1e6))
+		self.stdout.write('  float32: {:.1f} MB (ratio {:.2f})'.format(total_float32_size / 1e6, float(total_size) / total_float32_size))
+		self.stdout.write('  encoded: {:.1f} MB (ratio {:.2f})'.format(total_encoded_size / 1e6, float(total_size) / total_encoded_size))
+		self.stdout.write('  max. reconstruction error: {:.4f} mm'.format(max_error * 1e3))
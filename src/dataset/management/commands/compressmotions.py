@@ -0,0 +1,46 @@
+import glob
+import os
+from multiprocessing import Pool, cpu_count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dataset import compression, motionformat
+
+
+def compress_motion(path):
+	variant_paths = compression.write_compressed_variants(path)
+	return path, os.path.getsize(path), dict((os.path.splitext(p)[1], os.path.getsize(p)) for p in variant_paths)
+
+
+class Command(BaseCommand):
+	help = 'Writes the gzip and brotli compressed variants of all motion files'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--workers', type=int, default=cpu_count())
+		parser.add_argument('--force', action='store_true', help='also re-compress files whose variants are up-to-date')
+
+	def handle(self, *args, **options):
+		if compression.brotli is None:
+			self.stderr.write('The brotli module is not installed, only writing gzip variants.')
+		root = settings.MOTION_FILES_ROOT
+		paths = sorted(glob.glob(os.path.join(root, '*.json')) + glob.glob(os.path.join(root, '*' + motionformat.MOTION_EXTENSION)))
+		if not options['force']:
+			paths = [path for path in paths if not compression.has_compressed_variants(path)]
+		self.stdout.write('Compressing {} motion files using {} workers ...'.format(len(paths), options['workers']))
+
+		total_size = 0
+		total_variant_sizes = {}
+		pool = Pool(options['workers'])
+		try:
+			for idx, (path, size, variant_sizes) in enumerate(pool.imap_unordered(compress_motion, paths)):
+				total_size += size
+				for extension, variant_size in variant_sizes.items():
+					total_variant_sizes[extension] = total_variant_sizes.get(extension, 0) + variant_size
+				self.stdout.write('  {}/{}: {}'.format(idx + 1, len(paths), os.path.basename(path)))
+		finally:
+			pool.close()
+			pool.join()
+
+		self.stdout.write('done, compressed {:.1f} MB'.format(total_size / 1e6))
+		for extension, variant_size in sorted(total_variant_sizes.items()):
+			self.stdout.write('  {}: {:.1f} MB (ratio {:.2f})'.format(extension, variant_size / 1e6, float(total_size) / max(1, variant_size)))
@@ -0,0 +1,79 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dataset.models import MotionFile
+from dataset import motionformat
+from dataset.compression import remove_compressed_variants
+
+
+def read_motion(path):
+	if path.endswith('.json'):
+		with open(path, 'r') as f:
+			data = json.load(f)
+		data.setdefault('marker_set', 'kit')
+		return data
+	with open(path, 'rb') as f:
+		return motionformat.load(f)
+
+
+def remove_motion(path):
+	for fps in settings.MOTION_LEVELS_OF_DETAIL:
+		level_path = motionformat.level_of_detail_path(path, fps)
+		if os.path.exists(level_path):
+			os.remove(level_path)
+			remove_compressed_variants(level_path)
+	os.remove(path)
+	remove_compressed_variants(path)
+
+
+class Command(BaseCommand):
+	help = 'Converts JSON motions into the binary motion format and optionally quantizes them'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--precision', type=float, default=None, help='quantize marker positions to this precision in meters (e.g. 0.0001) and store frame-to-frame deltas; this also converts binary float32 motions')
+		parser.add_argument('--keyframe-interval', type=int, default=motionformat.DEFAULT_KEYFRAME_INTERVAL)
+		parser.add_argument('--delete-json', action='store_true', help='delete the JSON files after converting them, except for the motion on the welcome page')
+
+	def handle(self, *args, **options):
+		precision = options['precision']
+		q = MotionFile.objects.only('id', 'filename')
+		if precision is None:
+			q = q.filter(filename__endswith='.json')
+		motion_files = list(q)
+		self.stdout.write('Converting {} motions ...'.format(len(motion_files)))
+		old_size, new_size = 0, 0
+		for idx, motion_file in enumerate(motion_files):
+			self.stdout.write('  {}/{}: motion file {} ...'.format(idx + 1, len(motion_files), motion_file.id), ending=' ')
+			self.stdout.flush()
+			old_path = os.path.join(settings.MOTION_FILES_ROOT, motion_file.filename)
+			if not os.path.exists(old_path):
+				self.stdout.write('missing')
+				continue
+			data = read_motion(old_path)
+			if data.get('encoding') == motionformat.MOTION_ENCODING_DELTA16:
+				self.stdout.write('skipped, already quantized')
+				continue
+			old_size += os.path.getsize(old_path)
+			filename = motionformat.save(settings.MOTION_FILES_ROOT, data['markers'], data['frames'], data['interval'], data['marker_set'],
+				levels_of_detail=settings.MOTION_LEVELS_OF_DETAIL, precision=precision, keyframe_interval=options['keyframe_interval'])
+			new_size += os.path.getsize(os.path.join(settings.MOTION_FILES_ROOT, filename))
+			MotionFile.objects.filter(pk=motion_file.pk).update(filename=filename)
+
+			if filename != motion_file.filename and old_path.endswith(motionformat.MOTION_EXTENSION):
+				# Binary motions are replaced by their quantized version, which is named after its own content.
+				remove_motion(old_path)
+			elif options['delete_json'] and old_path.endswith('.json'):
+				if motion_file.filename == settings.WELCOME_MOTION_FILENAME:
+					# The welcome page loads the JSON file by its name.
+					self.stdout.write('done, kept the JSON file for the welcome page')
+					continue
+				os.remove(old_path)
+				remove_compressed_variants(old_path)
+			self.stdout.write('done')
+		self.stdout.write('Converted {:.1f} MB into {:.1f} MB'.format(old_size / 1e6, new_size / 1e6))
+		self.stdout.write('')
+
+		self.stdout.write('Please note: you need to collect static files for the new motion files to be served:')
+		self.stdout.write('  python manage.py collectstatic')
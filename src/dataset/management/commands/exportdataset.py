@@ -7,19 +7,15 @@ import zipfile
 import time
 import shutil
 
-import Glacier2
-import Ice
-Ice.loadSlice('-I%s %s' % (Ice.getSliceDir(), os.path.abspath(os.path.join(__file__, '..', 'MotionDatabase.ice'))))
-import MotionDatabase
-
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from dataset.models import MotionFile, Annotation, Dataset
 from dataset.management.util import *
+from dataset.management.filecache import default_file_cache
+from dataset.management.metadatacache import cached_motion_database
 
 
 DATA_PATH = os.path.abspath(os.path.join(__file__, '..', '..', '..', 'static', 'downloads'))
-ICE_CLIENT_CONFIG_PATH = os.path.abspath(os.path.join(__file__, '..', 'client.cfg'))
 
 
 def zipdir(basedir, archivename, callback_before=None, callback_after=None):
@@ -40,22 +36,18 @@ class Command(BaseCommand):
 	help = 'Exports a version of the current dataset.'
 
 	def add_arguments(self, parser):
-		pass
+		parser.add_argument('--no-cache', action='store_true', help='download all files and metadata from the motion database instead of using the local caches')
+		parser.add_argument('--refresh-metadata', action='store_true', help='discard the cached metadata of the motion database before starting')
 
 	def handle(self, *args, **options):
 		username = raw_input('MotionDB Username: ')
 		password = getpass('MotionDB Password: ')
 		self.stdout.write('')
 		
-		# Configure Ice and Connect to database.
-		properties = Ice.createProperties(sys.argv)
-		properties.load(ICE_CLIENT_CONFIG_PATH)
-		init_data = Ice.InitializationData()
-		init_data.properties = properties
-		ic = Ice.initialize(init_data)
-		router = Glacier2.RouterPrx.checkedCast(ic.getDefaultRouter())
-		session = router.createSession(username, password)
-		db = MotionDatabase.MotionDatabaseSessionPrx.checkedCast(session)
+		# Connect to database.
+		db = connect(username, password)
+		if not options['no_cache']:
+			db = cached_motion_database(db, refresh=options['refresh_metadata'])
 
 		# Collect all matching C3D and MMM files.
 		self.stdout.write('Collecting data from motion database ...')
@@ -75,7 +67,7 @@ class Command(BaseCommand):
 			
 			for c3d_file in c3d_files:
 				# Ensure that only visible data is exported.
-				assert c3d_file.visibility == MotionDatabase.VisibilityLevel.Public
+				assert is_public(c3d_file)
 
 				# Fetch motion file from database.
 				try:
@@ -117,6 +109,8 @@ class Command(BaseCommand):
 		tmp_path = mkdtemp()
 		self.stdout.write('Downloading data to "{}" ...'.format(tmp_path))
 		motion_entry_cache = {}
+		statistics = DownloadStatistics()
+		cache = default_file_cache() if not options['no_cache'] else None
 		nb_annotations = 0
 		nb_motions = 0
 		for idx, (database_entry, c3d_file, mmm_file, annotations, motion_id) in enumerate(zip(all_database_entries, all_c3d_files, all_mmm_files, all_annotations, all_motion_ids)):
@@ -128,23 +122,17 @@ class Command(BaseCommand):
 			filename_meta = filename_prefix + '_meta.json'
 			filename_annotation = filename_prefix + '_annotations.json'
 
-			# Download MMM.
-			r = db.getFileReader(mmm_file.id)
-			d = read_file(r)
-			r.destroy()
-			if d is None:
-				return -1
-			with open(os.path.join(tmp_path, filename_mmm), 'wb') as f:
-				f.write(d)
-
-			# Download C3D.
-			r = db.getFileReader(c3d_file.id)
-			d = read_file(r)
-			r.destroy()
-			if d is None:
-				return -1
-			with open(os.path.join(tmp_path, filename_c3d), 'wb') as f:
-				f.write(d)
+			# Download MMM and C3D directly into their files, unless they are in the cache.
+			for file_id, filename in [(mmm_file.id, filename_mmm), (c3d_file.id, filename_c3d)]:
+				r = db.getFileReader(file_id)
+				if cache is not None:
+					size = cache.download(r, file_id, os.path.join(tmp_path, filename), statistics=statistics)
+				else:
+					with open(os.path.join(tmp_path, filename), 'wb') as f:
+						size = read_file(r, f, statistics=statistics)
+				r.destroy()
+				if size is None:
+					return -1
 
 			# Retrieve motion information.
 			if c3d_file.attachedToId in motion_entry_cache:
@@ -196,7 +184,7 @@ class Command(BaseCommand):
 				nb_annotations += len(annotations)
 				nb_motions += 1
 			self.stdout.write('done')
-		self.stdout.write('done')
+		self.stdout.write('done, downloaded {}'.format(statistics))
 		self.stdout.write('')
 
 		# Create ZIP archive.
@@ -1,23 +1,23 @@
-import json; json.encoder.FLOAT_REPR = lambda f: ("%.4f" % f)
 import xml.etree.cElementTree as et
 import os
 import sys
 import StringIO
+from collections import deque
 from getpass import getpass
-from hashlib import sha1
+from multiprocessing import Pool
 
 import c3d
 import numpy as np
 
-import Glacier2
-import Ice
-Ice.loadSlice('-I%s %s' % (Ice.getSliceDir(), os.path.abspath(os.path.join(__file__, '..', 'MotionDatabase.ice'))))
-import MotionDatabase
-
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from dataset.models import MotionFile
 from dataset.management.util import *
+from dataset.management.downloads import DownloadScheduler, SessionKeepAlive, download_motion_files
+from dataset.management.filecache import default_file_cache
+from dataset.management.metadatacache import cached_motion_database
+from dataset import motionformat
 
 
 SUPPORTED_MARKER_NAMES = {
@@ -34,8 +34,6 @@ SUPPORTED_MARKER_NAMES = {
          'LFIN', 'LFHD', 'RFHD', 'RBHD', 'LBHD', 'LANK', 'RANK', 'LSHN', 'RSHN', 'LTHI',
          'RTHI'],
 }
-DATA_PATH = os.path.abspath(os.path.join(__file__, '..', '..', '..', 'static', 'motions'))
-ICE_CLIENT_CONFIG_PATH = os.path.abspath(os.path.join(__file__, '..', 'client.cfg'))
 
 
 def rotation_matrix(roll, pitch, yaw):
@@ -61,6 +59,31 @@ def pose_matrix(pos, rot):
 	return mat.astype('float32')
 
 
+def read_point_data(c3d_reader, c3d_data):
+	"""Views the data section of the C3D file as an array of point data with the shape (frames, points, 4).
+
+	Unlike `c3d.Reader.read_frames`, this does not decode anything, so that only the frames and markers that are
+	actually used need to be converted and the analog channels are skipped. Like the c3d module, this only supports
+	files written by Intel processors.
+	"""
+	header = c3d_reader.header
+	point_dtype = np.dtype('<f4' if c3d_reader.point_scale < 0 else '<i2')
+	frame_size = (4 * header.point_count + header.analog_count) * point_dtype.itemsize
+	frame_dtype = np.dtype({'names': ['points'], 'formats': [(point_dtype, (header.point_count, 4))], 'itemsize': frame_size})
+	offset = (header.data_block - 1) * 512
+	n_frames = min(c3d_reader.last_frame() - c3d_reader.first_frame() + 1, (len(c3d_data) - offset) // frame_size)
+	return np.frombuffer(c3d_data, dtype=frame_dtype, count=n_frames, offset=offset)['points']
+
+
+def read_points(c3d_reader, point_data, marker_indexes, frame_indexes):
+	# Returns the coordinates of the markers in the frames as a float32 array with the shape (frames, markers, 3).
+	frames = np.empty((len(frame_indexes), len(marker_indexes), 3), dtype='float32')
+	frames[...] = point_data[np.asarray(frame_indexes)[:, np.newaxis], np.asarray(marker_indexes, dtype='int64'), 0:3]
+	if c3d_reader.point_scale >= 0:
+		frames *= abs(c3d_reader.point_scale)
+	return frames
+
+
 def parse_motion(c3d_data, mmm_data, downsample_factor, marker_set):
 	# Open files.
 	c3d_reader = c3d.Reader(StringIO.StringIO(c3d_data))
@@ -91,24 +114,25 @@ def parse_motion(c3d_data, mmm_data, downsample_factor, marker_set):
 	supported_indexes = [idx for idx, name in enumerate(marker_names) if name in SUPPORTED_MARKER_NAMES[marker_set]]
 	markers = [marker_names[idx] for idx in supported_indexes]
 
-	# Extract Cartesian coordinates from C3D file and downsample.
-	frames = []
-	for idx, points, _ in c3d_reader.read_frames():
-		xyz_coordinates = points[supported_indexes, 0:3]
-		frame = xyz_coordinates.flatten()
-		frames.append(frame)
-	frames = np.array(frames)[::downsample_factor, :]
-
-	# Normalize all frames, that is rotate and translate as well as scale.
-	n_markers = len(markers)
-	n_frames = len(frames)
+	# Extract Cartesian coordinates from C3D file and resample them at the (truncated) interval. Only the frames that
+	# are needed for interpolation are read. These are every `downsample_factor`-th frame only if the interval has
+	# not been truncated: at 120 fps, the interval is 16 ms, which is shorter than two frames (16.7 ms).
+	point_data = read_point_data(c3d_reader, c3d_data)
+	lower, weights = motionformat.resampling_weights(len(point_data), (step1 - step0) * 1000., interval)
+	frames = read_points(c3d_reader, point_data, supported_indexes, lower)
+	if np.any(weights > 0.):
+		next_frames = read_points(c3d_reader, point_data, supported_indexes, lower + 1)
+		frames += (next_frames - frames) * weights.astype('float32')[:, np.newaxis, np.newaxis]
+
+	# Normalize all frames, that is rotate and translate as well as scale, in a single matrix product.
 	pose_inv = np.linalg.inv(pose_matrix([pose_pos[0], pose_pos[1], 0.],  # keep z components as-is
 										 [0., 0., pose_rot[2]]))  # only rotate around z-axis
-	for i in xrange(n_markers):
-		start_idx = i * 3
-		pos = np.hstack([frames[:, start_idx:start_idx + 3], np.ones((n_frames, 1))])
-		frames[:, start_idx:start_idx + 3] = np.dot(pose_inv, pos.T).T[:, 0:3]
-	frames /= 100.  # convert from cm to m
+	pose_inv /= 100.  # convert from cm to m
+	points = frames.reshape(-1, 3)
+	normalized = np.empty_like(points)
+	np.dot(points, np.ascontiguousarray(pose_inv[0:3, 0:3].T), out=normalized)
+	normalized += pose_inv[0:3, 3]
+	frames = normalized.reshape(len(frames), 3 * len(markers))
 
 	return markers, frames, interval
 
@@ -129,15 +153,18 @@ def get_marker_set_identifier(marker_set):
 		raise ValueError('unknown marker_set "{}"'.format(marker_set))
 
 
-def import_motion(db, motion, downsample_factor=2):
-	# Download the necessary files.
-	failed_files = []
-	downloaded_files = 0
-	all_c3d_files = [f for f in db.listFiles(motion.id) if f.fileType == 'Vicon C3D File']
-	all_mmm_files = [f for f in db.listFiles(motion.id) if f.fileType == 'Converted MMM Motion']
-	c3d_files, mmm_files = [], []
+def describe_error(error):
+	# Ice exceptions print their members over several lines.
+	return ' '.join(str(error).split()) or type(error).__name__
+
+
+def select_files(motion, files):
+	# Returns the pairs of C3D and MMM files that should be imported.
+	all_c3d_files = [f for f in files if f.fileType == 'Vicon C3D File']
+	all_mmm_files = [f for f in files if f.fileType == 'Converted MMM Motion']
+	pairs = []
 	for c3d_file in all_c3d_files:
-		if c3d_file.visibility != MotionDatabase.VisibilityLevel.Public:
+		if not is_public(c3d_file):
 			# Only import public files.
 			continue
 			
@@ -157,81 +184,86 @@ def import_motion(db, motion, downsample_factor=2):
 			continue
 
 		# Only append files where we have both, the MMM and C3D file.
-		mmm_files.append(mmm_file)
-		c3d_files.append(c3d_file)
-	assert len(c3d_files) == len(mmm_files)
-
-	# Read all files.
-	c3d_data, mmm_data, ids, names = [], [], [], []
-	for mmm_file, c3d_file in zip(mmm_files, c3d_files):
-		ids.append(c3d_file.id)
-		names.append(c3d_file.fileName)
-		
-		mmm_reader = db.getFileReader(mmm_file.id)
-		d = read_file(mmm_reader)
-		mmm_reader.destroy()
-		if d is None:
-			return -1
-		mmm_data.append(d)
-		
-		c3d_reader = db.getFileReader(c3d_file.id)
-		d = read_file(c3d_reader)
-		c3d_reader.destroy()
-		if d is None:
-			return -1
-		c3d_data.append(d)
+		pairs.append((c3d_file, mmm_file))
+	return pairs
 
-	imported_files = 0
-	marker_set = get_marker_set_from_motion(motion)
-	motion_files = []
-	for c3d_d, mmm_d, id, name, in zip(c3d_data, mmm_data, ids, names):
-		filename = '{}.json'.format(sha1('{}{}'.format(motion.id, id)).hexdigest())
-		path = os.path.join(DATA_PATH, filename)
-		if os.path.exists(path):
-			# The file already exists. Skip motion to avoid messing with another motions file.
-			continue
 
+def write_motion(marker_set, downloaded_data, downsample_factor=2, precision=None, keyframe_interval=motionformat.DEFAULT_KEYFRAME_INTERVAL):
+	"""Parses the downloaded (C3D data, MMM data) pairs of a motion and writes their motion files.
+
+	Returns the filename for every pair, which is None if the pair could not be parsed, or -1 if a download failed.
+	This does not touch the database, so that it can run in a worker process.
+	"""
+	for c3d_d, mmm_d in downloaded_data:
+		if c3d_d is None or mmm_d is None:
+			return -1
+
+	filenames = []
+	for c3d_d, mmm_d in downloaded_data:
 		# Parse.
 		markers, frames, interval = parse_motion(c3d_d, mmm_d, downsample_factor, marker_set)
-		if markers is None or len(markers) == 0:
+		if markers is None or len(markers) == 0 or frames is None or frames.shape[0] == 0 or interval is None:
+			filenames.append(None)
 			continue
-		if frames is None or frames.shape[0] == 0:
+
+		# Save motion file, its levels of detail and their compressed variants. The files are named after the hash
+		# of their content.
+		filenames.append(motionformat.save(settings.MOTION_FILES_ROOT, markers, frames, interval, get_marker_set_identifier(marker_set),
+			levels_of_detail=settings.MOTION_LEVELS_OF_DETAIL, precision=precision, keyframe_interval=keyframe_interval))
+	return filenames
+
+
+def create_motion_files(motion, marker_set, c3d_files, filenames):
+	motion_files = []
+	for c3d_file, filename in zip(c3d_files, filenames):
+		if filename is None:
 			continue
-		if interval is None:
+		if MotionFile.objects.filter(filename=filename).exists():
+			# Another motion has exactly the same content.
 			continue
 
 		# Save in database.
 		motion_file = MotionFile()
 		motion_file.motion_db_id = motion.id
-		motion_file.motion_db_file_id = id
+		motion_file.motion_db_file_id = c3d_file.id
 		motion_file.filename = filename
 		motion_file.marker_set = marker_set
 		motion_file.is_hidden = True  # hide until we're done
 		motion_file.save()
-		
-		# Save JSON file.
-		data = {}
-		data['markers'] = markers
-		data['frames'] = frames.tolist()
-		data['interval'] = interval
-		data['marker_set'] = get_marker_set_identifier(marker_set)
-		with open(path, 'w') as f:
-			json.dump(data, f)
 
 		# Book-keeping
 		motion_files.append(motion_file)
 	return motion_files
 
 
+def import_motion(motion, downloaded_files, **kwargs):
+	# The files have been downloaded by download_motion_files.
+	marker_set = get_marker_set_from_motion(motion)
+	filenames = write_motion(marker_set, [(c3d_d, mmm_d) for _, c3d_d, mmm_d in downloaded_files], **kwargs)
+	if filenames == -1:
+		return -1
+	return create_motion_files(motion, marker_set, [c3d_file for c3d_file, _, _ in downloaded_files], filenames)
+
+
 class Command(BaseCommand):
 	help = 'Imports motions from the KIT motion database'
 
 	def add_arguments(self, parser):
-		pass
+		parser.add_argument('--precision', type=float, default=None, help='quantize marker positions to this precision in meters (e.g. 0.0001) and store frame-to-frame deltas')
+		parser.add_argument('--keyframe-interval', type=int, default=motionformat.DEFAULT_KEYFRAME_INTERVAL)
+		parser.add_argument('--max-open-files', type=int, default=4, help='number of files that are downloaded at once')
+		parser.add_argument('--lookahead', type=int, default=8, help='number of motions that are downloaded while the current one is imported')
+		parser.add_argument('--download-timeout', type=float, default=DOWNLOAD_TIMEOUT, help='seconds to wait for a file before the motion counts as failed')
+		parser.add_argument('--workers', type=int, default=1, help='number of processes that parse and write motions')
+		parser.add_argument('--batch-size', type=int, default=50, help='number of motions whose files are added to the database in a single transaction')
+		parser.add_argument('--no-cache', action='store_true', help='download all files and metadata from the motion database instead of using the local caches')
+		parser.add_argument('--refresh-metadata', action='store_true', help='discard the cached metadata of the motion database before starting')
+		parser.add_argument('--proxy', default=None, help='connect directly to this motion database session instead of logging in through Glacier2, e.g. to scripts/fake_motiondb.py')
 
 	def handle(self, *args, **options):
-		username = raw_input('MotionDB Username: ')
-		password = getpass('MotionDB Password: ')
+		if options['proxy'] is None:
+			username = raw_input('MotionDB Username: ')
+			password = getpass('MotionDB Password: ')
 		
 		description_filter = raw_input('Description filter (leave blank for all descriptions): ')
 		if len(description_filter) == 0:
@@ -254,16 +286,19 @@ class Command(BaseCommand):
 		raw_max_objects = raw_input('Maximum number of objects (leave blank for no limit): ')
 		max_objects = int(raw_max_objects) if len(raw_max_objects) > 0 else sys.maxint
 		self.stdout.write('')
+		if not os.path.isdir(settings.MOTION_FILES_ROOT):
+			os.makedirs(settings.MOTION_FILES_ROOT)
 
-		# Configure Ice and Connect to database.
-		properties = Ice.createProperties(sys.argv)
-		properties.load(ICE_CLIENT_CONFIG_PATH)
-		init_data = Ice.InitializationData()
-		init_data.properties = properties
-		ic = Ice.initialize(init_data)
-		router = Glacier2.RouterPrx.checkedCast(ic.getDefaultRouter())
-		session = router.createSession(username, password)
-		db = MotionDatabase.MotionDatabaseSessionPrx.checkedCast(session)
+		# Start the workers before connecting, so that they don't inherit the threads and connections of Ice.
+		pool = Pool(options['workers']) if options['workers'] > 1 else None
+
+		# Connect to database.
+		if options['proxy'] is None:
+			db = connect(username, password)
+		else:
+			db = connect_directly(options['proxy'])
+		if not options['no_cache']:
+			db = cached_motion_database(db, refresh=options['refresh_metadata'])
 
 		approx_motion_count = count_motions(db, project_ids, institution_ids, description_filter)
 		self.stdout.write('Fetching approx. {} motions ...'.format(approx_motion_count), ending=' ')
@@ -273,22 +308,75 @@ class Command(BaseCommand):
 		self.stdout.write('')
 
 		self.stdout.write('Importing motions ...')
+		write_kwargs = {'precision': options['precision'], 'keyframe_interval': options['keyframe_interval']}
 		count = 0
-		for idx, motion in enumerate(motions):
-			self.stdout.write('  {}/{}: motion {} ...'.format(idx + 1, n_motions, motion.id), ending=' ')
-			motion_files = import_motion(db, motion)
-			imported_files = len(motion_files)
-			if imported_files > 0:
-				count += imported_files
-				self.stdout.write('done, imported {} files'.format(imported_files))
-			elif imported_files == 0:
-				self.stdout.write('skipped')
-			else:
-				self.stdout.write('failed')
+		statistics = DownloadStatistics()
+		cache = default_file_cache() if not options['no_cache'] else None
+		scheduler = DownloadScheduler(db, max_open_files=options['max_open_files'], statistics=statistics, cache=cache)
+		keep_alive = SessionKeepAlive(db)
+		keep_alive.start()
+		try:
+			# Motions are parsed and written in the order in which they have been downloaded. Results are collected
+			# in the same order, so the database ends up the same no matter how many workers there are.
+			pending = deque()  # (index, motion, marker set, C3D files, filenames or their AsyncResult, download error)
+			completed = []
+
+			def collect(idx, motion, marker_set, c3d_files, filenames, error):
+				# Waits for the worker that writes the motion, so that the transaction does not have to.
+				if pool is not None and error is None:
+					filenames = filenames.get()
+				return idx, motion, marker_set, c3d_files, filenames, error
+
+			downloads = download_motion_files(scheduler, motions, select_files, lookahead=options['lookahead'], timeout=options['download_timeout'])
+			for idx, (motion, downloaded_files, error) in enumerate(downloads):
+				marker_set = get_marker_set_from_motion(motion)
+				args = (marker_set, [(c3d_d, mmm_d) for _, c3d_d, mmm_d in downloaded_files])
+				if error is not None:
+					filenames = -1
+				elif pool is None:
+					filenames = write_motion(*args, **write_kwargs)
+				else:
+					filenames = pool.apply_async(write_motion, args, write_kwargs)
+				pending.append((idx, motion, marker_set, [c3d_file for c3d_file, _, _ in downloaded_files], filenames, error))
+
+				# Keep every worker busy, but don't hold more downloaded motions in memory than necessary.
+				while len(pending) > 2 * options['workers']:
+					completed.append(collect(*pending.popleft()))
+				if len(completed) >= options['batch_size']:
+					count += self.create_motion_files(completed, n_motions)
+					completed = []
+			completed.extend(collect(*item) for item in pending)
+			count += self.create_motion_files(completed, n_motions)
+		finally:
+			keep_alive.stop()
+			keep_alive.join()
+			# This also sends the pending requests to destroy file readers, which would stay open otherwise.
+			db.ice_getCommunicator().destroy()
+			if pool is not None:
+				pool.close()
+				pool.join()
 		self.stdout.write('Imported a total of {} files'.format(count))
+		self.stdout.write('Downloaded {}'.format(statistics))
 		self.stdout.write('')
 
 		self.stdout.write('Please note: the new motions haven\'t been made visible yet since you need to manually collect static files first:')
 		self.stdout.write('  python manage.py collectstatic')
 		self.stdout.write('You can then enable all motions by simply running the following SQL command:')
 		self.stdout.write('  UPDATE dataset_motionfile SET is_hidden=0')
+
+	def create_motion_files(self, results, n_motions):
+		# Adds the motion files of a batch of motions to the database at once. Returns the number of added files.
+		count = 0
+		with transaction.atomic():
+			for idx, motion, marker_set, c3d_files, filenames, error in results:
+				self.stdout.write('  {}/{}: motion {} ...'.format(idx + 1, n_motions, motion.id), ending=' ')
+				if filenames == -1:
+					self.stdout.write('failed' if error is None else 'failed ({})'.format(describe_error(error)))
+					continue
+				motion_files = create_motion_files(motion, marker_set, c3d_files, filenames)
+				if len(motion_files) > 0:
+					count += len(motion_files)
+					self.stdout.write('done, imported {} files'.format(len(motion_files)))
+				else:
+					self.stdout.write('skipped')
+		return count
@@ -3,17 +3,12 @@ import sys
 from getpass import getpass
 from hashlib import sha1
 
-import Glacier2
-import Ice
-Ice.loadSlice('-I%s %s' % (Ice.getSliceDir(), os.path.abspath(os.path.join(__file__, '..', 'MotionDatabase.ice'))))
-import MotionDatabase
-
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from dataset.models import MotionFile
-
-
-DATA_PATH = os.path.abspath(os.path.join(__file__, '..', '..', '..', 'static', 'motions'))
-ICE_CLIENT_CONFIG_PATH = os.path.abspath(os.path.join(__file__, '..', 'client.cfg'))
+from dataset.management.util import connect, is_public
+from dataset.compression import remove_compressed_variants
+from dataset.motionformat import level_of_detail_path
 
 
 class Command(BaseCommand):
@@ -26,15 +21,8 @@ class Command(BaseCommand):
 		username = raw_input('MotionDB Username: ')
 		password = getpass('MotionDB Password: ')
 
-		# Configure Ice and Connect to database.
-		properties = Ice.createProperties(sys.argv)
-		properties.load(ICE_CLIENT_CONFIG_PATH)
-		init_data = Ice.InitializationData()
-		init_data.properties = properties
-		ic = Ice.initialize(init_data)
-		router = Glacier2.RouterPrx.checkedCast(ic.getDefaultRouter())
-		session = router.createSession(username, password)
-		db = MotionDatabase.MotionDatabaseSessionPrx.checkedCast(session)
+		# Connect to database.
+		db = connect(username, password)
 
 		self.stdout.write('Fetching all MotionFile objects ...')
 		q = MotionFile.objects.all()
@@ -49,15 +37,20 @@ class Command(BaseCommand):
 			self.stdout.write('  {}/{} ...'.format(idx + 1, len(motion_files)), ending=' ')
 			self.stdout.flush()
 			file = db.getFile(mf.motion_db_file_id)
-			if file.visibility == MotionDatabase.VisibilityLevel.Public:
+			if is_public(file):
 				# The file is visible, nothing to do.
 				self.stdout.write('skipping')
 				continue
 
-			# Delete the JSON file.
-			path = os.path.join(DATA_PATH, mf.filename)
+			# Delete the motion file.
+			path = os.path.join(settings.MOTION_FILES_ROOT, mf.filename)
 			assert os.path.exists(path)
 			os.remove(path)
+			remove_compressed_variants(path)
+			for fps in settings.MOTION_LEVELS_OF_DETAIL:
+				if os.path.exists(level_of_detail_path(path, fps)):
+					os.remove(level_of_detail_path(path, fps))
+					remove_compressed_variants(level_of_detail_path(path, fps))
 
 			# Delete the MotionFile and all its annotations.
 			nb_annotations = mf.annotation_set.count()
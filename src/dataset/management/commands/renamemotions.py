@@ -0,0 +1,48 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from dataset.models import MotionFile
+from dataset import motionformat
+from dataset.compression import VARIANTS
+
+
+def rename_with_variants(old_path, new_path):
+	os.rename(old_path, new_path)
+	for _, extension in VARIANTS:
+		if os.path.exists(old_path + extension):
+			os.rename(old_path + extension, new_path + extension)
+
+
+class Command(BaseCommand):
+	help = 'Renames motion files after the hash of their content, so that they can be cached forever'
+
+	def handle(self, *args, **options):
+		motion_files = list(MotionFile.objects.only('id', 'filename'))
+		self.stdout.write('Renaming {} motions ...'.format(len(motion_files)))
+		renamed = 0
+		for idx, motion_file in enumerate(motion_files):
+			if motion_file.filename == settings.WELCOME_MOTION_FILENAME:
+				self.stdout.write('  {}/{}: motion file {} is shown on the welcome page, skipping'.format(idx + 1, len(motion_files), motion_file.id))
+				continue
+			old_path = os.path.join(settings.MOTION_FILES_ROOT, motion_file.filename)
+			if not os.path.exists(old_path):
+				self.stdout.write('  {}/{}: motion file {} is missing'.format(idx + 1, len(motion_files), motion_file.id))
+				continue
+			with open(old_path, 'rb') as f:
+				filename = motionformat.content_filename(f.read(), os.path.splitext(old_path)[1])
+			if filename == motion_file.filename:
+				continue
+			if MotionFile.objects.filter(filename=filename).exists():
+				self.stdout.write('  {}/{}: motion file {} has the same content as another one, skipping'.format(idx + 1, len(motion_files), motion_file.id))
+				continue
+
+			new_path = os.path.join(settings.MOTION_FILES_ROOT, filename)
+			for fps in settings.MOTION_LEVELS_OF_DETAIL:
+				old_level_path = motionformat.level_of_detail_path(old_path, fps)
+				if os.path.exists(old_level_path):
+					rename_with_variants(old_level_path, motionformat.level_of_detail_path(new_path, fps))
+			rename_with_variants(old_path, new_path)
+			MotionFile.objects.filter(pk=motion_file.pk).update(filename=filename)
+			renamed += 1
+		self.stdout.write('done, renamed {} motions'.format(renamed))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from dataset.models import Statistics
+
+
+class Command(BaseCommand):
+	help = 'Rebuilds the statistics snapshot from scratch.'
+
+	def add_arguments(self, parser):
+		pass
+
+	def handle(self, *args, **options):
+		self.stdout.write('Rebuilding statistics ...', ending=' ')
+		self.stdout.flush()
+		snapshot = Statistics.rebuild()
+		self.stdout.write('done, {}'.format(snapshot))
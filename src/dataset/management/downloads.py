@@ -0,0 +1,237 @@
+import threading
+from collections import deque
+
+from dataset.management.util import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT, ChunkedDownload, load_motion_database_module
+
+
+TOO_MANY_OPEN_FILES_RETRY_INTERVAL = 1.  # in seconds
+
+
+class DownloadTimeoutError(Exception):
+	pass
+
+
+class Result(object):
+	# Filled in by an Ice callback and waited for by the importing thread.
+	def __init__(self):
+		self.event = threading.Event()
+		self.value = None
+		self.error = None
+
+	def set(self, value=None, error=None):
+		self.value = value
+		self.error = error
+		self.event.set()
+
+	def get(self, timeout=None):
+		"""Waits for at most `timeout` seconds and returns the value and the error.
+
+		Like in read_file, failed downloads yield None as value. If there was no result in time, the error is a
+		`DownloadTimeoutError`.
+		"""
+		# Waiting without a timeout cannot be interrupted in Python 2, so wait in short steps.
+		waited = 0.
+		while not self.event.wait(1.):
+			waited += 1.
+			if timeout is not None and waited >= timeout:
+				return None, DownloadTimeoutError('no response from the motion database within {} seconds'.format(timeout))
+		return self.value, self.error
+
+
+class DownloadScheduler(object):
+	"""Downloads files from the motion database through asynchronous invocations.
+
+	Instead of waiting for the result of every `listFiles` and `readChunk` call before issuing the next one, up to
+	`max_open_files` files are read at once. Each of them has a single chunk in flight, since readers have no offset,
+	and is resumed after transient errors like in `read_file`. If the database refuses to open more files, the limit
+	is lowered to the number of files that are currently open and the download is retried once one of them has been
+	closed. Files that are in the `FileCache` with the same size are not downloaded again. All callbacks run in Ice's
+	client thread pool, so the importing thread is free to parse motions in the meantime. Ice only logs exceptions
+	that are raised in callbacks, so every callback is wrapped by `guarded`, which finishes the download with the
+	exception instead.
+	"""
+
+	def __init__(self, db, max_open_files=4, chunk_size=DOWNLOAD_CHUNK_SIZE, statistics=None, cache=None):
+		self.db = db
+		self.cache = cache
+		self.max_open_files = max(1, max_open_files)
+		self.chunk_size = chunk_size
+		self.statistics = statistics
+		self.lock = threading.Lock()
+		self.queue = deque()  # (file ID, result) of downloads that wait for a reader
+		self.open_files = 0
+
+	def list_files(self, database_object_id):
+		result = Result()
+		self.db.begin_listFiles(database_object_id,
+			_response=lambda files: result.set(files),
+			_ex=lambda ex: result.set(error=ex))
+		return result
+
+	def download(self, file_id):
+		result = Result()
+		with self.lock:
+			self.queue.append((file_id, result))
+		self.open_next()
+		return result
+
+	def open_next(self):
+		while True:
+			with self.lock:
+				if len(self.queue) == 0 or self.open_files >= self.max_open_files:
+					return
+				file_id, result = self.queue.popleft()
+				self.open_files += 1
+			try:
+				self.db.begin_getFileReader(file_id,
+					_response=lambda reader, file_id=file_id, result=result: self.guarded(reader, result, self.start_reading)(reader, file_id, result),
+					_ex=lambda ex, file_id=file_id, result=result: self.open_failed(ex, file_id, result))
+			except Exception as ex:
+				self.open_failed(ex, file_id, result)
+
+	def open_failed(self, ex, file_id, result):
+		MotionDatabase = load_motion_database_module()
+		with self.lock:
+			self.open_files -= 1
+			if not isinstance(ex, MotionDatabase.TooManyOpenFilesException):
+				retry = None
+			else:
+				# The database has a limit of its own, which also counts files that other clients have opened.
+				self.max_open_files = max(1, self.open_files)
+				self.queue.appendleft((file_id, result))
+				retry = self.open_files == 0
+		if retry is None:
+			result.set(error=ex)
+			self.open_next()
+		elif retry:
+			# Nothing will be closed that would trigger the retry, so try again later.
+			timer = threading.Timer(TOO_MANY_OPEN_FILES_RETRY_INTERVAL, self.open_next)
+			timer.daemon = True
+			timer.start()
+
+	def start_reading(self, reader, file_id, result):
+		def response(size):
+			data = self.cache.get(file_id, size) if self.cache is not None else None
+			if data is None:
+				self.read_chunk(reader, file_id, result, ChunkedDownload(size, chunk_size=self.chunk_size))
+				return
+			if self.statistics is not None:
+				self.statistics.add_cached(size)
+			self.finish(reader, result, data=data)
+		reader.begin_getSize(_response=self.guarded(reader, result, response), _ex=lambda ex: self.finish(reader, result, error=ex))
+
+	def read_chunk(self, reader, file_id, result, download):
+		if download.done():
+			if self.statistics is not None:
+				self.statistics.add(download)
+			data = download.data()
+			if self.cache is not None:
+				self.cache.put(file_id, data)
+			self.finish(reader, result, data=data)
+			return
+		if download.needs_seek:
+			def seeked():
+				download.needs_seek = False
+				self.read_chunk(reader, file_id, result, download)
+			reader.begin_seek(download.position, _response=self.guarded(reader, result, seeked),
+				_ex=self.guarded(reader, result, lambda ex: self.read_failed(reader, file_id, result, download, ex)))
+			return
+
+		def response(chunk):
+			if download.add_chunk(chunk):
+				self.read_chunk(reader, file_id, result, download)
+			else:
+				self.finish(reader, result, error=EOFError('file ended after {} of {} bytes'.format(download.position, download.size)))
+		reader.begin_readChunk(download.next_chunk_size(), _response=self.guarded(reader, result, response),
+			_ex=self.guarded(reader, result, lambda ex: self.read_failed(reader, file_id, result, download, ex)))
+
+	def read_failed(self, reader, file_id, result, download, ex):
+		if not download.retry(ex):
+			self.finish(reader, result, error=ex)
+			return
+		timer = threading.Timer(download.retry_delay(), self.guarded(reader, result, self.read_chunk), (reader, file_id, result, download))
+		timer.daemon = True
+		timer.start()
+
+	def guarded(self, reader, result, callback):
+		# Returns a callback that finishes the download if `callback` raises, so that nobody waits for it in vain.
+		def call(*args):
+			try:
+				callback(*args)
+			except Exception as ex:
+				self.finish(reader, result, error=ex)
+		return call
+
+	def finish(self, reader, result, data=None, error=None):
+		with self.lock:
+			if result.event.is_set():
+				# Finished already, before a callback failed.
+				return
+			self.open_files -= 1
+			result.set(data, error)
+		try:
+			reader.begin_destroy()
+		except Exception:
+			# The reader is closed together with the session anyway.
+			pass
+		self.open_next()
+
+
+class SessionKeepAlive(threading.Thread):
+	# Glacier2 destroys sessions that have been idle for longer than their timeout. Downloads usually keep the session
+	# busy, but parsing a batch of large motions might take a while.
+	def __init__(self, db, interval=None):
+		super(SessionKeepAlive, self).__init__()
+		self.daemon = True
+		self.db = db
+		self.interval = interval if interval is not None else self.default_interval(db)
+		self.stopped = threading.Event()
+
+	@staticmethod
+	def default_interval(db):
+		import Glacier2
+		router = db.ice_getCommunicator().getDefaultRouter()
+		if router is None:
+			return 30.
+		timeout = Glacier2.RouterPrx.uncheckedCast(router).getSessionTimeout()
+		return max(1., timeout / 2.) if timeout > 0 else 30.
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			self.db.begin_ice_ping(_ex=lambda ex: None)
+
+	def stop(self):
+		self.stopped.set()
+
+
+def download_motion_files(scheduler, motions, select_files, lookahead=8, timeout=DOWNLOAD_TIMEOUT):
+	"""Downloads the files of the motions in order, while already downloading those of the next motions.
+
+	`select_files(motion, files)` returns the (C3D file, MMM file) pairs that should be downloaded. This is called
+	from the calling thread, so it may use the database connection. Yields every motion together with a list of
+	(C3D file, C3D data, MMM data) tuples and the first error; the data is None if the download failed or took longer
+	than `timeout` seconds. If the files of the motion could not be listed, the list is empty.
+	"""
+	file_lists = deque(scheduler.list_files(motion.id) for motion in motions[:lookahead + 1])
+	next_listed = len(file_lists)
+	downloads = deque()
+	for idx, motion in enumerate(motions):
+		# Queue the downloads of this and the next `lookahead` motions, so that there is always something to transfer
+		# while the current motion is parsed.
+		while len(downloads) <= lookahead and idx + len(downloads) < len(motions):
+			listed_motion = motions[idx + len(downloads)]
+			files, error = file_lists.popleft().get(timeout)
+			if next_listed < len(motions):
+				file_lists.append(scheduler.list_files(motions[next_listed].id))
+				next_listed += 1
+			pairs = select_files(listed_motion, files) if error is None else []
+			downloads.append((error, [(c3d_file, scheduler.download(c3d_file.id), scheduler.download(mmm_file.id)) for c3d_file, mmm_file in pairs]))
+		error, results = downloads.popleft()
+		downloaded_files = []
+		for c3d_file, c3d_result, mmm_result in results:
+			c3d_data, c3d_error = c3d_result.get(timeout)
+			mmm_data, mmm_error = mmm_result.get(timeout)
+			downloaded_files.append((c3d_file, c3d_data, mmm_data))
+			if error is None:
+				error = c3d_error if c3d_error is not None else mmm_error
+		yield motion, downloaded_files, error
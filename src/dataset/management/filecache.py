@@ -0,0 +1,155 @@
+import hashlib
+import os
+import shutil
+import threading
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+from dataset.compression import write_atomically
+from dataset.management.util import read_file
+
+
+HASH_BLOCK_SIZE = 1048576
+
+
+def hash_file(path):
+	sha1 = hashlib.sha1()
+	with open(path, 'rb') as f:
+		for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+			sha1.update(block)
+	return sha1.hexdigest()
+
+
+class FileCache(object):
+	"""An on-disk cache of raw files from the motion database that is shared by all management commands.
+
+	Files are stored under the hash of their content in `objects/`, and `files/<file ID>` refers to the hash and size
+	of the file it was downloaded as. The database does not tell when a file has been modified, so a cached file is
+	used as long as its size matches the one reported by the file reader. The modification time of the stored files
+	is updated whenever they are used; once the cache grows beyond `max_size` bytes, the least recently used ones are
+	removed.
+	"""
+
+	def __init__(self, root, max_size):
+		self.root = root
+		self.max_size = max_size
+		self.objects_path = os.path.join(root, 'objects')
+		self.files_path = os.path.join(root, 'files')
+		for path in [self.objects_path, self.files_path]:
+			if not os.path.isdir(path):
+				os.makedirs(path)
+		self.lock = threading.Lock()
+		self.size = sum(os.path.getsize(os.path.join(self.objects_path, name)) for name in os.listdir(self.objects_path))
+
+	def lookup(self, file_id, size):
+		# Returns the path of the cached file or None.
+		ref_path = os.path.join(self.files_path, str(file_id))
+		try:
+			with open(ref_path, 'r') as f:
+				cached_size, digest = f.read().split()
+			path = os.path.join(self.objects_path, digest)
+			if int(cached_size) != size or os.path.getsize(path) != size:
+				return None
+			os.utime(path, None)
+		except (IOError, OSError, ValueError):
+			# Not cached yet or evicted in the meantime.
+			return None
+		return path
+
+	def open_file(self, file_id, size):
+		# Returns the cached file opened for reading or None. Other commands might evict the file at any time, but
+		# it stays readable through the open file.
+		path = self.lookup(file_id, size)
+		if path is None:
+			return None
+		try:
+			return open(path, 'rb')
+		except IOError:
+			return None
+
+	def get(self, file_id, size):
+		f = self.open_file(file_id, size)
+		if f is None:
+			return None
+		with f:
+			data = f.read()
+		if hashlib.sha1(data).hexdigest() != os.path.basename(f.name):
+			return None
+		return data
+
+	def put(self, file_id, data):
+		with NamedTemporaryFile(dir=self.root, delete=False) as f:
+			f.write(data)
+		return self.put_file(file_id, f.name)
+
+	def put_file(self, file_id, tmp_path):
+		"""Moves a downloaded file into the cache. Returns its path in the cache."""
+		digest = hash_file(tmp_path)
+		size = os.path.getsize(tmp_path)
+		path = os.path.join(self.objects_path, digest)
+		os.chmod(tmp_path, 0o644)
+		with self.lock:
+			if not os.path.exists(path):
+				self.size += size
+			# Replace existing files with the same content anyway, in case they have been corrupted.
+			os.rename(tmp_path, path)
+		write_atomically(os.path.join(self.files_path, str(file_id)), '{} {}'.format(size, digest))
+		self.evict(keep=path)
+		return path
+
+	def download(self, reader, file_id, path, statistics=None):
+		"""Copies a file to `path`, but only downloads it through the reader if it is not in the cache.
+
+		Returns its size or None if the download failed.
+		"""
+		size = reader.getSize()
+		cached_file = self.open_file(file_id, size)
+		if cached_file is not None:
+			with cached_file, open(path, 'wb') as f:
+				shutil.copyfileobj(cached_file, f)
+			if statistics is not None:
+				statistics.add_cached(size)
+			return size
+
+		with NamedTemporaryFile(dir=self.root, delete=False) as f:
+			downloaded_size = read_file(reader, f, statistics=statistics)
+		if downloaded_size is None:
+			os.remove(f.name)
+			return None
+		# Copy the file before it is in the cache, where it could be evicted right away.
+		shutil.copyfile(f.name, path)
+		self.put_file(file_id, f.name)
+		return size
+
+	def evict(self, keep=None):
+		# Removes the least recently used files until the cache fits into its size again. Other commands might use the
+		# cache at the same time, so the size is recomputed from the files that are actually there.
+		with self.lock:
+			if self.size <= self.max_size:
+				return
+			files = []
+			for name in os.listdir(self.objects_path):
+				path = os.path.join(self.objects_path, name)
+				try:
+					stat = os.stat(path)
+				except OSError:
+					continue
+				files.append((stat.st_mtime, stat.st_size, path))
+			self.size = sum(size for _, size, _ in files)
+			for _, size, path in sorted(files):
+				if self.size <= self.max_size:
+					break
+				if path == keep:
+					continue
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+				self.size -= size
+
+
+def default_file_cache():
+	# Returns None if the cache has been disabled in the settings.
+	if not settings.MOTION_DB_CACHE_ROOT or settings.MOTION_DB_CACHE_MAX_SIZE <= 0:
+		return None
+	return FileCache(settings.MOTION_DB_CACHE_ROOT, settings.MOTION_DB_CACHE_MAX_SIZE)
@@ -0,0 +1,101 @@
+import cPickle as pickle
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+
+
+# Calls of the `MotionDatabaseSession` that only read metadata and can therefore be cached. Files are never cached,
+# because their visibility decides what may be imported and published and can be changed in the database at any time.
+CACHED_METHODS = ['countMotions', 'listMotions', 'getMotion']
+
+
+class CachedMotionDatabase(object):
+	"""Wraps a `MotionDatabaseSession` proxy and caches the results of metadata calls in an SQLite database.
+
+	Results are reused by later commands for `max_age` seconds. This applies to the synchronous calls in
+	`CACHED_METHODS` as well as to their asynchronous variants (e.g. `begin_listMotions`), which invoke the response
+	callback right away if the result is cached. All other calls, e.g. to read files, go to the database.
+	"""
+
+	def __init__(self, db, path, max_age):
+		self.db = db
+		self.max_age = max_age
+		directory = os.path.dirname(os.path.abspath(path))
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		# Responses of asynchronous calls are stored from Ice's threads.
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(path, check_same_thread=False)
+		with self.lock, self.connection:
+			self.connection.execute('CREATE TABLE IF NOT EXISTS results (method TEXT, arguments TEXT, value BLOB, '
+				'created REAL, PRIMARY KEY (method, arguments))')
+			self.connection.execute('DELETE FROM results WHERE created < ?', (time.time() - max_age,))
+
+	def __getattr__(self, name):
+		if name in CACHED_METHODS:
+			return partial(self.call, name)
+		if name.startswith('begin_') and name[len('begin_'):] in CACHED_METHODS:
+			return partial(self.begin_call, name[len('begin_'):])
+		return getattr(self.db, name)
+
+	def lookup(self, method, arguments):
+		# Returns whether the result is cached and the result itself.
+		with self.lock:
+			row = self.connection.execute('SELECT value FROM results WHERE method = ? AND arguments = ? AND created >= ?',
+				(method, arguments, time.time() - self.max_age)).fetchone()
+		if row is None:
+			return False, None
+		return True, pickle.loads(str(row[0]))
+
+	def store(self, method, arguments, value):
+		with self.lock, self.connection:
+			self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+				(method, arguments, sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), time.time()))
+
+	def call(self, method, *args):
+		arguments = json.dumps(args)
+		cached, value = self.lookup(method, arguments)
+		if not cached:
+			value = getattr(self.db, method)(*args)
+			self.store(method, arguments, value)
+		return value
+
+	def begin_call(self, method, *args, **kwargs):
+		arguments = json.dumps(args)
+		cached, value = self.lookup(method, arguments)
+		response = kwargs.pop('_response', None)
+		if cached:
+			if response is not None:
+				response(value)
+			return
+
+		def store_response(value):
+			self.store(method, arguments, value)
+			if response is not None:
+				response(value)
+		getattr(self.db, 'begin_' + method)(*args, _response=store_response, **kwargs)
+
+	def invalidate(self, method=None):
+		with self.lock, self.connection:
+			if method is None:
+				self.connection.execute('DELETE FROM results')
+			else:
+				self.connection.execute('DELETE FROM results WHERE method = ?', (method,))
+
+
+def cached_motion_database(db, refresh=False):
+	"""Wraps the database in a `CachedMotionDatabase`, unless the cache has been disabled in the settings.
+
+	If `refresh` is set, all cached results are discarded first.
+	"""
+	if not settings.MOTION_DB_METADATA_CACHE_PATH or settings.MOTION_DB_METADATA_MAX_AGE <= 0:
+		return db
+	cached_db = CachedMotionDatabase(db, settings.MOTION_DB_METADATA_CACHE_PATH, settings.MOTION_DB_METADATA_MAX_AGE)
+	if refresh:
+		cached_db.invalidate()
+	return cached_db
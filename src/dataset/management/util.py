@@ -1,5 +1,70 @@
+import os
+import sys
+import threading
+import time
+
+
 DOWNLOAD_CHUNK_SIZE = 32768
+MIN_DOWNLOAD_CHUNK_SIZE = 4096
+MAX_DOWNLOAD_CHUNK_SIZE = 524288  # below Ice's default message size limit of 1 MB
+DOWNLOAD_MAX_RETRIES = 5
+DOWNLOAD_RETRY_INTERVAL = 1.  # in seconds, multiplied by the number of retries so far
+DOWNLOAD_TIMEOUT = 600.  # in seconds, for the scheduled downloads of a single file
 FETCH_LIMIT = 200
+ICE_CLIENT_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'commands', 'client.cfg'))
+ICE_SLICE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'commands', 'MotionDatabase.ice'))
+
+_motion_database_module = None
+
+
+def load_motion_database_module():
+	# Compiling the Slice definitions is expensive, so only do it once a command actually talks to the database.
+	global _motion_database_module
+	if _motion_database_module is None:
+		import Ice
+		Ice.loadSlice('-I%s %s' % (Ice.getSliceDir(), ICE_SLICE_PATH))
+		import MotionDatabase
+		_motion_database_module = MotionDatabase
+	return _motion_database_module
+
+
+def initialize_ice(router=True):
+	import Ice
+
+	properties = Ice.createProperties(sys.argv)
+	properties.load(ICE_CLIENT_CONFIG_PATH)
+	if not router:
+		properties.setProperty('Ice.Default.Router', '')
+	# Replies of asynchronous invocations are dispatched by the client thread pool, so that several downloads can
+	# be processed at once.
+	properties.setProperty('Ice.ThreadPool.Client.Size', '4')
+	properties.setProperty('Ice.ThreadPool.Client.SizeMax', '8')
+	init_data = Ice.InitializationData()
+	init_data.properties = properties
+	return Ice.initialize(init_data)
+
+
+def connect(username, password):
+	import Glacier2
+	MotionDatabase = load_motion_database_module()
+
+	# Configure Ice and Connect to database.
+	ic = initialize_ice()
+	router = Glacier2.RouterPrx.checkedCast(ic.getDefaultRouter())
+	session = router.createSession(username, password)
+	db = MotionDatabase.MotionDatabaseSessionPrx.checkedCast(session)
+	return db
+
+
+def connect_directly(proxy):
+	# Bypasses Glacier2, e.g. to talk to a local stand-in of the database.
+	MotionDatabase = load_motion_database_module()
+	ic = initialize_ice(router=False)
+	return MotionDatabase.MotionDatabaseSessionPrx.checkedCast(ic.stringToProxy(proxy))
+
+
+def is_public(file):
+	return file.visibility == load_motion_database_module().VisibilityLevel.Public
 
 
 def count_motions(db, project_ids=None, institution_ids=None, description_filter=None):
@@ -24,16 +89,139 @@ def fetch_motions(db, project_ids=None, institution_ids=None, description_filter
 	return motions
 
 
-def read_file(reader):
-	size = reader.getSize()
-	data = ''
+def is_chunk_size_error(ex):
+	# Chunks that are too large are refused by the server or by Ice. A MemoryLimitException on the server reaches us
+	# as an UnknownLocalException.
+	import Ice
+	MotionDatabase = load_motion_database_module()
+	return isinstance(ex, (Ice.MemoryLimitException, Ice.UnknownLocalException, MotionDatabase.InvalidParameterException))
+
+
+def is_transient_error(ex):
+	import Ice
+	MotionDatabase = load_motion_database_module()
+	return isinstance(ex, (Ice.TimeoutException, Ice.SocketException, MotionDatabase.InternalErrorException))
+
+
+class ChunkedDownload(object):
+	"""Keeps track of a download through a `FileReader`, so that it can be resumed after an error.
+
+	The data is written into a buffer that is allocated up front or, if a file object is given, into the file. The
+	chunk size is doubled after every chunk up to `MAX_DOWNLOAD_CHUNK_SIZE`. If a chunk is refused because of its
+	size, the chunk size is halved and kept below that size from then on. After transient errors, the download is
+	resumed at the same position up to `max_retries` times. Either way, the reader has to seek to `position` before
+	the next chunk is read, which `needs_seek` indicates.
+	"""
+
+	def __init__(self, size, f=None, chunk_size=DOWNLOAD_CHUNK_SIZE, max_retries=DOWNLOAD_MAX_RETRIES):
+		self.size = size
+		self.f = f
+		self.buffer = bytearray(size) if f is None else None
+		self.position = 0
+		self.chunk_size = chunk_size
+		self.max_chunk_size = MAX_DOWNLOAD_CHUNK_SIZE
+		self.retries = 0
+		self.max_retries = max_retries
+		self.needs_seek = False
+		self.start_time = time.time()
+
+	def done(self):
+		return self.position >= self.size
+
+	def next_chunk_size(self):
+		return min(self.chunk_size, self.size - self.position)
+
+	def add_chunk(self, chunk):
+		# Returns False if the file ended early.
+		if len(chunk) == 0:
+			return False
+		chunk = chunk[:self.size - self.position]
+		if self.f is None:
+			self.buffer[self.position:self.position + len(chunk)] = chunk
+		else:
+			self.f.write(chunk)
+		self.position += len(chunk)
+		self.chunk_size = min(2 * self.chunk_size, self.max_chunk_size)
+		return True
+
+	def retry(self, ex):
+		# Returns True if the download should be resumed after the error.
+		if is_chunk_size_error(ex) and self.chunk_size > MIN_DOWNLOAD_CHUNK_SIZE:
+			self.chunk_size = max(MIN_DOWNLOAD_CHUNK_SIZE, min(self.chunk_size, self.next_chunk_size()) // 2)
+			self.max_chunk_size = self.chunk_size
+		elif is_transient_error(ex) and self.retries < self.max_retries:
+			self.retries += 1
+		else:
+			return False
+		self.needs_seek = True
+		return True
+
+	def retry_delay(self):
+		return DOWNLOAD_RETRY_INTERVAL * self.retries
+
+	def data(self):
+		return str(self.buffer) if self.f is None else self.position
+
+
+class DownloadStatistics(object):
+	# Collects the downloaded bytes of several, possibly concurrent, downloads.
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.size = 0
+		self.files = 0
+		self.retries = 0
+		self.cached_size = 0
+		self.cached_files = 0
+		self.start_time = None
+		self.end_time = None
+
+	def add(self, download):
+		with self.lock:
+			self.size += download.position
+			self.files += 1
+			self.retries += download.retries
+			self.start_time = min(self.start_time or download.start_time, download.start_time)
+			self.end_time = time.time()
+
+	def add_cached(self, size):
+		# Files that did not have to be downloaded since they were in the cache.
+		with self.lock:
+			self.cached_size += size
+			self.cached_files += 1
+
+	def throughput(self):
+		# In bytes per second, from the start of the first download to the end of the last one.
+		if self.start_time is None or self.end_time <= self.start_time:
+			return 0.
+		return self.size / (self.end_time - self.start_time)
+
+	def __str__(self):
+		return '{} files, {:.1f} MB at {:.2f} MB/s, {} retries, {} files ({:.1f} MB) from the cache'.format(self.files,
+			self.size / 1e6, self.throughput() / 1e6, self.retries, self.cached_files, self.cached_size / 1e6)
+
+
+def read_file(reader, f=None, statistics=None):
+	"""Downloads a file through a `FileReader` and resumes it after transient errors (see `ChunkedDownload`).
+
+	Returns the data or, if a file object is given, writes the data into it and returns its size. Returns None if the
+	download failed.
+	"""
+	import Ice
 	try:
-		# We cannot just read the entire file b/c readChunk() seems to have an limit.
-		remaining_size = size
-		while remaining_size > 0:
-			s = min(remaining_size, DOWNLOAD_CHUNK_SIZE)
-			data += reader.readChunk(s)
-			remaining_size -= s
-	except:
-		data = None
-	return data
+		download = ChunkedDownload(reader.getSize(), f)
+	except Ice.Exception:
+		return None
+	while not download.done():
+		try:
+			if download.needs_seek:
+				reader.seek(download.position)
+				download.needs_seek = False
+			if not download.add_chunk(reader.readChunk(download.next_chunk_size())):
+				return None
+		except Ice.Exception as ex:
+			if not download.retry(ex):
+				return None
+			time.sleep(download.retry_delay())
+	if statistics is not None:
+		statistics.add(download)
+	return download.data()
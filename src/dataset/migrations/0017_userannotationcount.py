@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def populate_counts(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserAnnotationCount = apps.get_model('dataset', 'UserAnnotationCount')
+    users = User.objects.annotate(annotation_count=Count('annotation__id')).filter(annotation_count__gt=0)
+    UserAnnotationCount.objects.bulk_create([UserAnnotationCount(user_id=user.id, annotation_count=user.annotation_count) for user in users])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dataset', '0016_auto_20160614_1241'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAnnotationCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('annotation_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='userannotationcount',
+            index_together=set([('annotation_count', 'user')]),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
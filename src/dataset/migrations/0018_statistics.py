@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_missing_counts(apps, schema_editor):
+    # The leaderboard is paginated over the counters, so every user needs one (even without annotations).
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserAnnotationCount = apps.get_model('dataset', 'UserAnnotationCount')
+    users = User.objects.filter(userannotationcount__isnull=True)
+    UserAnnotationCount.objects.bulk_create([UserAnnotationCount(user_id=user.id, annotation_count=0) for user in users])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dataset', '0017_userannotationcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_motions', models.IntegerField(default=0)),
+                ('total_annotations', models.IntegerField(default=0)),
+                ('distinct_annotations', models.IntegerField(default=0)),
+                ('total_users', models.IntegerField(default=0)),
+                ('rebuild_date', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_missing_counts, migrations.RunPython.noop),
+    ]
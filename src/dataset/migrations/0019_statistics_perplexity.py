@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def delete_snapshot(apps, schema_editor):
+    # The snapshot is rebuilt from scratch the next time it is needed, which also computes the new fields.
+    Statistics = apps.get_model('dataset', 'Statistics')
+    Statistics.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataset', '0018_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistics',
+            name='perplexity_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='perplexity_sum',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(delete_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dataset', '0019_statistics_perplexity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MotionLease',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('expiration_date', models.DateTimeField()),
+                ('motion_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dataset.MotionFile')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='motionlease',
+            index_together=set([('motion_file', 'expiration_date')]),
+        ),
+    ]
@@ -1,15 +1,13 @@
 from __future__ import unicode_literals
+from datetime import timedelta
 from random import randint
 
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-from enchant import Dict
-from enchant.tokenize import get_tokenizer
-
-
-DICTIONARY = Dict('en_US')
-TOKENIZER = get_tokenizer('en_US')
+from .dictionary import get_dictionary
 
 
 def default_randomness():
@@ -37,6 +35,29 @@ class MotionFile(models.Model):
 	def __str__(self):
 		return self.filename
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super(MotionFile, cls).from_db(db, field_names, values)
+		# Remember the values as they were loaded so that the signal handlers can detect changes.
+		instance._loaded_values = dict(zip(field_names, values))
+		return instance
+
+	def save(self, *args, **kwargs):
+		super(MotionFile, self).save(*args, **kwargs)
+		# The signal handlers have seen the change at this point, so the saved values become the loaded ones.
+		self._loaded_values = dict((f.attname, getattr(self, f.attname)) for f in self._meta.concrete_fields)
+
+	def is_eligible(self):
+		# Only eligible motions are shown to annotators and count towards the statistics.
+		return not (self.is_hidden or self.is_broken_reported or self.is_broken_confirmed)
+
+	def was_eligible(self):
+		# Returns None if the motion was not loaded from the database.
+		loaded_values = getattr(self, '_loaded_values', None)
+		if loaded_values is None:
+			return None
+		return not (loaded_values['is_hidden'] or loaded_values['is_broken_reported'] or loaded_values['is_broken_confirmed'])
+
 
 class Annotation(models.Model):
 	class Meta:
@@ -53,8 +74,10 @@ class Annotation(models.Model):
 	def __str__(self):
 		return self.description
 
-	def is_valid(self):
-		words = [w[0] for w in TOKENIZER(self.description.lower())]
+	def is_valid(self, dictionary=None):
+		if dictionary is None:
+			dictionary = get_dictionary()
+		words = [w[0] for w in dictionary.tokenize(self.description.lower())]
 		n_words = len(words)
 		if n_words == 0:
 			# Return early to avoid problems with DIV by zero and such.
@@ -62,7 +85,7 @@ class Annotation(models.Model):
 		
 		unique_words = set(words)
 		n_unique_words = len(unique_words)
-		correct_unique_words = [w for w in unique_words if DICTIONARY.check(w)]
+		correct_unique_words = [w for w in unique_words if dictionary.check(w)]
 		n_correct_unique_words_words = len(correct_unique_words)
 		correct_ratio = (float(n_correct_unique_words_words) / float(n_unique_words))
 		n_punctuation_marks = self.description.count('.') + self.description.count('!') + self.description.count('?')
@@ -74,6 +97,118 @@ class Annotation(models.Model):
 		return is_valid
 
 
+class UserAnnotationCount(models.Model):
+	# Denormalized number of annotations per user, which is kept up-to-date by the signal handlers in
+	# `dataset.signals` so that ranking users does not require to aggregate over all annotations.
+	class Meta:
+		index_together = ('annotation_count', 'user')
+	user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+	annotation_count = models.PositiveIntegerField(default=0)
+
+	def __str__(self):
+		return '{}: {}'.format(self.user_id, self.annotation_count)
+
+	@classmethod
+	def count_for_user(cls, user):
+		try:
+			return cls.objects.get(user=user).annotation_count
+		except cls.DoesNotExist:
+			return 0
+
+	@classmethod
+	def rank_for_count(cls, annotation_count):
+		# Users with the same number of annotations share the same rank.
+		return cls.objects.filter(annotation_count__gt=annotation_count).count() + 1
+
+	@classmethod
+	def add(cls, user_id, delta):
+		updated = cls.objects.filter(user_id=user_id).update(annotation_count=models.F('annotation_count') + delta)
+		if updated == 0:
+			# The counter does not exist yet, create it from scratch.
+			annotation_count = Annotation.objects.filter(user_id=user_id).count()
+			cls.objects.get_or_create(user_id=user_id, defaults={'annotation_count': annotation_count})
+
+
+class MotionLease(models.Model):
+	# Reserves a motion for the user that is currently annotating it so that other users are assigned different
+	# motions in the meantime. Every user holds at most one lease, which is overwritten whenever the user is
+	# assigned the next motion.
+	class Meta:
+		index_together = ('motion_file', 'expiration_date')
+	user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+	motion_file = models.ForeignKey(MotionFile, on_delete=models.CASCADE)
+	expiration_date = models.DateTimeField()
+
+	def __str__(self):
+		return '{}: {} until {}'.format(self.user_id, self.motion_file_id, self.expiration_date)
+
+	@classmethod
+	def acquire(cls, user_id, motion_file_id):
+		expiration_date = timezone.now() + timedelta(seconds=settings.MOTION_LEASE_DURATION)
+		updated = cls.objects.filter(user_id=user_id).update(motion_file=motion_file_id, expiration_date=expiration_date)
+		if updated == 0:
+			# This is the first lease of the user.
+			cls.objects.update_or_create(user_id=user_id, defaults={'motion_file_id': motion_file_id, 'expiration_date': expiration_date})
+		return expiration_date
+
+	@classmethod
+	def active_lease(cls, motion_file_id, exclude_user_id=None):
+		q = cls.objects.filter(motion_file_id=motion_file_id, expiration_date__gt=timezone.now())
+		if exclude_user_id is not None:
+			q = q.exclude(user_id=exclude_user_id)
+		return q.first()
+
+
+class Statistics(models.Model):
+	# Snapshot of the overall statistics, which is updated incrementally by the signal handlers in
+	# `dataset.signals` and periodically rebuilt by the `updatestatistics` command. There is only a single row.
+	SNAPSHOT_ID = 1
+
+	total_motions = models.IntegerField(default=0)
+	total_annotations = models.IntegerField(default=0)
+	distinct_annotations = models.IntegerField(default=0)
+	total_users = models.IntegerField(default=0)
+	perplexity_sum = models.FloatField(default=0.)  # over all motions, including hidden and broken ones
+	perplexity_count = models.IntegerField(default=0)
+	rebuild_date = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return '{} annotations of {} motions by {} users'.format(self.total_annotations, self.total_motions, self.total_users)
+
+	@classmethod
+	def get(cls):
+		try:
+			return cls.objects.get(pk=cls.SNAPSHOT_ID)
+		except cls.DoesNotExist:
+			return cls.rebuild()
+
+	@classmethod
+	def rebuild(cls):
+		eligible_annotations = Annotation.objects.filter(motion_file__is_hidden=False, motion_file__is_broken_reported=False, motion_file__is_broken_confirmed=False)
+		snapshot = cls(pk=cls.SNAPSHOT_ID)
+		snapshot.total_motions = MotionFile.objects.filter(is_hidden=False, is_broken_reported=False, is_broken_confirmed=False).count()
+		snapshot.total_annotations = eligible_annotations.count()
+		snapshot.distinct_annotations = eligible_annotations.values('motion_file_id').distinct().count()
+		snapshot.total_users = User.objects.count()
+		perplexity = MotionFile.objects.aggregate(models.Sum('mean_perplexity'), models.Count('id'))
+		snapshot.perplexity_sum = perplexity['mean_perplexity__sum'] or 0.
+		snapshot.perplexity_count = perplexity['id__count']
+		snapshot.save()
+		return snapshot
+
+	def mean_perplexity(self):
+		if self.perplexity_count <= 0:
+			return None
+		return self.perplexity_sum / float(self.perplexity_count)
+
+	@classmethod
+	def add(cls, **deltas):
+		# If there is no snapshot yet, it is built from scratch the next time it is needed.
+		updates = dict((name, models.F(name) + delta) for name, delta in deltas.items() if delta != 0)
+		if len(updates) > 0:
+			cls.objects.filter(pk=cls.SNAPSHOT_ID).update(**updates)
+
+
 class Dataset(models.Model):
 	creation_date = models.DateTimeField(auto_now_add=True)
 	filename = models.CharField(max_length=255, unique=True)
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import struct
+
+import numpy as np
+
+from .compression import write_atomically, write_compressed_variants
+
+
+MOTION_EXTENSION = '.motion'
+MOTION_MAGIC = b'MATMOTN1'
+MOTION_HEADER = struct.Struct('<8sIIIII')  # magic, encoding, header size, number of frames, number of markers, interval
+MOTION_FRAME_DTYPE = np.dtype('<f4')
+
+# Frames are either stored as float32 values or quantized, in which case most frames are stored as int16 deltas to
+# the previous frame.
+MOTION_ENCODING_FLOAT32 = 1
+MOTION_ENCODING_DELTA16 = 2
+
+QUANTIZATION_HEADER = struct.Struct('<fII')  # precision, keyframe interval, number of keyframes
+KEYFRAME_INDEX_DTYPE = np.dtype('<u4')
+KEYFRAME_DTYPE = np.dtype('<i4')
+DELTA_DTYPE = np.dtype('<i2')
+DEFAULT_KEYFRAME_INTERVAL = 100
+LEVEL_OF_DETAIL_RE = re.compile(r'\.\d+fps\.[^.]+$')
+
+
+def dumps(markers, frames, interval, marker_set, precision=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+	"""Serializes a motion into the binary motion format.
+
+	The fixed-size header is followed by the marker set identifier and the marker names, separated by newlines, and
+	padded so that the frames start at a multiple of four bytes. By default, the frames are stored as a single block
+	of little-endian float32 values, so that the viewer can use them as a `Float32Array` without any parsing. If
+	`precision` (in meters) is given, the frames are quantized instead (see `encode_delta16`).
+	"""
+	frames = np.ascontiguousarray(frames, dtype=MOTION_FRAME_DTYPE)
+	n_frames = frames.shape[0]
+	n_markers = len(markers)
+	assert frames.shape == (n_frames, 3 * n_markers)
+
+	if precision is None:
+		encoding = MOTION_ENCODING_FLOAT32
+		body = frames.tostring()
+	else:
+		encoding = MOTION_ENCODING_DELTA16
+		body = encode_delta16(frames, precision, keyframe_interval)
+
+	names = '\n'.join([marker_set] + list(markers)).encode('ascii')
+	header_size = MOTION_HEADER.size + len(names)
+	padding = -header_size % 4
+	header_size += padding
+	header = MOTION_HEADER.pack(MOTION_MAGIC, encoding, header_size, n_frames, n_markers, int(interval))
+	return b''.join([header, names, b'\0' * padding, body])
+
+
+def loads(data):
+	magic, encoding, header_size, n_frames, n_markers, interval = MOTION_HEADER.unpack_from(data, 0)
+	if magic != MOTION_MAGIC:
+		raise ValueError('data is not a motion')
+	names = data[MOTION_HEADER.size:header_size].rstrip(b'\0').decode('ascii').split('\n')
+	if encoding == MOTION_ENCODING_FLOAT32:
+		frames = np.frombuffer(data, dtype=MOTION_FRAME_DTYPE, count=n_frames * n_markers * 3, offset=header_size)
+		frames = frames.reshape(n_frames, n_markers * 3)
+	elif encoding == MOTION_ENCODING_DELTA16:
+		frames = decode_delta16(data, header_size, n_frames, n_markers * 3)
+	else:
+		raise ValueError('unknown motion encoding {}'.format(encoding))
+	return {
+		'markers': names[1:],
+		'frames': frames,
+		'interval': interval,
+		'marker_set': names[0],
+		'encoding': encoding,
+	}
+
+
+def dump(markers, frames, interval, marker_set, f, **kwargs):
+	f.write(dumps(markers, frames, interval, marker_set, **kwargs))
+
+
+def load(f):
+	return loads(f.read())
+
+
+def content_filename(data, extension=MOTION_EXTENSION):
+	# Motions are addressed by the hash of their content, so that their URLs change whenever their content does and
+	# they can be cached forever.
+	return hashlib.sha1(data).hexdigest() + extension
+
+
+def save(directory, markers, frames, interval, marker_set, levels_of_detail=(), **kwargs):
+	"""Writes the motion, its levels of detail and their compressed variants into the directory.
+
+	The motion is named after the hash of its content and its levels of detail after the motion. `levels_of_detail`
+	are frame rates, but only levels below the frame rate of the motion itself are written. Returns the filename.
+	"""
+	data = dumps(markers, frames, interval, marker_set, **kwargs)
+	filename = content_filename(data)
+	path = os.path.join(directory, filename)
+	# Identical motions might be written by several import workers at once.
+	write_atomically(path, data)
+	write_compressed_variants(path, data)
+
+	for fps in sorted(levels_of_detail, reverse=True):
+		level_interval = int(round(1000. / fps))
+		if level_interval <= interval:
+			continue
+		level_frames = resample(np.asarray(frames, dtype='float64'), interval, level_interval)
+		level_data = dumps(markers, level_frames, level_interval, marker_set, **kwargs)
+		level_path = level_of_detail_path(path, fps)
+		write_atomically(level_path, level_data)
+		write_compressed_variants(level_path, level_data)
+	return filename
+
+
+def level_of_detail_path(path, fps):
+	# Levels of detail are stored next to the motion, e.g. "<hash>.15fps.motion".
+	root, extension = os.path.splitext(path)
+	return '{}.{}fps{}'.format(root, fps, extension)
+
+
+def is_level_of_detail(path):
+	return LEVEL_OF_DETAIL_RE.search(path) is not None
+
+
+def resample(frames, interval, target_interval):
+	"""Resamples the frames from one interval to another (both in milliseconds) by linear interpolation."""
+	n_frames = len(frames)
+	if n_frames < 2:
+		return frames
+	lower, weights = resampling_weights(n_frames, interval, target_interval)
+	weights = weights[:, np.newaxis]
+	return frames[lower] * (1. - weights) + frames[lower + 1] * weights
+
+
+def resampling_weights(n_frames, interval, target_interval):
+	# Every resampled frame interpolates between the frames `lower` and `lower + 1` with the given weight of the
+	# latter. The weights are all zero if the target interval is a multiple of the interval.
+	if n_frames < 2:
+		return np.arange(n_frames), np.zeros(n_frames)
+	duration = (n_frames - 1) * interval
+	positions = np.arange(0., duration + 1e-6, target_interval) / interval  # fractional indices into the frames
+	lower = np.minimum(np.floor(positions).astype('int64'), n_frames - 2)
+	return lower, positions - lower
+
+
+def encode_delta16(frames, precision, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+	"""Quantizes the frames relative to their bounding box and stores them as frame-to-frame deltas.
+
+	Every `keyframe_interval`-th frame is stored as absolute int32 values, all other frames as the int16 difference
+	to the previous frame. Frames whose difference does not fit into an int16 become keyframes as well. Since the
+	deltas are taken between quantized values, errors do not accumulate and are bounded by half the precision.
+
+	The layout is: the quantization header, the origin of the bounding box (one float32 per coordinate), the keyframe
+	indices (uint32), the keyframes (int32) and finally the deltas of all other frames (int16).
+	"""
+	n_frames, stride = frames.shape
+	origin = frames.min(axis=0) if n_frames > 0 else np.zeros(stride, dtype=MOTION_FRAME_DTYPE)
+	quantized = np.round((frames - origin) / precision).astype('int64')
+
+	deltas = np.zeros_like(quantized)
+	deltas[1:] = quantized[1:] - quantized[:-1]
+	is_keyframe = np.arange(n_frames) % keyframe_interval == 0
+	is_keyframe |= np.abs(deltas).max(axis=1) > np.iinfo(DELTA_DTYPE).max
+	keyframe_indexes = np.flatnonzero(is_keyframe)
+
+	return b''.join([
+		QUANTIZATION_HEADER.pack(precision, keyframe_interval, len(keyframe_indexes)),
+		origin.astype(MOTION_FRAME_DTYPE).tostring(),
+		keyframe_indexes.astype(KEYFRAME_INDEX_DTYPE).tostring(),
+		quantized[is_keyframe].astype(KEYFRAME_DTYPE).tostring(),
+		deltas[~is_keyframe].astype(DELTA_DTYPE).tostring(),
+	])
+
+
+def decode_delta16(data, offset, n_frames, stride):
+	precision, _, n_keyframes = QUANTIZATION_HEADER.unpack_from(data, offset)
+	offset += QUANTIZATION_HEADER.size
+	origin = np.frombuffer(data, dtype=MOTION_FRAME_DTYPE, count=stride, offset=offset)
+	offset += origin.nbytes
+	keyframe_indexes = np.frombuffer(data, dtype=KEYFRAME_INDEX_DTYPE, count=n_keyframes, offset=offset)
+	offset += keyframe_indexes.nbytes
+	keyframes = np.frombuffer(data, dtype=KEYFRAME_DTYPE, count=n_keyframes * stride, offset=offset)
+	offset += keyframes.nbytes
+	deltas = np.frombuffer(data, dtype=DELTA_DTYPE, count=(n_frames - n_keyframes) * stride, offset=offset)
+
+	# Put keyframes and deltas back in order and integrate the deltas, restarting at every keyframe. Since the
+	# keyframes are stored as absolute values, this is a cumulative sum per segment between keyframes.
+	is_keyframe = np.zeros(n_frames, dtype=bool)
+	is_keyframe[keyframe_indexes] = True
+	values = np.empty((n_frames, stride), dtype='int64')
+	values[is_keyframe] = keyframes.reshape(-1, stride)
+	values[~is_keyframe] = deltas.reshape(-1, stride)
+	segment_starts = np.cumsum(is_keyframe) - 1
+	cumulative = np.cumsum(values, axis=0)
+	offsets = cumulative[keyframe_indexes] - values[keyframe_indexes]
+	quantized = cumulative - offsets[segment_starts]
+	return origin + quantized.astype(MOTION_FRAME_DTYPE) * MOTION_FRAME_DTYPE.type(precision)
+
+
+def max_error(frames, decoded_frames):
+	if len(frames) == 0:
+		return 0.
+	return float(np.abs(np.asarray(frames, dtype='float64') - decoded_frames).max())
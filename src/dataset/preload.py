@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import connections
+
+from .auth import inject_pyopenssl
+from .dictionary import get_dictionary
+from .sampler import get_sampler
+
+
+def preload():
+	"""Initializes everything that is otherwise loaded lazily on first use.
+
+	Call this in the master process of a pre-forking WSGI server (see `PRELOAD_ON_STARTUP`), so that the workers
+	share the loaded data instead of each of them paying for it on their first request.
+	"""
+	get_dictionary()
+	get_sampler()
+	if 'dataset.auth.RedmineBackend' in settings.AUTHENTICATION_BACKENDS:
+		inject_pyopenssl()
+
+	# Database connections must not be shared with the forked workers.
+	connections.close_all()
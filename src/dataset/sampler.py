@@ -0,0 +1,279 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import MotionFile, Annotation, MotionLease
+from .structures import IndexedSet, SortedIntArray, WeightedIndex
+
+
+MAX_REJECTIONS = 32
+MAX_SELECTION_ATTEMPTS = 8
+
+
+class ExcludedMotions(object):
+	# Combines the motions a user has already annotated with a few others, e.g. the motion they have just skipped.
+	def __init__(self, annotated, exclude_ids=()):
+		self.annotated = annotated
+		self.exclude_ids = frozenset(i for i in exclude_ids if i is not None)
+
+	def __contains__(self, motion_file_id):
+		return motion_file_id in self.exclude_ids or motion_file_id in self.annotated
+
+	def __iter__(self):
+		for motion_file_id in self.exclude_ids:
+			yield motion_file_id
+		for motion_file_id in self.annotated:
+			yield motion_file_id
+
+
+class MotionSampler(object):
+	"""In-memory index of the motions that can be annotated.
+
+	The sampler is built once per process from a single query and afterwards kept up-to-date by the signal
+	handlers in `dataset.signals`. Changes made by other processes are picked up when the sampler is rebuilt
+	after `settings.MOTION_SAMPLER_MAX_AGE` seconds.
+	"""
+
+	def __init__(self):
+		self.lock = threading.RLock()
+		self.eligible = WeightedIndex()  # weighted by mean perplexity
+		self.unannotated = IndexedSet()
+		self.annotation_counts = {}
+		self.user_annotations = OrderedDict()
+		self.leases = {}  # motion file ID -> (user ID, expiration date)
+		self.user_leases = {}  # user ID -> motion file ID
+		self.build_time = None
+
+	def build(self):
+		q = MotionFile.objects.filter(is_hidden=False, is_broken_reported=False, is_broken_confirmed=False)
+		q = q.annotate(annotation_count=Count('annotation__id'))
+		rows = list(q.values_list('id', 'annotation_count', 'mean_perplexity'))
+		leases = MotionLease.objects.filter(expiration_date__gt=timezone.now())
+		leases = list(leases.values_list('motion_file_id', 'user_id', 'expiration_date'))
+		with self.lock:
+			self.eligible = WeightedIndex((motion_file_id, max(0., mean_perplexity)) for motion_file_id, _, mean_perplexity in rows)
+			self.unannotated = IndexedSet(motion_file_id for motion_file_id, annotation_count, _ in rows if annotation_count == 0)
+			self.annotation_counts = dict((motion_file_id, annotation_count) for motion_file_id, annotation_count, _ in rows)
+			self.user_annotations.clear()
+			self.leases = dict((motion_file_id, (user_id, expiration_date)) for motion_file_id, user_id, expiration_date in leases)
+			self.user_leases = dict((user_id, motion_file_id) for motion_file_id, user_id, _ in leases)
+			self.build_time = time.time()
+
+	def is_stale(self):
+		return self.build_time is None or time.time() - self.build_time > settings.MOTION_SAMPLER_MAX_AGE
+
+	def annotated_by(self, user_id):
+		with self.lock:
+			motion_file_ids = self.user_annotations.pop(user_id, None)
+			if motion_file_ids is None:
+				q = Annotation.objects.filter(user_id=user_id).values_list('motion_file_id', flat=True)
+				motion_file_ids = SortedIntArray(q)
+			self.user_annotations[user_id] = motion_file_ids  # (re-)insert as most recently used
+			while len(self.user_annotations) > settings.MOTION_SAMPLER_USER_CACHE_SIZE:
+				self.user_annotations.popitem(last=False)
+			return motion_file_ids
+
+	def sample(self, user_id, exclude_ids=()):
+		with self.lock:
+			annotated = self.annotated_by(user_id)
+			excluded = ExcludedMotions(annotated, exclude_ids)
+			# Motions that other users are currently annotating are skipped, so that they do not end up annotating
+			# the same motion.
+			leased = self.leased_by_others(user_id)
+			selected_id = self.sample_uniformly(self.unannotated, ExcludedMotions(annotated, leased.union(exclude_ids)))
+			if selected_id is None:
+				# All motions have been annotated or leased, use perplexity-based sampling.
+				selected_id = self.eligible.sample(excluded, max_rejections=MAX_REJECTIONS)
+			if selected_id is None:
+				# None of the remaining motions has a perplexity yet.
+				selected_id = self.sample_uniformly(self.eligible, excluded)
+			return selected_id
+
+	def sample_uniformly(self, motion_file_ids, excluded):
+		# The unannotated pool and the motions annotated by the user are disjoint unless the sampler is
+		# out-of-date, so rejection sampling almost always succeeds with the first draw.
+		for _ in xrange(min(MAX_REJECTIONS, len(motion_file_ids))):
+			motion_file_id = motion_file_ids.choice()
+			if motion_file_id not in excluded:
+				return motion_file_id
+		candidates = [i for i in motion_file_ids if i not in excluded]
+		if len(candidates) == 0:
+			return None
+		return random.choice(candidates)
+
+	def leased_by_others(self, user_id):
+		# There is at most one lease per active user, so this stays small.
+		now = timezone.now()
+		with self.lock:
+			leased = set()
+			for motion_file_id, (lease_user_id, expiration_date) in self.leases.items():
+				if expiration_date <= now:
+					self.release_lease(lease_user_id, motion_file_id)
+				elif lease_user_id != user_id:
+					leased.add(motion_file_id)
+			return leased
+
+	def add_lease(self, user_id, motion_file_id, expiration_date):
+		# Returns True if the sampler did not know about the lease yet.
+		with self.lock:
+			previous = self.leases.get(motion_file_id)
+			if previous is not None:
+				self.release_lease(previous[0], motion_file_id)
+			# Every user holds a single lease, so the new lease replaces the previous one.
+			previous_motion_file_id = self.user_leases.get(user_id)
+			if previous_motion_file_id is not None:
+				self.release_lease(user_id, previous_motion_file_id)
+			self.leases[motion_file_id] = (user_id, expiration_date)
+			self.user_leases[user_id] = motion_file_id
+			return previous is None or previous[0] != user_id
+
+	def release_lease(self, user_id, motion_file_id):
+		with self.lock:
+			if self.leases.get(motion_file_id, (None, None))[0] == user_id:
+				del self.leases[motion_file_id]
+			if self.user_leases.get(user_id) == motion_file_id:
+				del self.user_leases[user_id]
+
+	def add_annotation(self, user_id, motion_file_id):
+		with self.lock:
+			if motion_file_id in self.annotation_counts:
+				self.annotation_counts[motion_file_id] += 1
+			self.unannotated.discard(motion_file_id)
+			self.mark_annotated(user_id, motion_file_id)
+
+	def remove_annotation(self, user_id, motion_file_id):
+		with self.lock:
+			if motion_file_id in self.annotation_counts:
+				count = max(0, self.annotation_counts[motion_file_id] - 1)
+				self.annotation_counts[motion_file_id] = count
+				if count == 0:
+					self.unannotated.add(motion_file_id)
+			motion_file_ids = self.user_annotations.get(user_id)
+			if motion_file_ids is not None:
+				motion_file_ids.discard(motion_file_id)
+
+	def mark_annotated(self, user_id, motion_file_id):
+		with self.lock:
+			motion_file_ids = self.user_annotations.get(user_id)
+			if motion_file_ids is not None:
+				motion_file_ids.add(motion_file_id)
+
+	def update_annotation_count(self, motion_file_id, annotation_count):
+		# Returns True if the motion was wrongly considered to be unannotated.
+		with self.lock:
+			if motion_file_id not in self.annotation_counts:
+				return False
+			self.annotation_counts[motion_file_id] = annotation_count
+			if annotation_count == 0:
+				self.unannotated.add(motion_file_id)
+				return False
+			was_unannotated = motion_file_id in self.unannotated
+			self.unannotated.discard(motion_file_id)
+			return was_unannotated
+
+	def update_motion_file(self, motion_file):
+		if not motion_file.is_eligible():
+			self.remove_motion_file(motion_file.id)
+			return
+		with self.lock:
+			is_known = motion_file.id in self.eligible
+			self.eligible[motion_file.id] = max(0., motion_file.mean_perplexity)
+			if is_known:
+				return
+		# The motion has just become eligible, so we do not know its annotations yet.
+		annotation_count = motion_file.annotation_set.count()
+		with self.lock:
+			self.annotation_counts[motion_file.id] = annotation_count
+			if annotation_count == 0:
+				self.unannotated.add(motion_file.id)
+
+	def remove_motion_file(self, motion_file_id):
+		with self.lock:
+			self.eligible.discard(motion_file_id)
+			self.unannotated.discard(motion_file_id)
+			self.annotation_counts.pop(motion_file_id, None)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+	global _sampler
+	with _sampler_lock:
+		if _sampler is None:
+			_sampler = MotionSampler()
+		if _sampler.is_stale():
+			_sampler.build()
+		return _sampler
+
+
+def current_sampler():
+	# Returns None if the sampler has not been used in this process, in which case there is nothing to update.
+	return _sampler
+
+
+def check_motion_file(sampler, user, motion_file_id):
+	# Other processes may have changed the motion in the meantime, so double-check everything the sampler relies on.
+	# All of these are indexed lookups. Returns None if the user cannot annotate the motion (anymore).
+	try:
+		motion_file = MotionFile.objects.get(id=motion_file_id)
+	except MotionFile.DoesNotExist:
+		sampler.remove_motion_file(motion_file_id)
+		return None
+	if not motion_file.is_eligible():
+		sampler.update_motion_file(motion_file)
+		return None
+	if Annotation.objects.filter(user=user, motion_file=motion_file).exists():
+		sampler.mark_annotated(user.id, motion_file.id)
+		return None
+	motion_file.annotation_count = motion_file.annotation_set.count()
+	return motion_file
+
+
+def select_motion_file(user, exclude_ids=()):
+	sampler = get_sampler()
+	for attempt in xrange(MAX_SELECTION_ATTEMPTS):
+		if attempt == MAX_SELECTION_ATTEMPTS - 1:
+			# Too many stale entries, start over.
+			sampler.build()
+		selected_id = sampler.sample(user.id, exclude_ids)
+		if selected_id is None:
+			return None
+		motion_file = check_motion_file(sampler, user, selected_id)
+		if motion_file is None:
+			continue
+		if sampler.update_annotation_count(motion_file.id, motion_file.annotation_count):
+			continue
+		if motion_file.annotation_count == 0:
+			lease = MotionLease.active_lease(motion_file.id, exclude_user_id=user.id)
+			if lease is not None and sampler.add_lease(lease.user_id, lease.motion_file_id, lease.expiration_date):
+				# Another process has leased the motion in the meantime. Motions that are known to be leased are
+				# only selected if there is nothing else left, in which case they are fine.
+				continue
+		return motion_file
+	return None
+
+
+def get_motion_file_for_user(user, motion_file_id):
+	sampler = get_sampler()
+	motion_file = check_motion_file(sampler, user, motion_file_id)
+	if motion_file is not None and motion_file.annotation_count == 0:
+		lease = MotionLease.active_lease(motion_file.id, exclude_user_id=user.id)
+		if lease is not None:
+			sampler.add_lease(lease.user_id, lease.motion_file_id, lease.expiration_date)
+			return None
+	return motion_file
+
+
+def lease_motion_file(user, motion_file):
+	# A single update of the user's lease, which is indexed by its primary key.
+	expiration_date = MotionLease.acquire(user.id, motion_file.id)
+	sampler = current_sampler()
+	if sampler is not None:
+		sampler.add_lease(user.id, motion_file.id, expiration_date)
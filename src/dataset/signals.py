@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import MotionFile, Annotation, UserAnnotationCount, Statistics
+from .sampler import current_sampler
+
+
+@receiver(post_save, sender=Annotation)
+def update_user_annotation_count_on_save(sender, instance, created, **kwargs):
+	# This runs within the transaction that saves the annotation.
+	if created:
+		UserAnnotationCount.add(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Annotation)
+def update_user_annotation_count_on_delete(sender, instance, **kwargs):
+	UserAnnotationCount.add(instance.user_id, -1)
+
+
+@receiver(post_save, sender=User)
+def create_user_annotation_count(sender, instance, created, **kwargs):
+	if created:
+		UserAnnotationCount.objects.get_or_create(user=instance)
+		Statistics.add(total_users=1)
+
+
+@receiver(post_delete, sender=User)
+def update_statistics_on_user_delete(sender, instance, **kwargs):
+	Statistics.add(total_users=-1)
+
+
+@receiver(post_save, sender=Annotation)
+def update_statistics_on_annotation_save(sender, instance, created, **kwargs):
+	if created and instance.motion_file.is_eligible():
+		is_first_annotation = instance.motion_file.annotation_set.count() == 1
+		Statistics.add(total_annotations=1, distinct_annotations=int(is_first_annotation))
+
+
+@receiver(post_delete, sender=Annotation)
+def update_statistics_on_annotation_delete(sender, instance, **kwargs):
+	if instance.motion_file.is_eligible():
+		was_last_annotation = instance.motion_file.annotation_set.count() == 0
+		Statistics.add(total_annotations=-1, distinct_annotations=-int(was_last_annotation))
+
+
+@receiver(post_save, sender=MotionFile)
+def update_statistics_on_motion_file_save(sender, instance, created, **kwargs):
+	if created:
+		Statistics.add(perplexity_sum=instance.mean_perplexity, perplexity_count=1)
+	else:
+		loaded_values = getattr(instance, '_loaded_values', {})
+		if 'mean_perplexity' in loaded_values:
+			Statistics.add(perplexity_sum=instance.mean_perplexity - loaded_values['mean_perplexity'])
+
+	was_eligible = False if created else instance.was_eligible()
+	is_eligible = instance.is_eligible()
+	if was_eligible is None or was_eligible == is_eligible:
+		# Either nothing has changed or we cannot tell, in which case the next rebuild will catch up.
+		return
+	sign = 1 if is_eligible else -1
+	annotation_count = instance.annotation_set.count()
+	Statistics.add(total_motions=sign, total_annotations=sign * annotation_count, distinct_annotations=sign * int(annotation_count > 0))
+
+
+@receiver(post_delete, sender=MotionFile)
+def update_statistics_on_motion_file_delete(sender, instance, **kwargs):
+	Statistics.add(perplexity_sum=-instance.mean_perplexity, perplexity_count=-1)
+	# Annotations are protected, so they have already been deleted at this point.
+	if instance.is_eligible():
+		Statistics.add(total_motions=-1)
+
+
+# All in-memory updates are deferred until the transaction is committed so that a rollback does not leave
+# them in an inconsistent state. Note that the primary key is reset after deletion, so capture it beforehand.
+
+@receiver(post_save, sender=Annotation)
+def annotation_saved(sender, instance, created, **kwargs):
+	sampler = current_sampler()
+	if created and sampler is not None:
+		user_id, motion_file_id = instance.user_id, instance.motion_file_id
+		transaction.on_commit(lambda: sampler.add_annotation(user_id, motion_file_id))
+
+
+@receiver(post_delete, sender=Annotation)
+def annotation_deleted(sender, instance, **kwargs):
+	sampler = current_sampler()
+	if sampler is not None:
+		user_id, motion_file_id = instance.user_id, instance.motion_file_id
+		transaction.on_commit(lambda: sampler.remove_annotation(user_id, motion_file_id))
+
+
+@receiver(post_save, sender=MotionFile)
+def motion_file_saved(sender, instance, **kwargs):
+	sampler = current_sampler()
+	if sampler is not None:
+		transaction.on_commit(lambda: sampler.update_motion_file(instance))
+
+
+@receiver(post_delete, sender=MotionFile)
+def motion_file_deleted(sender, instance, **kwargs):
+	sampler = current_sampler()
+	if sampler is not None:
+		motion_file_id = instance.id
+		transaction.on_commit(lambda: sampler.remove_motion_file(motion_file_id))
@@ -0,0 +1,63 @@
+// Submits annotations in the background and swaps in the next motion without reloading the page.
+function initAnnotationForm(api_url) {
+	var form = $('#motion-annotation-form');
+	var submitting = false;
+
+	form.submit(function(event) {
+		event.preventDefault();
+		if (submitting) {
+			return;
+		}
+		submitting = true;
+		form.find('input[type=submit]').prop('disabled', true);
+
+		$.post(api_url, form.serialize(), 'json').done(function(response) {
+			if (!response.valid) {
+				showAnnotationMessage('danger', response.message);
+				form.find('.form-group').addClass('has-error');
+				return;
+			}
+			if (response.all_done || typeof scene === 'undefined') {
+				// Either there is nothing left or the viewer could not be set up, let the server render the page.
+				window.location.href = form.attr('action');
+				return;
+			}
+			showAnnotationMessage('success', response.message);
+			showNextMotion(form, response);
+		}).fail(function(xhr) {
+			if (xhr.status == 400 && xhr.responseJSON) {
+				// Submitting the same form again would fail as well.
+				showAnnotationMessage('danger', xhr.responseJSON.error);
+				return;
+			}
+			// Fall back to a regular form submission.
+			form.off('submit');
+			form[0].submit();
+		}).always(function() {
+			submitting = false;
+			form.find('input[type=submit]').prop('disabled', false);
+		});
+	});
+}
+
+function showNextMotion(form, response) {
+	var index_url = form.attr('action');
+	form.find('.form-group').removeClass('has-error');
+	form.find('input[name=motion_file_id]').val(response.motion_file_id);
+	form.find('input[name=start_time]').val(response.start_time);
+	$('#description').val('').focus();
+	$('#motion-file-id').text(response.motion_file_id);
+	$('#skip-motion-link').attr('href', index_url + '?skip=' + response.motion_file_id);
+	$('#broken-motion-link').attr('href', index_url + '?broken=' + response.motion_file_id);
+	$('#annotation-progress').html(response.progress_html);
+
+	swapMotion(response.motion_file_url);
+	if (response.next_motion_file_url) {
+		prefetchMotion(response.next_motion_file_url);
+	}
+}
+
+function showAnnotationMessage(level, message) {
+	var alert = $('<div class="alert" role="alert"></div>').addClass('alert-' + level).html(message);
+	$('#annotation-messages').empty().append(alert);
+}
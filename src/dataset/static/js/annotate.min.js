@@ -0,0 +1 @@
+function initAnnotationForm(c){var a=$('#motion-annotation-form');var b=false;a.submit(function(d){d.preventDefault();if(b){return;}b=true;a.find('input[type=submit]').prop('disabled',true);$.post(c,a.serialize(),'json').done(function(b){if(!b.valid){showAnnotationMessage('danger',b.message);a.find('.form-group').addClass('has-error');return;}if(b.all_done||typeof scene==='undefined'){window.location.href=a.attr('action');return;}showAnnotationMessage('success',b.message);showNextMotion(a,b);}).fail(function(b){if(b.status==400&&b.responseJSON){showAnnotationMessage('danger',b.responseJSON.error);return;}a.off('submit');a[0].submit();}).always(function(){b=false;a.find('input[type=submit]').prop('disabled',false);});});}function showNextMotion(b,a){var c=b.attr('action');b.find('.form-group').removeClass('has-error');b.find('input[name=motion_file_id]').val(a.motion_file_id);b.find('input[name=start_time]').val(a.start_time);$('#description').val('').focus();$('#motion-file-id').text(a.motion_file_id);$('#skip-motion-link').attr('href',c+'?skip='+a.motion_file_id);$('#broken-motion-link').attr('href',c+'?broken='+a.motion_file_id);$('#annotation-progress').html(a.progress_html);swapMotion(a.motion_file_url);if(a.next_motion_file_url){prefetchMotion(a.next_motion_file_url);}}function showAnnotationMessage(b,a){var c=$('<div class="alert" role="alert"></div>').addClass('alert-'+b).html(a);$('#annotation-messages').empty().append(c);}
\ No newline at end of file
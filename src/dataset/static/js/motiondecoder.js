@@ -0,0 +1,260 @@
+// Fetches and decodes motions, which are either stored as JSON or in the binary motion format (see
+// dataset/motionformat.py). The viewer runs this script as a Web Worker, so that downloading and decoding large
+// motions never blocks the page, and falls back to running it on the page if workers are not available.
+var MOTION_MAGIC = 'MATMOTN1';
+var MOTION_ENCODING_FLOAT32 = 1;
+var MOTION_ENCODING_DELTA16 = 2;
+
+// Motions are streamed in blocks of frames: playback starts as soon as the first block has arrived and the rest is
+// requested in the background.
+var FIRST_BLOCK_SIZE = 64 * 1024;
+var BLOCK_SIZE = 1024 * 1024;
+// Failed blocks are requested again after BLOCK_RETRY_INTERVAL milliseconds times the number of retries so far.
+var MAX_BLOCK_RETRIES = 5;
+var BLOCK_RETRY_INTERVAL = 1000;
+
+// The URL of this script, from which the viewer starts its workers.
+var motion_decoder_url = (typeof document !== 'undefined' && document.currentScript) ? document.currentScript.src : null;
+
+// Loads the motion at url and reports it by calling post(message, transfer) with one of these messages:
+//   {type: 'progress', loaded: ..., total: ...}
+//   {type: 'motion', motion: ..., buffer: ..., offset: ...}: the motion, whose frame values start at the given
+//     byte offset of the buffer
+//   {type: 'header', motion: ...}: the motion without its frames, which follow in blocks
+//   {type: 'frames', buffer: ..., offset: ...}: the next block of frame values and its byte offset
+//   {type: 'done'} once all blocks have been sent, or {type: 'error', message: ...}
+// Buffers are transferred rather than copied. Streaming stops if post returns false.
+function fetchMotion(url, stream, post) {
+	var failure = function(error) {
+		post({type: 'error', message: String(error)});
+	};
+	var progress = function(loaded, total) {
+		post({type: 'progress', loaded: loaded, total: total});
+	};
+	var decode = function(buffer) {
+		var motion;
+		try {
+			motion = /\.motion(\?|$)/.test(url) ? decodeMotion(buffer) : decodeJsonMotion(buffer);
+		} catch (e) {
+			failure(e);
+			return;
+		}
+		var values = motion.values;
+		delete motion.values;
+		post({type: 'motion', motion: motion, buffer: values.buffer, offset: values.byteOffset}, [values.buffer]);
+	};
+	if (!stream) {
+		fetchArrayBuffer(url, decode, failure, null, progress);
+		return;
+	}
+
+	// The server never compresses streamed motions, so that byte ranges refer to the motion file itself.
+	var stream_url = url + (url.indexOf('?') < 0 ? '?' : '&') + 'stream=1';
+	fetchArrayBuffer(stream_url, function(buffer, status, content_range) {
+		if (status != 206) {
+			// The server has ignored the range and sent the whole motion.
+			decode(buffer);
+			return;
+		}
+		var header;
+		try {
+			header = decodeMotionHeader(buffer);
+		} catch (e) {
+			failure(e);
+			return;
+		}
+		if (header.encoding != MOTION_ENCODING_FLOAT32 || header.header_size > buffer.byteLength) {
+			// Quantized motions can only be decoded as a whole.
+			fetchArrayBuffer(url, decode, failure, null, progress);
+			return;
+		}
+		post({type: 'header', motion: header});
+		streamFrames(stream_url, header, buffer, parseInt(content_range.split('/')[1]), post);
+	}, failure, [0, FIRST_BLOCK_SIZE - 1]);
+}
+
+function streamFrames(url, header, first_block, size, post) {
+	var n_bytes = 12 * header.n_markers * header.n_frames;
+	var loaded_bytes = 0;
+	var retries = 0;
+	var append = function(buffer, offset) {
+		var n = Math.min(buffer.byteLength - offset, n_bytes - loaded_bytes);
+		if (offset != 0 || n != buffer.byteLength) {
+			buffer = buffer.slice(offset, offset + n);
+		}
+		var result = post({type: 'frames', buffer: buffer, offset: loaded_bytes}, [buffer]);
+		loaded_bytes += n;
+		post({type: 'progress', loaded: header.header_size + loaded_bytes, total: size});
+		return result;
+	};
+	var requestNextBlock = function() {
+		var start = header.header_size + loaded_bytes;
+		if (loaded_bytes >= n_bytes || start >= size) {
+			post({type: 'done'});
+			return;
+		}
+		fetchArrayBuffer(url, function(buffer, status) {
+			retries = 0;
+			if (append(buffer, status == 206 ? 0 : start) !== false) {
+				requestNextBlock();
+			}
+		}, function(error) {
+			if (retries >= MAX_BLOCK_RETRIES) {
+				post({type: 'error', message: String(error)});
+				return;
+			}
+			retries++;
+			setTimeout(requestNextBlock, BLOCK_RETRY_INTERVAL * retries);
+		}, [start, Math.min(size, start + BLOCK_SIZE) - 1]);
+	};
+	if (append(first_block, header.header_size) !== false) {
+		requestNextBlock();
+	}
+}
+
+function fetchArrayBuffer(url, success, failure, range, progress) {
+	var range_header = range ? 'bytes=' + range[0] + '-' + range[1] : null;
+	if (self.fetch && !progress) {
+		var options = range_header ? {headers: {'Range': range_header}} : {};
+		fetch(url, options).then(function(response) {
+			if (!response.ok) {
+				throw new Error('Could not load ' + url);
+			}
+			return response.arrayBuffer().then(function(buffer) {
+				success(buffer, response.status, response.headers.get('Content-Range'));
+			});
+		}).then(null, failure);
+		return;
+	}
+	var request = new XMLHttpRequest();
+	request.open('GET', url);
+	request.responseType = 'arraybuffer';
+	if (range_header) {
+		request.setRequestHeader('Range', range_header);
+	}
+	if (progress) {
+		request.onprogress = function(event) {
+			if (event.lengthComputable) {
+				progress(event.loaded, event.total);
+			}
+		};
+	}
+	request.onload = function() {
+		if (request.status == 200 || request.status == 206) {
+			success(request.response, request.status, request.getResponseHeader('Content-Range'));
+		} else {
+			failure(new Error('Could not load ' + url));
+		}
+	};
+	request.onerror = failure;
+	request.send();
+}
+
+function decodeMotionHeader(buffer) {
+	var header = new DataView(buffer);
+	var magic = String.fromCharCode.apply(null, new Uint8Array(buffer, 0, 8));
+	if (magic != MOTION_MAGIC) {
+		throw 'Unsupported motion format';
+	}
+	var header_size = header.getUint32(12, true);
+	var names = String.fromCharCode.apply(null, new Uint8Array(buffer, 28, Math.min(buffer.byteLength, header_size) - 28)).replace(/\0+$/, '').split('\n');
+	return {
+		encoding: header.getUint32(8, true),
+		header_size: header_size,
+		n_frames: header.getUint32(16, true),
+		n_markers: header.getUint32(20, true),
+		interval: header.getUint32(24, true),
+		marker_set: names[0],
+		markers: names.slice(1)
+	};
+}
+
+function decodeMotion(buffer) {
+	var header = decodeMotionHeader(buffer);
+
+	// The values are used in-place unless they are quantized.
+	var stride = 3 * header.n_markers;
+	if (header.encoding == MOTION_ENCODING_FLOAT32) {
+		header.values = new Float32Array(buffer, header.header_size, header.n_frames * stride);
+	} else if (header.encoding == MOTION_ENCODING_DELTA16) {
+		header.values = decodeDelta16(buffer, header.header_size, header.n_frames, stride);
+	} else {
+		throw 'Unsupported motion encoding ' + header.encoding;
+	}
+	return header;
+}
+
+function decodeJsonMotion(buffer) {
+	var d = JSON.parse(decodeText(buffer));
+	var stride = 3 * d.markers.length;
+	var values = new Float32Array(d.frames.length * stride);
+	for (var i = 0; i < d.frames.length; i++) {
+		values.set(d.frames[i], i * stride);
+	}
+	return {
+		marker_set: d.marker_set,
+		markers: d.markers,
+		interval: d.interval,
+		n_frames: d.frames.length,
+		n_markers: d.markers.length,
+		values: values
+	};
+}
+
+function decodeText(buffer) {
+	if (typeof TextDecoder !== 'undefined') {
+		return new TextDecoder('utf-8').decode(new Uint8Array(buffer));
+	}
+	// Motions are plain ASCII. Convert in chunks to stay below the maximum number of arguments.
+	var bytes = new Uint8Array(buffer);
+	var chunks = [];
+	for (var i = 0; i < bytes.length; i += 32768) {
+		chunks.push(String.fromCharCode.apply(null, bytes.subarray(i, i + 32768)));
+	}
+	return chunks.join('');
+}
+
+function decodeDelta16(buffer, offset, n_frames, stride) {
+	var header = new DataView(buffer, offset, 12);
+	var precision = header.getFloat32(0, true);
+	var n_keyframes = header.getUint32(8, true);
+	offset += 12;
+	var origin = new Float32Array(buffer, offset, stride);
+	offset += 4 * stride;
+	var keyframe_indexes = new Uint32Array(buffer, offset, n_keyframes);
+	offset += 4 * n_keyframes;
+	var keyframes = new Int32Array(buffer, offset, n_keyframes * stride);
+	offset += 4 * n_keyframes * stride;
+	var deltas = new Int16Array(buffer, offset, (n_frames - n_keyframes) * stride);
+
+	// Keyframes hold absolute values, all other frames the difference to the previous frame.
+	var values = new Float32Array(n_frames * stride);
+	var quantized = new Int32Array(stride);
+	var k = 0, d = 0;
+	for (var i = 0; i < n_frames; i++) {
+		if (k < n_keyframes && keyframe_indexes[k] == i) {
+			quantized.set(keyframes.subarray(k * stride, (k + 1) * stride));
+			k++;
+		} else {
+			var delta_offset = d * stride;
+			for (var j = 0; j < stride; j++) {
+				quantized[j] += deltas[delta_offset + j];
+			}
+			d++;
+		}
+		var row = i * stride;
+		for (var j = 0; j < stride; j++) {
+			values[row + j] = origin[j] + quantized[j] * precision;
+		}
+	}
+	return values;
+}
+
+if (typeof document === 'undefined' && typeof importScripts === 'function') {
+	// Running as a worker.
+	self.onmessage = function(event) {
+		fetchMotion(event.data.url, event.data.stream, function(message, transfer) {
+			self.postMessage(message, transfer || []);
+		});
+	};
+}
@@ -0,0 +1 @@
+var MOTION_MAGIC='MATMOTN1';var MOTION_ENCODING_FLOAT32=1;var MOTION_ENCODING_DELTA16=2;var FIRST_BLOCK_SIZE=64*1024;var BLOCK_SIZE=1024*1024;var MAX_BLOCK_RETRIES=5;var BLOCK_RETRY_INTERVAL=1000;var motion_decoder_url=(typeof document!=='undefined'&&document.currentScript)?document.currentScript.src:null;function fetchMotion(a,g,b){var c=function(a){b({type:'error',message:String(a)});};var f=function(c,a){b({type:'progress',loaded:c,total:a});};var d=function(f){var d;try{d=/\.motion(\?|$)/.test(a)?decodeMotion(f):decodeJsonMotion(f);}catch(g){c(g);return;}var e=d.values;delete d.values;b({type:'motion',motion:d,buffer:e.buffer,offset:e.byteOffset},[e.buffer]);};if(!g){fetchArrayBuffer(a,d,c,null,f);return;}var e=a+(a.indexOf('?')<0?'?':'&')+'stream=1';fetchArrayBuffer(e,function(h,i,j){if(i!=206){d(h);return;}var g;try{g=decodeMotionHeader(h);}catch(k){c(k);return;}if(g.encoding!=MOTION_ENCODING_FLOAT32||g.header_size>h.byteLength){fetchArrayBuffer(a,d,c,null,f);return;}b({type:'header',motion:g});streamFrames(e,g,h,parseInt(j.split('/')[1]),b);},c,[0,FIRST_BLOCK_SIZE-1]);}function streamFrames(i,b,j,e,d){var g=12*b.n_markers*b.n_frames;var a=0;var c=0;var h=function(c,f){var h=Math.min(c.byteLength-f,g-a);if(f!=0||h!=c.byteLength){c=c.slice(f,f+h);}var i=d({type:'frames',buffer:c,offset:a},[c]);a+=h;d({type:'progress',loaded:b.header_size+a,total:e});return i;};var f=function(){var j=b.header_size+a;if(a>=g||j>=e){d({type:'done'});return;}fetchArrayBuffer(i,function(b,a){c=0;if(h(b,a==206?0:j)!==false){f();}},function(a){if(c>=MAX_BLOCK_RETRIES){d({type:'error',message:String(a)});return;}c++;setTimeout(f,BLOCK_RETRY_INTERVAL*c);},[j,Math.min(e,j+BLOCK_SIZE)-1]);};if(h(j,b.header_size)!==false){f();}}function fetchArrayBuffer(b,g,f,d,e){var c=d?'bytes='+d[0]+'-'+d[1]:null;if(self.fetch&&!e){var h=c?{headers:{'Range':c}}:{};fetch(b,h).then(function(a){if(!a.ok){throw new Error('Could not load '+b);}return a.arrayBuffer().then(function(b){g(b,a.status,a.headers.get('Content-Range'));});}).then(null,f);return;}var a=new XMLHttpRequest();a.open('GET',b);a.responseType='arraybuffer';if(c){a.setRequestHeader('Range',c);}if(e){a.onprogress=function(a){if(a.lengthComputable){e(a.loaded,a.total);}};}a.onload=function(){if(a.status==200||a.status==206){g(a.response,a.status,a.getResponseHeader('Content-Range'));}else{f(new Error('Could not load '+b));}};a.onerror=f;a.send();}function decodeMotionHeader(b){var a=new DataView(b);var e=String.fromCharCode.apply(null,new Uint8Array(b,0,8));if(e!=MOTION_MAGIC){throw'Unsupported motion format';}var d=a.getUint32(12,true);var c=String.fromCharCode.apply(null,new Uint8Array(b,28,Math.min(b.byteLength,d)-28)).replace(/\0+$/,'').split('\n');return{encoding:a.getUint32(8,true),header_size:d,n_frames:a.getUint32(16,true),n_markers:a.getUint32(20,true),interval:a.getUint32(24,true),marker_set:c[0],markers:c.slice(1)};}function decodeMotion(b){var a=decodeMotionHeader(b);var c=3*a.n_markers;if(a.encoding==MOTION_ENCODING_FLOAT32){a.values=new Float32Array(b,a.header_size,a.n_frames*c);}else if(a.encoding==MOTION_ENCODING_DELTA16){a.values=decodeDelta16(b,a.header_size,a.n_frames,c);}else{throw'Unsupported motion encoding '+a.encoding;}return a;}function decodeJsonMotion(e){var a=JSON.parse(decodeText(e));var d=3*a.markers.length;var c=new Float32Array(a.frames.length*d);for(var b=0; b<a.frames.length; b++){c.set(a.frames[b],b*d);}return{marker_set:a.marker_set,markers:a.markers,interval:a.interval,n_frames:a.frames.length,n_markers:a.markers.length,values:c};}function decodeText(d){if(typeof TextDecoder!=='undefined'){return new TextDecoder('utf-8').decode(new Uint8Array(d));}var c=new Uint8Array(d);var b=[];for(var a=0; a<c.length; a+=32768){b.push(String.fromCharCode.apply(null,c.subarray(a,a+32768)));}return b.join('');}function decodeDelta16(f,c,i,a){var k=new DataView(f,c,12);var n=k.getFloat32(0,true);var d=k.getUint32(8,true);c+=12;var o=new Float32Array(f,c,a);c+=4*a;var q=new Uint32Array(f,c,d);c+=4*d;var p=new Int32Array(f,c,d*a);c+=4*d*a;var r=new Int16Array(f,c,(i-d)*a);var j=new Float32Array(i*a);var h=new Int32Array(a);var e=0,l=0;for(var g=0; g<i; g++){if(e<d&&q[e]==g){h.set(p.subarray(e*a,(e+1)*a));e++;}else{var s=l*a;for(var b=0; b<a; b++){h[b]+=r[s+b];}l++;}var m=g*a;for(var b=0; b<a; b++){j[m+b]=o[b]+h[b]*n;}}return j;}if(typeof document==='undefined'&&typeof importScripts==='function'){self.onmessage=function(a){fetchMotion(a.data.url,a.data.stream,function(b,a){self.postMessage(b,a||[]);});};}
\ No newline at end of file
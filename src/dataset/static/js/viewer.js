@@ -1,6 +1,8 @@
 var scene, camera, renderer, controls, ambientLight, lights, data;
 var update_slider= true;
-var markers, lines, marker_line_mapping;
+var markers, lines, marker_positions, marker_offsets, line_positions, marker_indexes;
+var target_marker_idx = -1;
+var target_position = new THREE.Vector3(), camera_direction = new THREE.Vector3();
 var marker_connections = {
 	'kit': {
 		// Head
@@ -84,9 +86,15 @@ var marker_connections = {
 	}
 };
 
-var frame_idx = 0, prev_frame_idx = -1;
+// Playback is driven by the timestamps of requestAnimationFrame. The playback time (in milliseconds) usually falls
+// between two stored frames, so the markers are interpolated between them: frame_idx is the frame before and
+// frame_fraction the position between it and the next frame.
+var playback_time = 0, prev_playback_time = -1, last_timestamp = null;
+var frame_idx = 0, frame_fraction = 0;
+var MAX_FRAME_TIME = 100;  // do not skip ahead after the page has been in the background
 var playing = true;
 var looping = false;
+var motion_loaded = $.Deferred();
 
 // Taken from http://stackoverflow.com/questions/9899807/three-js-detect-webgl-support-and-fallback-to-regular-canvas
 function webglAvailable() {
@@ -101,13 +109,151 @@ function webglAvailable() {
 	} 
 }
 
+// Motions are loaded by motiondecoder.js, usually in a worker. Binary motions are streamed, except for those that
+// have been prefetched, by this page or by the previous one: they are in the browser cache, so load them at once.
+var prefetched_urls = {};
+
+function markPrefetched(json_url) {
+	prefetched_urls[motionUrl(json_url)] = true;
+}
+
+// Binary motions are also available with lower frame rates, which are much smaller. Use them on slow connections and
+// phones. The choice is stored in a cookie so that the server links to the same level of detail.
+var preferred_fps = preferredFrameRate();
+document.cookie = 'motion_fps=' + (preferred_fps || '') + '; path=/; max-age=' + (30 * 24 * 60 * 60);
+
+function preferredFrameRate() {
+	var connection = navigator.connection || navigator.mozConnection || navigator.webkitConnection;
+	if (connection && (connection.saveData || /2g$/.test(connection.effectiveType))) {
+		return 15;
+	}
+	if (connection && connection.effectiveType == '3g') {
+		return 30;
+	}
+	if (Math.min(window.screen.width, window.screen.height) < 768) {
+		return 30;
+	}
+	return null;
+}
+
+function motionUrl(url) {
+	if (!preferred_fps || !/\.motion$/.test(url)) {
+		// Either the full frame rate or the server has already picked the level of detail.
+		return url;
+	}
+	return url + '?fps=' + preferred_fps;
+}
+
+function loadMotion(url) {
+	url = motionUrl(url);
+	var deferred = $.Deferred();
+	var stream = /\.motion(\?|$)/.test(url) && !prefetched_urls[url];
+	var motion = null;
+	var worker = startMotionDecoder(url, stream, function(message) {
+		if (message.type == 'progress') {
+			showLoadingProgress(message.loaded, message.total);
+		} else if (message.type == 'motion') {
+			motion = createMotion(message.motion, new Float32Array(message.buffer, message.offset, 3 * message.motion.n_markers * message.motion.n_frames));
+			motion.decoder = worker;
+			stopMotionDecoder(motion);
+			deferred.resolve(motion);
+		} else if (message.type == 'header') {
+			// Frames are copied into place as they arrive, playback waits for those that have not.
+			motion = createMotion(message.motion, new Float32Array(3 * message.motion.n_markers * message.motion.n_frames));
+			motion.loaded_frames = 0;
+			motion.decoder = worker;
+			deferred.resolve(motion);
+		} else if (message.type == 'frames') {
+			var bytes = new Uint8Array(motion.values.buffer);
+			bytes.set(new Uint8Array(message.buffer), message.offset);
+			motion.loaded_frames = Math.floor((message.offset + message.buffer.byteLength) / (12 * motion.markers.length));
+		} else if (message.type == 'done') {
+			stopMotionDecoder(motion);
+		} else if (message.type == 'error') {
+			// If streaming fails, playback stops at the last frame that has arrived.
+			worker.terminate();
+			deferred.reject(message.message);
+		}
+	});
+	return deferred.promise();
+}
+
+function startMotionDecoder(url, stream, receive) {
+	// Returns the worker, or an object that can be terminated in the same way if the motion is loaded on the page.
+	if (window.Worker && motion_decoder_url) {
+		try {
+			var worker = new Worker(motion_decoder_url);
+			worker.onmessage = function(event) {
+				receive(event.data);
+			};
+			worker.onerror = function(event) {
+				receive({type: 'error', message: event.message});
+			};
+			// Relative URLs would be resolved against the URL of the worker.
+			var link = document.createElement('a');
+			link.href = url;
+			worker.postMessage({url: link.href, stream: stream});
+			return worker;
+		} catch (e) {
+			// E.g. workers are not allowed by the content security policy.
+		}
+	}
+	var decoder = {
+		terminated: false,
+		terminate: function() {
+			this.terminated = true;
+		}
+	};
+	fetchMotion(url, stream, function(message) {
+		if (decoder.terminated) {
+			return false;
+		}
+		receive(message);
+	});
+	return decoder;
+}
+
+function stopMotionDecoder(motion) {
+	if (motion.decoder) {
+		motion.decoder.terminate();
+		motion.decoder = null;
+	}
+}
+
+function createMotion(header, values) {
+	// Every frame is merely a view into the values.
+	var stride = 3 * header.n_markers;
+	var frames = new Array(header.n_frames);
+	for (var i = 0; i < header.n_frames; i++) {
+		frames[i] = values.subarray(i * stride, (i + 1) * stride);
+	}
+	return {
+		marker_set: header.marker_set,
+		markers: header.markers,
+		interval: header.interval,
+		values: values,
+		frames: frames
+	};
+}
+
+function showLoadingProgress(loaded, total) {
+	if (total > 0) {
+		$('#motion-loading-progress').text(Math.min(100, Math.round(100 * loaded / total)) + '%');
+	}
+}
+
+function loadedFrames() {
+	return data.loaded_frames === undefined ? data.frames.length : data.loaded_frames;
+}
+
 function initViewer(json_url, repeat, camera_position, target_position) {
 	repeat = repeat || false;
 	camera_position = camera_position || new THREE.Vector3(15., 15., 15.);
 	target_position = target_position || new THREE.Vector3(0., 0., 10.);
 
-	$.getJSON(json_url, function(d) {
+	loadMotion(json_url).done(function(d) {
 		$('#motion-loading').hide();
+		motion_loaded.resolve();
 
 		// Check if WebGL is available.
 		if (!webglAvailable()) {
@@ -137,19 +283,56 @@ function initViewer(json_url, repeat, camera_position, target_position) {
 	});
 };
 
-function initUi() {
-	window.setInterval(updateFrameIndexIfNecessary, data.interval);
+// Downloads the next motion into the browser cache once the current one has been loaded, so that it does not
+// compete with it for bandwidth.
+function prefetchMotion(json_url) {
+	markPrefetched(json_url);
+	json_url = motionUrl(json_url);
+	motion_loaded.always(function() {
+		if (window.fetch) {
+			fetch(json_url).then(null, function() {});
+		} else {
+			$.ajax({url: json_url, dataType: 'text', cache: true});
+		}
+	});
+}
 
-	// Configure slider
+// Replaces the current motion with the one at json_url while keeping the scene, camera and controls.
+function swapMotion(json_url) {
+	motion_loaded = $.Deferred();
+	return loadMotion(json_url).done(function(d) {
+		removeMarkers();
+		stopMotionDecoder(data);  // stop streaming the previous motion
+		data = d;
+		seek(0);
+		playing = true;
+		initPlayback();
+		initMarkers();
+		updateMarkers();
+		motion_loaded.resolve();
+	}).fail(function() {
+		motion_loaded.reject();
+	});
+}
+
+function initPlayback() {
 	$('#motion-ui-slider').attr({
 		'max' : data.frames.length - 1,
 		'min' : 0
 	});
+	$('#motion-ui-slider').val(frame_idx);
+	updateButton();
+}
+
+function initUi() {
+	initPlayback();
+
+	// Configure slider
 	$('#motion-ui-slider').bind('mousedown', function() {
 		update_slider = false;
 		$('#motion-ui-slider').bind('mousemove', function() {
 			playing = false;
-			frame_idx = parseInt($('#motion-ui-slider').val());
+			seek(Math.max(0, Math.min(parseInt($('#motion-ui-slider').val()), loadedFrames() - 1)));
 			updateButton();
 		});
 	});
@@ -160,11 +343,10 @@ function initUi() {
 	});
 
 	// Configure play/pause button
-	updateButton();
 	$('#motion-ui-button').click(function() {
 		playing = !playing;
 		if (playing && frame_idx == data.frames.length - 1) {
-			frame_idx = 0;
+			seek(0);
 		}
 		updateButton();
 	});
@@ -210,11 +392,14 @@ function initScene(camera_position, target_position) {
 };
 
 function updateTargetPositionIfAppropriate() {
-	var direction = controls.object.position.sub(controls.target);
-	var targetPosition = positionOfMarker('STRN');
-	var cameraPosition = new THREE.Vector3().copy(targetPosition).add(direction);
-	controls.target = targetPosition;
-	controls.object.position.copy( cameraPosition );
+	if (target_marker_idx < 0) {
+		return;
+	}
+	// Follow the sternum while keeping the direction and distance of the camera.
+	camera_direction.subVectors(controls.object.position, controls.target);
+	positionOfMarker(target_marker_idx, target_position);
+	controls.target.copy(target_position);
+	controls.object.position.copy(target_position).add(camera_direction);
 	controls.update();
 }
 
@@ -252,108 +437,187 @@ function initFloor() {
 };
 
 function markerIndexFromName(name) {
-	for (var i in data.markers) {
-		if (data.markers[i] == name) {
-			return i;
-		}
-	}
-	return -1;
+	return marker_indexes.hasOwnProperty(name) ? marker_indexes[name] : -1;
 };
 
-function positionOfMarker(name) {
-	for (var i in data.markers) {
-		if (data.markers[i] == name) {
-			var pos = data.frames[frame_idx][i];
-			return new THREE.Vector3(data.frames[frame_idx][3 * i], data.frames[frame_idx][3 * i + 1], data.frames[frame_idx][3 * i + 2]);
-		}
-	}
-	return -1;
+function positionOfMarker(idx, position) {
+	return position.fromArray(marker_positions, 3 * idx);
 }
 
+// Markers are drawn as instances of a single sphere that is offset by the position of the marker, so that all of them
+// take a single draw call.
+var MARKER_VERTEX_SHADER = [
+	'precision mediump float;',
+	'uniform mat4 modelViewMatrix;',
+	'uniform mat4 projectionMatrix;',
+	'attribute vec3 position;',
+	'attribute vec3 offset;',
+	'void main() {',
+	'	gl_Position = projectionMatrix * modelViewMatrix * vec4(position + offset, 1.0);',
+	'}'
+].join('\n');
+var MARKER_FRAGMENT_SHADER = [
+	'precision mediump float;',
+	'uniform vec3 color;',
+	'void main() {',
+	'	gl_FragColor = vec4(color, 1.0);',
+	'}'
+].join('\n');
+
 function initMarkers() {
 	var n_markers = data.markers.length;
 	var marker_set = data.marker_set;
 	if (!marker_set) {
 		marker_set = 'kit';
 	}
-	markers = []
+	marker_indexes = {};
 	for (var i = 0; i < n_markers; i++) {
-		var geometry = new THREE.SphereGeometry(0.1, 32, 32 );
-		var material = new THREE.MeshBasicMaterial( { color: 0x00ff00 } );
+		marker_indexes[data.markers[i]] = i;
+	}
+	target_marker_idx = markerIndexFromName('STRN');
+
+	// The positions of all markers in the current frame. Both the markers and the lines read them from the same array,
+	// so updating them means copying a single frame.
+	marker_positions = new Float32Array(3 * n_markers);
+
+	markers = [];
+	marker_offsets = null;
+	var sphere = new THREE.SphereBufferGeometry(0.1, 16, 12);
+	if (renderer.extensions.get('ANGLE_instanced_arrays') !== null) {
+		var geometry = new THREE.InstancedBufferGeometry();
+		geometry.setIndex(sphere.index);
+		geometry.addAttribute('position', sphere.attributes.position);
+		marker_offsets = new THREE.InstancedBufferAttribute(marker_positions, 3, 1).setDynamic(true);
+		geometry.addAttribute('offset', marker_offsets);
+		var material = new THREE.RawShaderMaterial({
+			uniforms: {color: {type: 'c', value: new THREE.Color(0x00ff00)}},
+			vertexShader: MARKER_VERTEX_SHADER,
+			fragmentShader: MARKER_FRAGMENT_SHADER
+		});
 		var marker = new THREE.Mesh(geometry, material);
+		marker.frustumCulled = false;
 		markers.push(marker);
 		scene.add(marker);
+	} else {
+		// Without instancing, at least share the geometry and material between all markers.
+		var material = new THREE.MeshBasicMaterial({color: 0x00ff00});
+		for (var i = 0; i < n_markers; i++) {
+			var marker = new THREE.Mesh(sphere, material);
+			markers.push(marker);
+			scene.add(marker);
+		}
 	}
 
-	lines = []
-	marker_line_mapping = []
+	// All connections are drawn as segments of a single line whose vertices are the markers.
+	var segments = [];
 	for (var start_marker_name in marker_connections[marker_set]) {
-		for (var end_marker_idx in marker_connections[marker_set][start_marker_name]) {
-			end_marker_name = marker_connections[marker_set][start_marker_name][end_marker_idx];
-			start_idx = markerIndexFromName(start_marker_name);
-			end_idx = markerIndexFromName(end_marker_name);
+		var end_marker_names = marker_connections[marker_set][start_marker_name];
+		for (var i = 0; i < end_marker_names.length; i++) {
+			var start_idx = markerIndexFromName(start_marker_name);
+			var end_idx = markerIndexFromName(end_marker_names[i]);
 			if (start_idx < 0 || end_idx < 0) {
 				// Some motions do not have all markers. Not to worry, simply skip this connection.
 				continue;
 			}
-			
-			// Create line.
-			var material = new THREE.LineBasicMaterial({
-				color: 0x0000ff,
-				linewidth: 2.0
-			});
-			var geometry = new THREE.Geometry();
-			geometry.vertices.push(
-				new THREE.Vector3(0, 0, 0),
-				new THREE.Vector3(0, 0, 0)
-				);
-			var line = new THREE.Line(geometry, material);
-			line.frustumCulled = false;
-			line.dynamic = true;
-			lines.push(line);
-			marker_line_mapping.push([start_idx, end_idx])
-			scene.add(line);
+			segments.push(start_idx, end_idx);
 		}
 	}
+	var geometry = new THREE.BufferGeometry();
+	geometry.setIndex(new THREE.BufferAttribute(new Uint16Array(segments), 1));
+	line_positions = new THREE.BufferAttribute(marker_positions, 3).setDynamic(true);
+	geometry.addAttribute('position', line_positions);
+	var material = new THREE.LineBasicMaterial({
+		color: 0x0000ff,
+		linewidth: 2.0
+	});
+	var line = new THREE.LineSegments(geometry, material);
+	line.frustumCulled = false;
+	lines = [line];
+	scene.add(line);
 };
 
-function updateMarkers() {
-	for (var i = 0; i < markers.length; i++) {
-		var marker = markers[i];
-		marker.position.x = data.frames[frame_idx][i * 3 + 0];
-		marker.position.y = data.frames[frame_idx][i * 3 + 1];
-		marker.position.z = data.frames[frame_idx][i * 3 + 2];
+function removeMarkers() {
+	var objects = markers.concat(lines);
+	for (var i = 0; i < objects.length; i++) {
+		scene.remove(objects[i]);
+		objects[i].geometry.dispose();
+		objects[i].material.dispose();
 	}
+	markers = [];
+	lines = [];
+	target_marker_idx = -1;
+};
 
-	for (var i in lines) {
-		mapping = marker_line_mapping[i];
-		start_marker = markers[mapping[0]]
-		end_marker = markers[mapping[1]]
-		line = lines[i];
-		line.geometry.vertices = [start_marker.position, end_marker.position];
-		line.geometry.verticesNeedUpdate = true;
+function updateMarkers() {
+	var frame = data.frames[frame_idx];
+	if (frame_fraction > 0 && frame_idx + 1 < loadedFrames()) {
+		var next_frame = data.frames[frame_idx + 1];
+		for (var i = 0; i < marker_positions.length; i++) {
+			marker_positions[i] = frame[i] + (next_frame[i] - frame[i]) * frame_fraction;
+		}
+	} else {
+		marker_positions.set(frame);
+	}
+	line_positions.needsUpdate = true;
+	if (marker_offsets !== null) {
+		marker_offsets.needsUpdate = true;
+		return;
+	}
+	for (var i = 0; i < markers.length; i++) {
+		markers[i].position.fromArray(marker_positions, 3 * i);
 	}
 };
 
-function render() {
+function render(timestamp) {
 	requestAnimationFrame(render);
-	if (frame_idx != prev_frame_idx) {
-		updateTargetPositionIfAppropriate();
+	advancePlayback(timestamp);
+	if (playback_time != prev_playback_time) {
 		updateMarkers();
+		updateTargetPositionIfAppropriate();
 	}
 	renderer.render(scene, camera);
-	prev_frame_idx = frame_idx;
+	prev_playback_time = playback_time;
 };
 
-function updateFrameIndexIfNecessary() {
-	if (playing && (looping || frame_idx < data.frames.length - 1)) {
-		frame_idx = (frame_idx + 1) % data.frames.length;
+function seek(idx) {
+	playback_time = idx * data.interval;
+	frame_idx = idx;
+	frame_fraction = 0;
+	prev_playback_time = -1;
+}
+
+function advancePlayback(timestamp) {
+	var elapsed = (last_timestamp === null || timestamp === undefined) ? 0 : Math.min(timestamp - last_timestamp, MAX_FRAME_TIME);
+	last_timestamp = timestamp === undefined ? null : timestamp;
+	if (!playing) {
+		return;
 	}
-	if (!looping && frame_idx == data.frames.length - 1) {
-		playing = false;
-		updateButton();
+
+	var n_frames = data.frames.length;
+	var duration = (n_frames - 1) * data.interval;
+	var loaded_duration = (loadedFrames() - 1) * data.interval;
+	var time = playback_time + Math.max(0, elapsed);
+	if (time > loaded_duration && loaded_duration < duration) {
+		// Wait until the next block of frames has been streamed.
+		time = Math.max(playback_time, loaded_duration);
+	} else if (time >= duration) {
+		if (looping && duration > 0) {
+			time %= duration;
+		} else {
+			time = duration;
+			playing = false;
+			updateButton();
+		}
 	}
-	if (update_slider) {
-		$("#motion-ui-slider").val(frame_idx);
+	playback_time = time;
+
+	var position = data.interval > 0 ? playback_time / data.interval : 0;
+	var idx = Math.min(Math.floor(position), n_frames - 1);
+	frame_fraction = position - idx;
+	if (idx != frame_idx) {
+		frame_idx = idx;
+		if (update_slider) {
+			$('#motion-ui-slider').val(frame_idx);
+		}
 	}
 };
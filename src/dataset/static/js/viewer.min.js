@@ -1 +1 @@
-function webglAvailable(){try{var e=document.createElement("canvas");return!!window.WebGLRenderingContext&&(e.getContext("webgl")||e.getContext("experimental-webgl"))}catch(r){return!1}}function initViewer(e,r,t,n){r=r||!1,t=t||new THREE.Vector3(15,15,15),n=n||new THREE.Vector3(0,0,10),$.getJSON(e,function(e){if($("#motion-loading").hide(),!webglAvailable()){var a=document.createElement("div");return a.id="webgl-error-message",a.innerHTML=window.WebGLRenderingContext?["Your graphics card does not seem to support WebGL.",'Find out how to get it <a href="http://get.webgl.org/">here</a>.'].join("\n"):["Your browser does not seem to support WebGL.",'Find out how to get it <a href="http://get.webgl.org/">here</a>.'].join("\n"),void $("#motion").append(a)}$("#motion-container").show(),data=e,looping=r,initUi(),initScene(t,n),initLights(),initFloor(),initMarkers(),updateMarkers(),render()})}function initUi(){window.setInterval(updateFrameIndexIfNecessary,data.interval),$("#motion-ui-slider").attr({max:data.frames.length-1,min:0}),$("#motion-ui-slider").bind("mousedown",function(){update_slider=!1,$("#motion-ui-slider").bind("mousemove",function(){playing=!1,frame_idx=parseInt($("#motion-ui-slider").val()),updateButton()})}),$("#motion-ui-slider").bind("mouseup",function(){$("#motion-ui-slider").val(frame_idx),update_slider=!0,$("#motion-ui-slider").unbind("mousemove")}),updateButton(),$("#motion-ui-button").click(function(){playing=!playing,playing&&frame_idx==data.frames.length-1&&(frame_idx=0),updateButton()})}function updateButton(){playing?$("#motion-ui-button").val("Pause"):$("#motion-ui-button").val("Play")}function initScene(e,r){targetElement=document.getElementById("motion-content"),scene=new THREE.Scene,camera=new THREE.PerspectiveCamera(75,targetElement.offsetWidth/targetElement.offsetHeight,.001,1e3),camera.up.set(0,0,1),camera.position.x=e.x,camera.position.y=e.y,camera.position.z=e.z;var t={antialias:!0,alpha:!0};renderer=new THREE.WebGLRenderer(t),renderer.setPixelRatio(window.devicePixelRatio),renderer.setSize(targetElement.offsetWidth,targetElement.offsetHeight),renderer.setClearColor(0,0),targetElement.appendChild(renderer.domElement),controls=new THREE.OrbitControls(camera,renderer.domElement),controls.enableZoom=!0,controls.enablePan=!1,controls.target=r,controls.keys=[],controls.update(),window.addEventListener("resize",function(){camera.aspect=targetElement.offsetWidth/targetElement.offsetHeight,camera.updateProjectionMatrix(),renderer.setSize(targetElement.offsetWidth,targetElement.offsetHeight)},!1)}function updateTargetPositionIfAppropriate(){var e=controls.object.position.sub(controls.target),r=positionOfMarker("STRN"),t=(new THREE.Vector3).copy(r).add(e);controls.target=r,controls.object.position.copy(t),controls.update()}function vectorToString(e){return"("+e.x+","+e.y+","+e.z+")"}function assert(e,r){if(!e)throw r||"Assertion failed"}function initLights(){ambientLight=new THREE.AmbientLight(16777215),scene.add(ambientLight)}function initFloor(){for(var e=16,r=new THREE.PlaneGeometry(200,200,e,e),t=new THREE.MeshBasicMaterial({color:6908265}),n=new THREE.MeshBasicMaterial({color:10461087}),a=[t,n],o=0;e>o;o++)for(var d=0;e>d;d++)i=o*e+d,j=2*i,r.faces[j].materialIndex=r.faces[j+1].materialIndex=(o+d)%2;floor=new THREE.Mesh(r,new THREE.MeshFaceMaterial(a)),scene.add(floor)}function markerIndexFromName(e){for(var r in data.markers)if(data.markers[r]==e)return r;return-1}function positionOfMarker(e){for(var r in data.markers)if(data.markers[r]==e){data.frames[frame_idx][r];return new THREE.Vector3(data.frames[frame_idx][3*r],data.frames[frame_idx][3*r+1],data.frames[frame_idx][3*r+2])}return-1}function initMarkers(){var e=data.markers.length,r=data.marker_set;r||(r="kit"),markers=[];for(var t=0;e>t;t++){var n=new THREE.SphereGeometry(.1,32,32),a=new THREE.MeshBasicMaterial({color:65280}),i=new THREE.Mesh(n,a);markers.push(i),scene.add(i)}lines=[],marker_line_mapping=[];for(var o in marker_connections[r])for(var d in marker_connections[r][o])if(end_marker_name=marker_connections[r][o][d],start_idx=markerIndexFromName(o),end_idx=markerIndexFromName(end_marker_name),!(start_idx<0||end_idx<0)){var a=new THREE.LineBasicMaterial({color:255,linewidth:2}),n=new THREE.Geometry;n.vertices.push(new THREE.Vector3(0,0,0),new THREE.Vector3(0,0,0));var s=new THREE.Line(n,a);s.frustumCulled=!1,s.dynamic=!0,lines.push(s),marker_line_mapping.push([start_idx,end_idx]),scene.add(s)}}function updateMarkers(){for(var e=0;e<markers.length;e++){var r=markers[e];r.position.x=data.frames[frame_idx][3*e+0],r.position.y=data.frames[frame_idx][3*e+1],r.position.z=data.frames[frame_idx][3*e+2]}for(var e in lines)mapping=marker_line_mapping[e],start_marker=markers[mapping[0]],end_marker=markers[mapping[1]],line=lines[e],line.geometry.vertices=[start_marker.position,end_marker.position],line.geometry.verticesNeedUpdate=!0}function render(){requestAnimationFrame(render),frame_idx!=prev_frame_idx&&(updateTargetPositionIfAppropriate(),updateMarkers()),renderer.render(scene,camera),prev_frame_idx=frame_idx}function updateFrameIndexIfNecessary(){playing&&(looping||frame_idx<data.frames.length-1)&&(frame_idx=(frame_idx+1)%data.frames.length),looping||frame_idx!=data.frames.length-1||(playing=!1,updateButton()),update_slider&&$("#motion-ui-slider").val(frame_idx)}var scene,camera,renderer,controls,ambientLight,lights,data,update_slider=!0,markers,lines,marker_line_mapping,marker_connections={kit:{LFHD:["RFHD","LBHD"],RBHD:["RFHD","LBHD"],C7:["RFHD","LBHD","RBHD","LFHD","CLAV","LSHO","RSHO"],STRN:["CLAV","RASI","LASI"],T10:["LSHO","RSHO"],L3:["LPSI","RPSI","T10"],LUPA:["LSHO","LAEL"],LAEL:["LFRA"],LFRA:["LWTS"],LWPS:["LHPS","LWTS"],LHTS:["LWTS","LIFD"],LHPS:["LIFD"],RUPA:["RSHO","RAEL"],RAEL:["RFRA"],RFRA:["RWTS"],RWPS:["RHPS","RWTS"],RHTS:["RWTS","RIFD"],RHPS:["RIFD"],LHIP:["LASI","LPSI"],LTHI:["LHIP"],LKNE:["LTHI","LTIP"],LHEE:["LTIP","LANK","LMT1"],LMT5:["LANK","LTOE"],LMT1:["LTOE"],RHIP:["RASI","RPSI"],RTHI:["RHIP"],RKNE:["RTHI","RTIP"],RHEE:["RTIP","RANK","RMT1"],RMT5:["RANK","RTOE"],RMT1:["RTOE"]},cmu:{LFHD:["RFHD","LBHD"],RBHD:["RFHD","LBHD"],C7:["RFHD","LBHD","RBHD","LFHD","CLAV","LSHO","RSHO"],STRN:["CLAV","RFWT","LFWT"],T10:["LSHO","RSHO","LBWT","RBWT"],LBWT:["RBWT"],LUPA:["LSHO","LELB"],LELB:["LFRM"],LFRM:["LWRA","LWRB"],LFIN:["LWRA","LWRB"],RUPA:["RSHO","RELB"],RELB:["RFRM"],RFRM:["RWRA","RWRB"],RFIN:["RWRA","RWRB"],LTHI:["LFWT","LBWT"],LKNE:["LTHI","LSHN"],LHEE:["LSHN","LANK"],LMT5:["LANK","LTOE"],LANK:["LTOE"],RTHI:["RFWT","RBWT"],RKNE:["RTHI","RSHN"],RHEE:["RSHN","RANK"],RMT5:["RANK","RTOE"],RANK:["RTOE"]}},frame_idx=0,prev_frame_idx=-1,playing=!0,looping=!1;
\ No newline at end of file
+var scene,camera,renderer,controls,ambientLight,lights,data;var update_slider=true;var markers,lines,marker_positions,marker_offsets,line_positions,marker_indexes;var target_marker_idx=-1;var target_position=new THREE.Vector3(),camera_direction=new THREE.Vector3();var marker_connections={'kit':{'LFHD':['RFHD','LBHD'],'RBHD':['RFHD','LBHD'],'C7':['RFHD','LBHD','RBHD','LFHD','CLAV','LSHO','RSHO'],'STRN':['CLAV','RASI','LASI'],'T10':['LSHO','RSHO'],'L3':['LPSI','RPSI','T10'],'LUPA':['LSHO','LAEL'],'LAEL':['LFRA'],'LFRA':['LWTS'],'LWPS':['LHPS','LWTS'],'LHTS':['LWTS','LIFD'],'LHPS':['LIFD'],'RUPA':['RSHO','RAEL'],'RAEL':['RFRA'],'RFRA':['RWTS'],'RWPS':['RHPS','RWTS'],'RHTS':['RWTS','RIFD'],'RHPS':['RIFD'],'LHIP':['LASI','LPSI'],'LTHI':['LHIP'],'LKNE':['LTHI','LTIP'],'LHEE':['LTIP','LANK','LMT1'],'LMT5':['LANK','LTOE'],'LMT1':['LTOE'],'RHIP':['RASI','RPSI'],'RTHI':['RHIP'],'RKNE':['RTHI','RTIP'],'RHEE':['RTIP','RANK','RMT1'],'RMT5':['RANK','RTOE'],'RMT1':['RTOE']},'cmu':{'LFHD':['RFHD','LBHD'],'RBHD':['RFHD','LBHD'],'C7':['RFHD','LBHD','RBHD','LFHD','CLAV','LSHO','RSHO'],'STRN':['CLAV','RFWT','LFWT'],'T10':['LSHO','RSHO','LBWT','RBWT'],'LBWT':['RBWT'],'LUPA':['LSHO','LELB'],'LELB':['LFRM'],'LFRM':['LWRA','LWRB'],'LFIN':['LWRA','LWRB'],'RUPA':['RSHO','RELB'],'RELB':['RFRM'],'RFRM':['RWRA','RWRB'],'RFIN':['RWRA','RWRB'],'LTHI':['LFWT','LBWT'],'LKNE':['LTHI','LSHN'],'LHEE':['LSHN','LANK'],'LMT5':['LANK','LTOE'],'LANK':['LTOE'],'RTHI':['RFWT','RBWT'],'RKNE':['RTHI','RSHN'],'RHEE':['RSHN','RANK'],'RMT5':['RANK','RTOE'],'RANK':['RTOE']}};var playback_time=0,prev_playback_time=-1,last_timestamp=null;var frame_idx=0,frame_fraction=0;var MAX_FRAME_TIME=100;var playing=true;var looping=false;var motion_loaded=$.Deferred();function webglAvailable(){try{var a=document.createElement("canvas");return!!window.WebGLRenderingContext&&(a.getContext("webgl")||a.getContext("experimental-webgl"));}catch(b){return false;}}var prefetched_urls={};function markPrefetched(a){prefetched_urls[motionUrl(a)]=true;}var preferred_fps=preferredFrameRate();document.cookie='motion_fps='+(preferred_fps||'')+'; path=/; max-age='+(30*24*60*60);function preferredFrameRate(){var a=navigator.connection||navigator.mozConnection||navigator.webkitConnection;if(a&&(a.saveData||/2g$/.test(a.effectiveType))){return 15;}if(a&&a.effectiveType=='3g'){return 30;}if(Math.min(window.screen.width,window.screen.height)<768){return 30;}return null;}function motionUrl(a){if(!preferred_fps||!/\.motion$/.test(a)){return a;}return a+'?fps='+preferred_fps;}function loadMotion(b){b=motionUrl(b);var c=$.Deferred();var e=/\.motion(\?|$)/.test(b)&&!prefetched_urls[b];var a=null;var d=startMotionDecoder(b,e,function(b){if(b.type=='progress'){showLoadingProgress(b.loaded,b.total);}else if(b.type=='motion'){a=createMotion(b.motion,new Float32Array(b.buffer,b.offset,3*b.motion.n_markers*b.motion.n_frames));a.decoder=d;stopMotionDecoder(a);c.resolve(a);}else if(b.type=='header'){a=createMotion(b.motion,new Float32Array(3*b.motion.n_markers*b.motion.n_frames));a.loaded_frames=0;a.decoder=d;c.resolve(a);}else if(b.type=='frames'){var e=new Uint8Array(a.values.buffer);e.set(new Uint8Array(b.buffer),b.offset);a.loaded_frames=Math.floor((b.offset+b.buffer.byteLength)/(12*a.markers.length));}else if(b.type=='done'){stopMotionDecoder(a);}else if(b.type=='error'){d.terminate();c.reject(b.message);}});return c.promise();}function startMotionDecoder(c,d,b){if(window.Worker&&motion_decoder_url){try{var a=new Worker(motion_decoder_url);a.onmessage=function(a){b(a.data);};a.onerror=function(a){b({type:'error',message:a.message});};var e=document.createElement('a');e.href=c;a.postMessage({url:e.href,stream:d});return a;}catch(g){}}var f={terminated:false,terminate:function(){this.terminated=true;}};fetchMotion(c,d,function(a){if(f.terminated){return false;}b(a);});return f;}function stopMotionDecoder(a){if(a.decoder){a.decoder.terminate();a.decoder=null;}}function createMotion(a,c){var d=3*a.n_markers;var e=new Array(a.n_frames);for(var b=0; b<a.n_frames; b++){e[b]=c.subarray(b*d,(b+1)*d);}return{marker_set:a.marker_set,markers:a.markers,interval:a.interval,values:c,frames:e};}function showLoadingProgress(b,a){if(a>0){$('#motion-loading-progress').text(Math.min(100,Math.round(100*b/a))+'%');}}function loadedFrames(){return data.loaded_frames===undefined?data.frames.length:data.loaded_frames;}function initViewer(d,b,c,a){b=b||false;c=c||new THREE.Vector3(15.,15.,15.);a=a||new THREE.Vector3(0.,0.,10.);loadMotion(d).done(function(e){$('#motion-loading').hide();motion_loaded.resolve();if(!webglAvailable()){var d=document.createElement('div');d.id='webgl-error-message';d.innerHTML=window.WebGLRenderingContext?['Your graphics card does not seem to support WebGL.','Find out how to get it <a href="http://get.webgl.org/">here</a>.'].join('\n'):['Your browser does not seem to support WebGL.','Find out how to get it <a href="http://get.webgl.org/">here</a>.'].join('\n');$('#motion').append(d);return;}$('#motion-container').show();data=e;looping=b;initUi();initScene(c,a);initLights();initFloor();initMarkers();updateMarkers();render();});};function prefetchMotion(a){markPrefetched(a);a=motionUrl(a);motion_loaded.always(function(){if(window.fetch){fetch(a).then(null,function(){});}else{$.ajax({url:a,dataType:'text',cache:true});}});}function swapMotion(a){motion_loaded=$.Deferred();return loadMotion(a).done(function(a){removeMarkers();stopMotionDecoder(data);data=a;seek(0);playing=true;initPlayback();initMarkers();updateMarkers();motion_loaded.resolve();}).fail(function(){motion_loaded.reject();});}function initPlayback(){$('#motion-ui-slider').attr({'max':data.frames.length-1,'min':0});$('#motion-ui-slider').val(frame_idx);updateButton();}function initUi(){initPlayback();$('#motion-ui-slider').bind('mousedown',function(){update_slider=false;$('#motion-ui-slider').bind('mousemove',function(){playing=false;seek(Math.max(0,Math.min(parseInt($('#motion-ui-slider').val()),loadedFrames()-1)));updateButton();});});$('#motion-ui-slider').bind('mouseup',function(){$('#motion-ui-slider').val(frame_idx);update_slider=true;$('#motion-ui-slider').unbind('mousemove');});$('#motion-ui-button').click(function(){playing=!playing;if(playing&&frame_idx==data.frames.length-1){seek(0);}updateButton();});};function updateButton(){if(playing){$('#motion-ui-button').val('Pause');}else{$('#motion-ui-button').val('Play');}}function initScene(a,b){targetElement=document.getElementById("motion-content");scene=new THREE.Scene();camera=new THREE.PerspectiveCamera(75,targetElement.offsetWidth/targetElement.offsetHeight,0.001,1000);camera.up.set(0,0,1);camera.position.x=a.x;camera.position.y=a.y;camera.position.z=a.z;var c={antialias:true,alpha:true};renderer=new THREE.WebGLRenderer(c);renderer.setPixelRatio(window.devicePixelRatio);renderer.setSize(targetElement.offsetWidth,targetElement.offsetHeight);renderer.setClearColor(0x000000,0);targetElement.appendChild(renderer.domElement);controls=new THREE.OrbitControls(camera,renderer.domElement);controls.enableZoom=true;controls.enablePan=false;controls.target=b;controls.keys=[];controls.update();window.addEventListener('resize',function(){camera.aspect=targetElement.offsetWidth/targetElement.offsetHeight;camera.updateProjectionMatrix();renderer.setSize(targetElement.offsetWidth,targetElement.offsetHeight);},false);};function updateTargetPositionIfAppropriate(){if(target_marker_idx<0){return;}camera_direction.subVectors(controls.object.position,controls.target);positionOfMarker(target_marker_idx,target_position);controls.target.copy(target_position);controls.object.position.copy(target_position).add(camera_direction);controls.update();}function vectorToString(a){return'('+a.x+','+a.y+','+a.z+')';};function assert(b,a){if(!b){throw a||'Assertion failed';}};function initLights(){ambientLight=new THREE.AmbientLight(0xffffff);scene.add(ambientLight);};function initFloor(){var a=16;var d=new THREE.PlaneGeometry(200,200,a,a);var g=new THREE.MeshBasicMaterial({color:0x696969});var f=new THREE.MeshBasicMaterial({color:0x9f9f9f});var e=[g,f];for(var c=0; c<a; c++){for(var b=0; b<a; b++){i=c*a+b;j=2*i;d.faces[j].materialIndex=d.faces[j+1].materialIndex=(c+b)%2;}}floor=new THREE.Mesh(d,new THREE.MeshFaceMaterial(e));scene.add(floor);};function markerIndexFromName(a){return marker_indexes.hasOwnProperty(a)?marker_indexes[a]:-1;};function positionOfMarker(b,a){return a.fromArray(marker_positions,3*b);}var MARKER_VERTEX_SHADER=['precision mediump float;','uniform mat4 modelViewMatrix;','uniform mat4 projectionMatrix;','attribute vec3 position;','attribute vec3 offset;','void main() {','	gl_Position = projectionMatrix * modelViewMatrix * vec4(position + offset, 1.0);','}'].join('\n');var MARKER_FRAGMENT_SHADER=['precision mediump float;','uniform vec3 color;','void main() {','	gl_FragColor = vec4(color, 1.0);','}'].join('\n');function initMarkers(){var g=data.markers.length;var e=data.marker_set;if(!e){e='kit';}marker_indexes={};for(var a=0; a<g; a++){marker_indexes[data.markers[a]]=a;}target_marker_idx=markerIndexFromName('STRN');marker_positions=new Float32Array(3*g);markers=[];marker_offsets=null;var f=new THREE.SphereBufferGeometry(0.1,16,12);if(renderer.extensions.get('ANGLE_instanced_arrays')!==null){var b=new THREE.InstancedBufferGeometry();b.setIndex(f.index);b.addAttribute('position',f.attributes.position);marker_offsets=new THREE.InstancedBufferAttribute(marker_positions,3,1).setDynamic(true);b.addAttribute('offset',marker_offsets);var d=new THREE.RawShaderMaterial({uniforms:{color:{type:'c',value:new THREE.Color(0x00ff00)}},vertexShader:MARKER_VERTEX_SHADER,fragmentShader:MARKER_FRAGMENT_SHADER});var c=new THREE.Mesh(b,d);c.frustumCulled=false;markers.push(c);scene.add(c);}else{var d=new THREE.MeshBasicMaterial({color:0x00ff00});for(var a=0; a<g; a++){var c=new THREE.Mesh(f,d);markers.push(c);scene.add(c);}}var k=[];for(var i in marker_connections[e]){var l=marker_connections[e][i];for(var a=0; a<l.length; a++){var j=markerIndexFromName(i);var m=markerIndexFromName(l[a]);if(j<0||m<0){continue;}k.push(j,m);}}var b=new THREE.BufferGeometry();b.setIndex(new THREE.BufferAttribute(new Uint16Array(k),1));line_positions=new THREE.BufferAttribute(marker_positions,3).setDynamic(true);b.addAttribute('position',line_positions);var d=new THREE.LineBasicMaterial({color:0x0000ff,linewidth:2.0});var h=new THREE.LineSegments(b,d);h.frustumCulled=false;lines=[h];scene.add(h);};function removeMarkers(){var b=markers.concat(lines);for(var a=0; a<b.length; a++){scene.remove(b[a]);b[a].geometry.dispose();b[a].material.dispose();}markers=[];lines=[];target_marker_idx=-1;};function updateMarkers(){var b=data.frames[frame_idx];if(frame_fraction>0&&frame_idx+1<loadedFrames()){var c=data.frames[frame_idx+1];for(var a=0; a<marker_positions.length; a++){marker_positions[a]=b[a]+(c[a]-b[a])*frame_fraction;}}else{marker_positions.set(b);}line_positions.needsUpdate=true;if(marker_offsets!==null){marker_offsets.needsUpdate=true;return;}for(var a=0; a<markers.length; a++){markers[a].position.fromArray(marker_positions,3*a);}};function render(a){requestAnimationFrame(render);advancePlayback(a);if(playback_time!=prev_playback_time){updateMarkers();updateTargetPositionIfAppropriate();}renderer.render(scene,camera);prev_playback_time=playback_time;};function seek(a){playback_time=a*data.interval;frame_idx=a;frame_fraction=0;prev_playback_time=-1;}function advancePlayback(c){var h=(last_timestamp===null||c===undefined)?0:Math.min(c-last_timestamp,MAX_FRAME_TIME);last_timestamp=c===undefined?null:c;if(!playing){return;}var g=data.frames.length;var b=(g-1)*data.interval;var d=(loadedFrames()-1)*data.interval;var a=playback_time+Math.max(0,h);if(a>d&&d<b){a=Math.max(playback_time,d);}else if(a>=b){if(looping&&b>0){a%=b;}else{a=b;playing=false;updateButton();}}playback_time=a;var f=data.interval>0?playback_time/data.interval:0;var e=Math.min(Math.floor(f),g-1);frame_fraction=f-e;if(e!=frame_idx){frame_idx=e;if(update_slider){$('#motion-ui-slider').val(frame_idx);}}};
\ No newline at end of file
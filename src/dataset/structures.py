@@ -0,0 +1,224 @@
+import random
+
+import numpy as np
+
+
+class IndexedSet(object):
+	"""Set of integers with O(1) insertion, removal and uniform random choice."""
+
+	def __init__(self, values=()):
+		self.values = []
+		self.positions = {}
+		for value in values:
+			self.add(value)
+
+	def __len__(self):
+		return len(self.values)
+
+	def __contains__(self, value):
+		return value in self.positions
+
+	def __iter__(self):
+		return iter(self.values)
+
+	def add(self, value):
+		if value in self.positions:
+			return
+		self.positions[value] = len(self.values)
+		self.values.append(value)
+
+	def discard(self, value):
+		idx = self.positions.pop(value, None)
+		if idx is None:
+			return
+		# Move the last element into the free slot so that the list stays dense.
+		last = self.values.pop()
+		if idx < len(self.values):
+			self.values[idx] = last
+			self.positions[last] = idx
+
+	def choice(self, rng=random):
+		if len(self.values) == 0:
+			return None
+		return self.values[rng.randrange(len(self.values))]
+
+
+class SortedIntArray(object):
+	"""Compact set of integers stored as a sorted NumPy array with O(log n) membership tests."""
+
+	def __init__(self, values=()):
+		self.values = np.unique(np.asarray(list(values), dtype='int64'))
+
+	def __len__(self):
+		return len(self.values)
+
+	def __contains__(self, value):
+		idx = np.searchsorted(self.values, value)
+		return idx < len(self.values) and self.values[idx] == value
+
+	def __iter__(self):
+		return iter(self.values.tolist())
+
+	def add(self, value):
+		idx = np.searchsorted(self.values, value)
+		if idx < len(self.values) and self.values[idx] == value:
+			return
+		self.values = np.insert(self.values, idx, value)
+
+	def discard(self, value):
+		idx = np.searchsorted(self.values, value)
+		if idx < len(self.values) and self.values[idx] == value:
+			self.values = np.delete(self.values, idx)
+
+
+class FenwickTree(object):
+	"""Binary indexed tree over non-negative weights with O(log n) updates, prefix sums and sampling."""
+
+	def __init__(self, weights=()):
+		self.weights = np.array(weights, dtype='float64')
+		self.tree = self.build(self.weights)
+
+	@staticmethod
+	def build(weights):
+		# Every node i stores the sum of the weights in (i - lowbit(i), i], which can be computed from the
+		# prefix sums without iterating over the tree.
+		n = len(weights)
+		prefix_sums = np.zeros(n + 1)
+		np.cumsum(weights, out=prefix_sums[1:])
+		idx = np.arange(1, n + 1)
+		tree = np.zeros(n + 1)
+		tree[1:] = prefix_sums[idx] - prefix_sums[idx - (idx & -idx)]
+		return tree
+
+	def __len__(self):
+		return len(self.weights)
+
+	def __getitem__(self, idx):
+		return self.weights[idx]
+
+	def __setitem__(self, idx, weight):
+		assert weight >= 0.
+		delta = weight - self.weights[idx]
+		self.weights[idx] = weight
+		n = len(self.weights)
+		i = idx + 1
+		while i <= n:
+			self.tree[i] += delta
+			i += i & -i
+
+	def resize(self, size):
+		weights = np.zeros(size)
+		n = min(size, len(self.weights))
+		weights[:n] = self.weights[:n]
+		self.weights = weights
+		self.tree = self.build(weights)
+
+	def prefix_sum(self, idx):
+		# Sum of the weights in [0, idx).
+		total = 0.
+		i = idx
+		while i > 0:
+			total += self.tree[i]
+			i -= i & -i
+		return total
+
+	def total(self):
+		return self.prefix_sum(len(self.weights))
+
+	def find(self, value):
+		# Returns the smallest index whose prefix sum (inclusive) exceeds value.
+		n = len(self.weights)
+		pos = 0
+		step = 1
+		while step * 2 <= n:
+			step *= 2
+		while step > 0:
+			nxt = pos + step
+			if nxt <= n and self.tree[nxt] <= value:
+				pos = nxt
+				value -= self.tree[nxt]
+			step //= 2
+		return min(pos, n - 1)
+
+
+class WeightedIndex(object):
+	"""Maps integer keys to non-negative weights and draws keys proportionally to their weight in O(log n)."""
+
+	def __init__(self, items=()):
+		items = list(items)
+		self.keys = IndexedSet(key for key, _ in items)
+		self.slots = dict((key, slot) for slot, (key, _) in enumerate(items))
+		self.slot_keys = [key for key, _ in items]
+		self.free_slots = []
+		self.tree = FenwickTree([weight for _, weight in items])
+
+	def __len__(self):
+		return len(self.keys)
+
+	def __contains__(self, key):
+		return key in self.keys
+
+	def __iter__(self):
+		return iter(self.keys)
+
+	def __getitem__(self, key):
+		return self.tree[self.slots[key]]
+
+	def __setitem__(self, key, weight):
+		slot = self.slots.get(key)
+		if slot is None:
+			if len(self.free_slots) > 0:
+				slot = self.free_slots.pop()
+				self.slot_keys[slot] = key
+			else:
+				slot = len(self.slot_keys)
+				self.slot_keys.append(key)
+				if slot >= len(self.tree):
+					# Grow geometrically so that insertions stay amortized O(log n).
+					self.tree.resize(max(16, 2 * len(self.tree)))
+			self.slots[key] = slot
+			self.keys.add(key)
+		self.tree[slot] = weight
+
+	def discard(self, key):
+		slot = self.slots.pop(key, None)
+		if slot is None:
+			return
+		self.tree[slot] = 0.
+		self.slot_keys[slot] = None
+		self.free_slots.append(slot)
+		self.keys.discard(key)
+
+	def total(self):
+		return self.tree.total()
+
+	def choice(self, rng=random):
+		return self.keys.choice(rng)
+
+	def sample(self, exclude=(), rng=random, max_rejections=32):
+		# Rejection sampling is cheap as long as the excluded keys only carry a small fraction of the total weight.
+		for _ in xrange(max_rejections):
+			key = self._sample(rng)
+			if key is None or key not in exclude:
+				return key
+
+		# Otherwise, temporarily remove the weight of all excluded keys, which costs O(k log n).
+		removed = [(self.slots[key], self[key]) for key in exclude if key in self.slots]
+		for slot, _ in removed:
+			self.tree[slot] = 0.
+		try:
+			return self._sample(rng)
+		finally:
+			for slot, weight in removed:
+				self.tree[slot] = weight
+
+	def _sample(self, rng):
+		for _ in xrange(3):
+			total = self.tree.total()
+			if total <= 0.:
+				return None
+			slot = self.tree.find(rng.random() * total)
+			# Floating point errors can, in rare cases, select a slot without any weight.
+			if self.tree[slot] > 0.:
+				return self.slot_keys[slot]
+		return None
@@ -1,3 +1,1495 @@
-from django.test import TestCase
+import collections
+import gzip
+import io
+import json
+import os
+import random
+import shutil
+import StringIO
+import sys
+import tempfile
+import time
+import unittest
+import warnings
+import xml.etree.cElementTree as ElementTree
+from datetime import timedelta
 
-# Create your tests here.
+import c3d
+import Ice
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .compression import has_compressed_variants, parse_accept_encoding, select_variant, write_compressed_variants
+from .dictionary import EnchantDictionary, WordIndexDictionary, read_hunspell_dictionary, tokenize, word_hash, write_word_index
+from .management.commands.importmotions import SUPPORTED_MARKER_NAMES, parse_motion, pose_matrix
+from .management import util
+from .management.filecache import FileCache
+from .management.downloads import DownloadScheduler, DownloadTimeoutError, Result, download_motion_files
+from .management.metadatacache import CachedMotionDatabase
+from . import dictionary, motionformat, sampler
+from .motionformat import resampling_weights
+from .models import Annotation, MotionFile, MotionLease, Statistics, UserAnnotationCount
+from .views import leaderboard_context, parse_byte_range, parse_leaderboard_cursor, save_annotation
+from .structures import FenwickTree, IndexedSet, SortedIntArray, WeightedIndex
+
+
+HUNSPELL_DICTIONARY_DIRECTORIES = ['/usr/share/hunspell', '/usr/share/myspell', '/usr/share/myspell/dicts', '/Library/Spelling']
+
+
+def find_hunspell_dictionary(tag='en_US'):
+	# Returns the path of the .dic file that enchant most likely uses, or None.
+	directories = list(HUNSPELL_DICTIONARY_DIRECTORIES)
+	try:
+		import enchant
+		directories.append(os.path.join(os.path.dirname(enchant.__file__), 'data', 'mingw64', 'share', 'enchant', 'hunspell'))
+	except ImportError:
+		pass
+	for directory in directories:
+		path = os.path.join(directory, tag + '.dic')
+		if os.path.exists(path) and os.path.exists(os.path.join(directory, tag + '.aff')):
+			return path
+	return None
+
+
+def enchant_is_available(tag='en_US'):
+	try:
+		import enchant
+		return enchant.dict_exists(tag)
+	except (ImportError, AttributeError):
+		return False
+
+
+class HunspellDictionaryTestCase(TestCase):
+	AFFIXES = '\n'.join([
+		'SET UTF-8',
+		'FORBIDDENWORD !',
+		'PFX U Y 1',
+		'PFX U   0     un         .',
+		'SFX D Y 4',
+		'SFX D   0     d          e',
+		'SFX D   y     ied        [^aeiou]y',
+		'SFX D   0     ed         [^ey]',
+		'SFX D   0     ed         [aeiou]y',
+		'SFX G Y 2',
+		'SFX G   e     ing        e',
+		'SFX G   0     ing        [^e]',
+		'SFX S Y 4',
+		'SFX S   y     ies        [^aeiou]y',
+		'SFX S   0     s          [aeiou]y',
+		'SFX S   0     es         [sxzh]',
+		'SFX S   0     s          [^sxzhy]',
+	])
+	WORDS = '\n'.join([
+		'5',
+		'walk/DGS',
+		'wave/DGS',
+		'carry/DS',
+		'lock/UD',
+		'walkes/!',
+	])
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.dic_path = os.path.join(self.directory, 'test.dic')
+		self.aff_path = os.path.join(self.directory, 'test.aff')
+		with open(self.dic_path, 'w') as f:
+			f.write(self.WORDS)
+		with open(self.aff_path, 'w') as f:
+			f.write(self.AFFIXES)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_affixes_are_expanded(self):
+		words = read_hunspell_dictionary(self.dic_path, self.aff_path)
+		self.assertEqual(words, set([
+			'walk', 'walked', 'walking', 'walks',
+			'wave', 'waved', 'waving', 'waves',
+			'carry', 'carried', 'carries',
+			'lock', 'locked', 'unlock', 'unlocked',
+		]))
+
+
+class WordIndexTestCase(TestCase):
+	WORDS = [u'walk', u'walks', u'Paris', u'na\xefve', u"person's", u'a']
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'words')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_lookup(self):
+		self.assertEqual(write_word_index(self.WORDS + [u'walk'], self.path), len(self.WORDS))
+		index = WordIndexDictionary(self.path)
+		self.assertEqual(len(index), len(self.WORDS))
+		for word in self.WORDS:
+			self.assertIn(word, index)
+		for word in [u'', u'wal', u'walked', u'paris', u'naive', u'persons']:
+			self.assertNotIn(word, index)
+
+	def test_collisions(self):
+		# With four words, the table has eight slots. Pick words that all hash to the last one, so that probing
+		# wraps around, and look up another word of that slot that is not in the index.
+		colliding = [word for word in (u'w{}'.format(i) for i in xrange(10000)) if word_hash(word.encode('utf-8')) & 7 == 7]
+		write_word_index(colliding[:4], self.path)
+		index = WordIndexDictionary(self.path)
+		self.assertEqual(index.n_slots, 8)
+		for word in colliding[:4]:
+			self.assertIn(word, index)
+		self.assertNotIn(colliding[4], index)
+
+	def test_check(self):
+		write_word_index(self.WORDS, self.path)
+		index = WordIndexDictionary(self.path)
+		self.assertTrue(index.check(u'Walks'))
+		self.assertTrue(index.check(u'WALK'))
+		self.assertTrue(index.check(u'Paris'))
+		self.assertFalse(index.check(u'paris'))
+
+	def test_invalid_index(self):
+		with self.assertRaises(ImproperlyConfigured):
+			WordIndexDictionary(self.path)
+		with open(self.path, 'wb') as f:
+			f.write(b'\0' * 64)
+		with self.assertRaises(ValueError):
+			WordIndexDictionary(self.path)
+
+	def test_tokenize(self):
+		self.assertEqual(list(tokenize(u"A person's 'quick' walk, 2 times.")), [(u'A', 0), (u"person's", 2), (u'quick', 12), (u'walk', 19), (u'times', 27)])
+
+	def test_build_command(self):
+		wordlist = os.path.join(self.directory, 'words.txt')
+		with io.open(wordlist, 'w', encoding='utf-8') as f:
+			f.write(u'walk\n  runs \n\n42\n')
+		call_command('builddictionary', wordlist, output=self.path, stdout=StringIO.StringIO())
+		index = WordIndexDictionary(self.path)
+		self.assertEqual(len(index), 2)
+		self.assertIn(u'runs', index)
+		dic_path = os.path.join(self.directory, 'words.dic')
+		with open(dic_path, 'w') as f:
+			f.write('1\nwalk/S\n')
+		with self.assertRaises(CommandError):
+			call_command('builddictionary', dic_path, output=self.path, stdout=StringIO.StringIO())
+
+
+@unittest.skipUnless(enchant_is_available() and find_hunspell_dictionary() is not None, 'enchant or its en_US dictionary is not installed')
+class WordIndexEnchantTestCase(TestCase):
+	INFLECTED_WORDS = [
+		'walks', 'walked', 'walking', 'jumps', 'jumped', 'jumping', 'waves', 'waved', 'waving', 'runs', 'running',
+		'persons', 'arms', 'hands', 'steps', 'stepped', 'stepping', 'carries', 'carried', 'carrying', 'turned',
+		'turning', 'sits', 'sitting', 'stands', 'kicks', 'kicked', 'throws', 'throwing', 'danced', 'dancing', 'slowly',
+		'quickly', 'happier', 'happiest', 'stumbles', 'stumbling', 'person\'s', 'walkings', 'jumpeded', 'wavs',
+	]
+
+	@classmethod
+	def setUpClass(cls):
+		super(WordIndexEnchantTestCase, cls).setUpClass()
+		cls.directory = tempfile.mkdtemp()
+		dic_path = find_hunspell_dictionary()
+		path = os.path.join(cls.directory, 'en_US.words')
+		write_word_index(read_hunspell_dictionary(dic_path, os.path.splitext(dic_path)[0] + '.aff'), path)
+		cls.word_index = WordIndexDictionary(path)
+		cls.enchant = EnchantDictionary()
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.directory)
+		super(WordIndexEnchantTestCase, cls).tearDownClass()
+
+	def test_inflected_words(self):
+		for word in self.INFLECTED_WORDS:
+			self.assertEqual(self.word_index.check(word), self.enchant.check(word), word)
+
+	def test_annotation_verdicts(self):
+		for description in ['A person walks forward and waves with both hands.', 'Someone is jumping and kicking.',
+				'The human stumbled, turned around and was running slowly.', 'A persn walkings forwrd.']:
+			annotation = Annotation(description=description)
+			self.assertEqual(annotation.is_valid(self.word_index), annotation.is_valid(self.enchant), description)
+
+
+class CountingMotionDatabase(object):
+	def __init__(self):
+		self.calls = []
+
+	def listMotions(self, *args):
+		self.calls.append('listMotions')
+		return [1, 2, 3]
+
+	def listFiles(self, motion_id):
+		self.calls.append('listFiles')
+		return ['file-{}'.format(motion_id)]
+
+
+class CachedMotionDatabaseTestCase(TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.db = CountingMotionDatabase()
+		self.cached_db = CachedMotionDatabase(self.db, os.path.join(self.directory, 'metadata.sqlite3'), 60)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_motions_are_cached(self):
+		self.assertEqual(self.cached_db.listMotions(None, 'id'), [1, 2, 3])
+		self.assertEqual(self.cached_db.listMotions(None, 'id'), [1, 2, 3])
+		self.assertEqual(self.db.calls, ['listMotions'])
+		self.cached_db.invalidate()
+		self.cached_db.listMotions(None, 'id')
+		self.assertEqual(self.db.calls, ['listMotions', 'listMotions'])
+
+	def test_files_are_not_cached(self):
+		# Their visibility can change at any time.
+		self.assertEqual(self.cached_db.listFiles(1), ['file-1'])
+		self.assertEqual(self.cached_db.listFiles(1), ['file-1'])
+		self.assertEqual(self.db.calls, ['listFiles', 'listFiles'])
+
+
+class SynchronousFileReader(object):
+	# Answers asynchronous calls right away, like a motion database without latency.
+	def __init__(self, data):
+		self.data = data
+		self.position = 0
+		self.destroyed = False
+
+	def begin_getSize(self, _response, _ex):
+		_response(len(self.data))
+
+	def begin_readChunk(self, length, _response, _ex):
+		chunk = self.data[self.position:self.position + length]
+		self.position += len(chunk)
+		_response(chunk)
+
+	def begin_seek(self, position, _response, _ex):
+		self.position = position
+		_response()
+
+	def begin_destroy(self):
+		self.destroyed = True
+
+
+class SynchronousMotionDatabase(object):
+	def __init__(self, files, contents):
+		self.files = files
+		self.contents = contents
+		self.readers = []
+
+	def begin_listFiles(self, motion_id, _response, _ex):
+		if motion_id not in self.files:
+			_ex(KeyError(motion_id))
+			return
+		_response(self.files[motion_id])
+
+	def begin_getFileReader(self, file_id, _response, _ex):
+		self.readers.append(SynchronousFileReader(self.contents[file_id]))
+		_response(self.readers[-1])
+
+
+class FailingFileCache(object):
+	def get(self, file_id, size):
+		return None
+
+	def put(self, file_id, data):
+		raise IOError('disk full')
+
+
+class DownloadSchedulerTestCase(TestCase):
+	def setUp(self):
+		self.db = SynchronousMotionDatabase({1: [10]}, {10: b'c3d' * 10000, 11: b'mmm'})
+
+	def test_download(self):
+		scheduler = DownloadScheduler(self.db, chunk_size=4096)
+		self.assertEqual(scheduler.download(10).get(1), (b'c3d' * 10000, None))
+		self.assertTrue(self.db.readers[0].destroyed)
+		self.assertEqual(scheduler.open_files, 0)
+
+	def test_failing_callback_finishes_download(self):
+		scheduler = DownloadScheduler(self.db, cache=FailingFileCache())
+		data, error = scheduler.download(10).get(1)
+		self.assertIsNone(data)
+		self.assertIsInstance(error, IOError)
+		self.assertTrue(self.db.readers[0].destroyed)
+		self.assertEqual(scheduler.open_files, 0)
+
+	def test_timeout(self):
+		data, error = Result().get(timeout=1)
+		self.assertIsNone(data)
+		self.assertIsInstance(error, DownloadTimeoutError)
+
+	def test_list_files_error_is_reported(self):
+		Motion = collections.namedtuple('Motion', 'id')
+		File = collections.namedtuple('File', 'id')
+		select_files = lambda motion, files: [(File(file_id), File(file_id + 1)) for file_id in files]
+		scheduler = DownloadScheduler(self.db)
+		results = list(download_motion_files(scheduler, [Motion(1), Motion(2)], select_files, timeout=1))
+		self.assertEqual(results[0], (Motion(1), [(File(10), b'c3d' * 10000, b'mmm')], None))
+		self.assertEqual(results[1][:2], (Motion(2), []))
+		self.assertIsInstance(results[1][2], KeyError)
+
+
+class MotionStreamingTestCase(TestCase):
+	DATA = b''.join(chr(i % 256) for i in range(10000))
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.filename = motionformat.content_filename(self.DATA)
+		path = os.path.join(self.directory, self.filename)
+		with open(path, 'wb') as f:
+			f.write(self.DATA)
+		write_compressed_variants(path)
+		self.settings = override_settings(MOTION_FILES_ROOT=self.directory)
+		self.settings.enable()
+		self.url = reverse('dataset:motion', args=[self.filename])
+
+	def tearDown(self):
+		self.settings.disable()
+		shutil.rmtree(self.directory)
+
+	def test_ranges_of_compressed_variants_are_not_served(self):
+		response = self.client.get(self.url, HTTP_RANGE='bytes=0-99', HTTP_ACCEPT_ENCODING='gzip')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertEqual(response['ETag'], '"{}.gz"'.format(self.filename))
+		self.assertIn('Accept-Encoding', response['Vary'])
+
+	def test_streamed_motions_are_not_compressed(self):
+		response = self.client.get(self.url + '?stream=1', HTTP_RANGE='bytes=100-199', HTTP_ACCEPT_ENCODING='gzip')
+		self.assertEqual(response.status_code, 206)
+		self.assertEqual(response.content, self.DATA[100:200])
+		self.assertEqual(response['Content-Range'], 'bytes 100-199/10000')
+		self.assertEqual(response['ETag'], '"{}"'.format(self.filename))
+		self.assertFalse(response.has_header('Content-Encoding'))
+		self.assertFalse(response.has_header('Vary'))
+
+	def test_ranges_without_content_coding(self):
+		response = self.client.get(self.url, HTTP_RANGE='bytes=-10', HTTP_ACCEPT_ENCODING='identity')
+		self.assertEqual(response.status_code, 206)
+		self.assertEqual(response.content, self.DATA[-10:])
+		self.assertIn('Accept-Encoding', response['Vary'])
+
+	def test_unsatisfiable_ranges(self):
+		response = self.client.get(self.url + '?stream=1', HTTP_RANGE='bytes=10000-')
+		self.assertEqual(response.status_code, 416)
+		self.assertEqual(response['Content-Range'], 'bytes */10000')
+
+	def test_parse_byte_range(self):
+		self.assertEqual(parse_byte_range('bytes=0-99', 1000), (0, 100))
+		self.assertEqual(parse_byte_range('bytes=900-', 1000), (900, 1000))
+		self.assertEqual(parse_byte_range('bytes=900-2000', 1000), (900, 1000))
+		self.assertEqual(parse_byte_range('bytes=-100', 1000), (900, 1000))
+		self.assertEqual(parse_byte_range('bytes=-2000', 1000), (0, 1000))
+		# Multiple ranges and other units are answered with the whole file.
+		self.assertIsNone(parse_byte_range('bytes=0-9, 20-29', 1000))
+		self.assertIsNone(parse_byte_range('items=0-9', 1000))
+		self.assertIsNone(parse_byte_range('bytes=-', 1000))
+		for header in ['bytes=1000-', 'bytes=1000-1999', 'bytes=-0', 'bytes=20-9']:
+			with self.assertRaises(ValueError):
+				parse_byte_range(header, 1000)
+
+
+class FileReader(object):
+	def __init__(self, data):
+		self.data = data
+		self.position = 0
+		self.n_chunks = 0
+
+	def getSize(self):
+		return len(self.data)
+
+	def readChunk(self, length):
+		self.n_chunks += 1
+		chunk = self.data[self.position:self.position + length]
+		self.position += len(chunk)
+		return chunk
+
+	def seek(self, position):
+		self.position = position
+
+
+class FailingFileReader(FileReader):
+	# Raises the exception of the reader's `fail` function, e.g. when a chunk is read after the given number of bytes.
+	def __init__(self, data, fail):
+		super(FailingFileReader, self).__init__(data)
+		self.fail = fail
+		self.seeks = []
+		self.chunk_sizes = []
+
+	def readChunk(self, length):
+		self.chunk_sizes.append(length)
+		ex = self.fail(self.position, length)
+		if ex is not None:
+			raise ex
+		return super(FailingFileReader, self).readChunk(length)
+
+	def seek(self, position):
+		self.seeks.append(position)
+		super(FailingFileReader, self).seek(position)
+
+
+class ReadFileTestCase(TestCase):
+	DATA = b''.join(chr(i % 251) for i in range(300000))
+
+	def setUp(self):
+		# Retries are not delayed.
+		self.retry_interval = util.DOWNLOAD_RETRY_INTERVAL
+		util.DOWNLOAD_RETRY_INTERVAL = 0.
+
+	def tearDown(self):
+		util.DOWNLOAD_RETRY_INTERVAL = self.retry_interval
+
+	def test_read(self):
+		reader = FileReader(self.DATA)
+		self.assertEqual(util.read_file(reader), self.DATA)
+		# The chunk size doubles from 32 kB, so 300 kB take four chunks.
+		self.assertEqual(reader.n_chunks, 4)
+		f = tempfile.TemporaryFile()
+		self.assertEqual(util.read_file(FileReader(self.DATA), f), len(self.DATA))
+		f.seek(0)
+		self.assertEqual(f.read(), self.DATA)
+
+	def test_resume_after_timeout(self):
+		failed = []
+
+		def fail(position, length):
+			# The connection times out once the first two chunks have been read.
+			if position == 3 * util.DOWNLOAD_CHUNK_SIZE and not failed:
+				failed.append(position)
+				return Ice.TimeoutException()
+		reader = FailingFileReader(self.DATA, fail)
+		statistics = util.DownloadStatistics()
+		self.assertEqual(util.read_file(reader, statistics=statistics), self.DATA)
+		self.assertEqual(reader.seeks, [3 * util.DOWNLOAD_CHUNK_SIZE])
+		self.assertEqual(statistics.retries, 1)
+		self.assertEqual(statistics.size, len(self.DATA))
+
+	def test_chunk_size_is_halved(self):
+		limit = 50000
+
+		def fail(position, length):
+			if length > limit:
+				return Ice.MemoryLimitException()
+		reader = FailingFileReader(self.DATA, fail)
+		self.assertEqual(util.read_file(reader), self.DATA)
+		# 32 kB, then 64 kB are refused, so the reader seeks back to 32 kB and continues with chunks of 32 kB.
+		self.assertEqual(reader.chunk_sizes[:4], [32768, 65536, 32768, 32768])
+		self.assertEqual(reader.seeks, [32768])
+		self.assertLessEqual(max(reader.chunk_sizes[2:]), limit)
+
+	def test_give_up_after_retries(self):
+		reader = FailingFileReader(self.DATA, lambda position, length: Ice.TimeoutException())
+		self.assertIsNone(util.read_file(reader))
+		self.assertEqual(len(reader.chunk_sizes), util.DOWNLOAD_MAX_RETRIES + 1)
+		self.assertEqual(reader.seeks, [0] * util.DOWNLOAD_MAX_RETRIES)
+
+	def test_give_up_at_minimum_chunk_size(self):
+		reader = FailingFileReader(self.DATA, lambda position, length: Ice.MemoryLimitException())
+		self.assertIsNone(util.read_file(reader))
+		self.assertEqual(reader.chunk_sizes, [32768, 16384, 8192, 4096])
+
+	def test_other_errors_are_not_retried(self):
+		reader = FailingFileReader(self.DATA, lambda position, length: Ice.ObjectNotExistException())
+		self.assertIsNone(util.read_file(reader))
+		self.assertEqual(len(reader.chunk_sizes), 1)
+
+	def test_file_ends_early(self):
+		reader = FileReader(self.DATA)
+		reader.getSize = lambda: len(self.DATA) + 1
+		self.assertIsNone(util.read_file(reader))
+
+
+class EvictingFileCache(FileCache):
+	# Another command evicts the file right after it has been looked up or opened.
+	evict_after = 'lookup'
+
+	def lookup(self, file_id, size):
+		path = super(EvictingFileCache, self).lookup(file_id, size)
+		if path is not None and self.evict_after == 'lookup':
+			os.remove(path)
+		return path
+
+	def open_file(self, file_id, size):
+		f = super(EvictingFileCache, self).open_file(file_id, size)
+		if f is not None and self.evict_after == 'open':
+			os.remove(f.name)
+		return f
+
+
+class FileCacheTestCase(TestCase):
+	DATA = b'c3d' * 100000
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'downloaded.c3d')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def download(self, cache):
+		reader = FileReader(self.DATA)
+		self.assertEqual(cache.download(reader, 42, self.path), len(self.DATA))
+		with open(self.path, 'rb') as f:
+			self.assertEqual(f.read(), self.DATA)
+		return reader.n_chunks
+
+	def test_download(self):
+		cache = FileCache(os.path.join(self.directory, 'cache'), 10 * len(self.DATA))
+		self.assertGreater(self.download(cache), 0)
+		self.assertEqual(self.download(cache), 0)
+		self.assertEqual(cache.get(42, len(self.DATA)), self.DATA)
+		self.assertIsNone(cache.get(42, len(self.DATA) + 1))
+
+	def test_evicted_file_is_a_miss(self):
+		cache = EvictingFileCache(os.path.join(self.directory, 'cache'), 10 * len(self.DATA))
+		cache.put(42, self.DATA)
+		self.assertGreater(self.download(cache), 0)
+
+	def test_evicted_file_stays_readable_once_opened(self):
+		cache = EvictingFileCache(os.path.join(self.directory, 'cache'), 10 * len(self.DATA))
+		cache.evict_after = 'open'
+		cache.put(42, self.DATA)
+		self.assertEqual(self.download(cache), 0)
+
+	def test_least_recently_used_files_are_evicted(self):
+		cache = FileCache(os.path.join(self.directory, 'cache'), len(self.DATA) + 1)
+		cache.put(1, self.DATA)
+		cache.put(2, self.DATA[::-1])
+		self.assertIsNone(cache.get(1, len(self.DATA)))
+		self.assertEqual(cache.get(2, len(self.DATA)), self.DATA[::-1])
+
+
+class SkipMotionTestCase(TestCase):
+	def setUp(self):
+		sampler._sampler = None
+		User.objects.create_user('annotator', password='secret')
+		self.client.login(username='annotator', password='secret')
+
+	def tearDown(self):
+		sampler._sampler = None
+
+	def test_skipping_the_last_motion(self):
+		motion_file = MotionFile.objects.create(motion_db_id=1, motion_db_file_id=1, filename='a.motion')
+		response = self.client.get(reverse('dataset:index'), {'skip': motion_file.id})
+		self.assertTemplateUsed(response, 'dataset/all_done.html')
+
+	def test_skipped_motion_is_not_assigned(self):
+		motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i)) for i in range(2)]
+		response = self.client.get(reverse('dataset:index'), {'skip': motion_files[0].id})
+		self.assertEqual(response.context['motion_file'], motion_files[1])
+
+
+class AnnotateTestCase(TestCase):
+	DESCRIPTION = 'A human walks forward and waves with the right hand.'
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		path = os.path.join(self.directory, 'en_US.words')
+		write_word_index(['a', 'human', 'walks', 'forward', 'and', 'waves', 'with', 'the', 'right', 'hand'], path)
+		dictionary._dictionary = WordIndexDictionary(path)
+		sampler._sampler = None
+		self.user = User.objects.create_user('annotator', password='secret')
+		self.client.login(username='annotator', password='secret')
+		self.motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i)) for i in range(3)]
+		self.url = reverse('dataset:annotate')
+
+	def tearDown(self):
+		dictionary._dictionary = None
+		sampler._sampler = None
+		shutil.rmtree(self.directory)
+
+	def submit(self, motion_file, description=DESCRIPTION):
+		return self.client.post(self.url, {'motion_file_id': motion_file.id, 'description': description, 'start_time': time.time() - 5})
+
+	def test_annotate(self):
+		response = self.submit(self.motion_files[0])
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.json()['valid'])
+		self.assertNotEqual(response.json()['motion_file_id'], self.motion_files[0].id)
+		annotation = Annotation.objects.get(user=self.user)
+		self.assertEqual(annotation.description, self.DESCRIPTION)
+		self.assertEqual(annotation.motion_file, self.motion_files[0])
+
+	def test_invalid_description(self):
+		response = self.submit(self.motion_files[0], description='asdf qwer')
+		self.assertEqual(response.status_code, 200)
+		self.assertFalse(response.json()['valid'])
+		self.assertFalse(Annotation.objects.exists())
+
+	def test_duplicate_submission(self):
+		self.submit(self.motion_files[0])
+		response = self.submit(self.motion_files[0])
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.json()['valid'])
+		self.assertIn('motion_file_id', response.json())
+		self.assertEqual(Annotation.objects.filter(user=self.user).count(), 1)
+		# The regular form is what annotate.js falls back to.
+		response = self.client.post(reverse('dataset:index'), {'motion_file_id': self.motion_files[0].id,
+			'description': self.DESCRIPTION, 'start_time': time.time()})
+		self.assertRedirects(response, reverse('dataset:index'), fetch_redirect_response=False)
+		self.assertEqual(Annotation.objects.filter(user=self.user).count(), 1)
+
+	def test_concurrent_duplicate(self):
+		# Both requests have checked for an existing annotation before either saved one.
+		for saved in [True, False]:
+			annotation = Annotation(user=self.user, motion_file=self.motion_files[0], description=self.DESCRIPTION)
+			self.assertEqual(save_annotation(self.motion_files[0], annotation), saved)
+		self.assertEqual(Annotation.objects.filter(user=self.user).count(), 1)
+
+	def test_malformed_submissions(self):
+		motion_file_id = self.motion_files[0].id
+		for data in [
+			{'description': self.DESCRIPTION, 'start_time': time.time()},
+			{'motion_file_id': motion_file_id, 'start_time': time.time()},
+			{'motion_file_id': motion_file_id, 'description': self.DESCRIPTION},
+			{'motion_file_id': 'abc', 'description': self.DESCRIPTION, 'start_time': time.time()},
+			{'motion_file_id': motion_file_id, 'description': self.DESCRIPTION, 'start_time': 'yesterday'},
+			{'motion_file_id': motion_file_id, 'description': self.DESCRIPTION, 'start_time': 'nan'},
+			{'motion_file_id': 12345, 'description': self.DESCRIPTION, 'start_time': time.time()},
+		]:
+			response = self.client.post(self.url, data)
+			self.assertEqual(response.status_code, 400)
+			self.assertIn('error', response.json())
+			response = self.client.post(reverse('dataset:index'), data)
+			self.assertRedirects(response, reverse('dataset:index'), fetch_redirect_response=False)
+		self.assertFalse(Annotation.objects.exists())
+
+	def test_signed_out(self):
+		self.client.logout()
+		self.assertEqual(self.submit(self.motion_files[0]).status_code, 403)
+
+
+class IndexedSetTestCase(TestCase):
+	def test_add_and_discard(self):
+		values = IndexedSet([3, 1, 2, 3])
+		self.assertEqual(len(values), 3)
+		values.discard(3)
+		values.discard(7)
+		self.assertEqual(sorted(values), [1, 2])
+		self.assertNotIn(3, values)
+		# The last value has been moved into the free slot.
+		for value in values:
+			self.assertEqual(values.values[values.positions[value]], value)
+		values.add(4)
+		self.assertEqual(sorted(values), [1, 2, 4])
+
+	def test_choice(self):
+		self.assertIsNone(IndexedSet().choice())
+		values = IndexedSet([5, 6])
+		rng = random.Random(0)
+		self.assertEqual(set(values.choice(rng) for _ in xrange(100)), set([5, 6]))
+
+
+class SortedIntArrayTestCase(TestCase):
+	def test_add_and_discard(self):
+		values = SortedIntArray([5, 1, 3, 1])
+		self.assertEqual(list(values), [1, 3, 5])
+		values.add(4)
+		values.add(3)
+		values.discard(1)
+		values.discard(2)
+		self.assertEqual(list(values), [3, 4, 5])
+		self.assertIn(4, values)
+		self.assertNotIn(1, values)
+		self.assertNotIn(6, values)
+
+
+class MotionSamplerTestCase(TransactionTestCase):
+	# The sampler is updated once the transaction has been committed, which never happens within a TestCase.
+	def setUp(self):
+		sampler._sampler = None
+		self.user = User.objects.create_user('annotator')
+		self.motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i)) for i in xrange(3)]
+
+	def tearDown(self):
+		sampler._sampler = None
+
+	def test_excluded_motions_are_not_sampled(self):
+		motion_sampler = sampler.get_sampler()
+		exclude_ids = [self.motion_files[0].id, self.motion_files[1].id]
+		for _ in xrange(20):
+			self.assertEqual(motion_sampler.sample(self.user.id, exclude_ids), self.motion_files[2].id)
+
+	def test_annotations_update_sampler(self):
+		motion_sampler = sampler.get_sampler()
+		motion_file = self.motion_files[0]
+		self.assertNotIn(motion_file.id, motion_sampler.annotated_by(self.user.id))
+		annotation = Annotation.objects.create(user=self.user, motion_file=motion_file, description='A person walks.')
+		self.assertNotIn(motion_file.id, motion_sampler.unannotated)
+		self.assertEqual(motion_sampler.annotation_counts[motion_file.id], 1)
+		self.assertIn(motion_file.id, motion_sampler.annotated_by(self.user.id))
+		annotation.delete()
+		self.assertIn(motion_file.id, motion_sampler.unannotated)
+		self.assertEqual(motion_sampler.annotation_counts[motion_file.id], 0)
+		self.assertNotIn(motion_file.id, motion_sampler.annotated_by(self.user.id))
+
+	def test_hidden_motions_update_sampler(self):
+		motion_sampler = sampler.get_sampler()
+		motion_file = self.motion_files[0]
+		motion_file.is_hidden = True
+		motion_file.save()
+		self.assertNotIn(motion_file.id, motion_sampler.eligible)
+		self.assertNotIn(motion_file.id, motion_sampler.unannotated)
+		motion_file.is_hidden = False
+		motion_file.mean_perplexity = 2.
+		motion_file.save()
+		self.assertEqual(motion_sampler.eligible[motion_file.id], 2.)
+		self.assertIn(motion_file.id, motion_sampler.unannotated)
+
+	def test_annotated_motions_are_not_selected(self):
+		for motion_file in self.motion_files[:2]:
+			Annotation.objects.create(user=self.user, motion_file=motion_file, description='A person walks.')
+		self.assertEqual(sampler.select_motion_file(self.user), self.motion_files[2])
+		Annotation.objects.create(user=self.user, motion_file=self.motion_files[2], description='A person walks.')
+		self.assertIsNone(sampler.select_motion_file(self.user))
+
+
+class MotionLeaseTestCase(TestCase):
+	def setUp(self):
+		sampler._sampler = None
+		self.users = [User.objects.create_user('annotator{}'.format(i)) for i in xrange(2)]
+		self.motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i)) for i in xrange(2)]
+
+	def tearDown(self):
+		sampler._sampler = None
+
+	def expire(self, lease):
+		MotionLease.objects.filter(pk=lease.pk).update(expiration_date=timezone.now() - timedelta(seconds=1))
+
+	def test_acquire(self):
+		user, motion_file = self.users[0], self.motion_files[0]
+		expiration_date = MotionLease.acquire(user.id, motion_file.id)
+		self.assertAlmostEqual((expiration_date - timezone.now()).total_seconds(), settings.MOTION_LEASE_DURATION, delta=5)
+		self.assertEqual(MotionLease.active_lease(motion_file.id).user_id, user.id)
+		self.assertIsNone(MotionLease.active_lease(motion_file.id, exclude_user_id=user.id))
+		# Every user holds a single lease, which moves on to the next motion.
+		MotionLease.acquire(user.id, self.motion_files[1].id)
+		self.assertEqual(MotionLease.objects.count(), 1)
+		self.assertIsNone(MotionLease.active_lease(motion_file.id))
+		self.assertEqual(MotionLease.active_lease(self.motion_files[1].id).user_id, user.id)
+
+	def test_expiration(self):
+		MotionLease.acquire(self.users[0].id, self.motion_files[0].id)
+		self.expire(MotionLease.objects.get(user=self.users[0]))
+		self.assertIsNone(MotionLease.active_lease(self.motion_files[0].id))
+
+	def test_leased_motion_is_not_given_to_another_user(self):
+		sampler.lease_motion_file(self.users[0], self.motion_files[0])
+		for _ in xrange(20):
+			self.assertEqual(sampler.select_motion_file(self.users[1]), self.motion_files[1])
+		# The user holding the lease may get the motion again, e.g. after reloading the page.
+		self.assertEqual(sampler.get_motion_file_for_user(self.users[0], self.motion_files[0].id), self.motion_files[0])
+		self.assertIsNone(sampler.get_motion_file_for_user(self.users[1], self.motion_files[0].id))
+
+	def test_leases_of_other_processes(self):
+		# The sampler of this process does not know about the lease until it runs into it.
+		motion_sampler = sampler.get_sampler()
+		MotionLease.acquire(self.users[0].id, self.motion_files[0].id)
+		for _ in xrange(20):
+			self.assertEqual(sampler.select_motion_file(self.users[1]), self.motion_files[1])
+		self.assertEqual(motion_sampler.leased_by_others(self.users[1].id), set([self.motion_files[0].id]))
+
+	def test_expired_leases_are_released(self):
+		sampler.lease_motion_file(self.users[0], self.motion_files[0])
+		motion_sampler = sampler.get_sampler()
+		self.assertEqual(motion_sampler.leased_by_others(self.users[1].id), set([self.motion_files[0].id]))
+		self.assertEqual(motion_sampler.leased_by_others(self.users[0].id), set())
+		self.expire(MotionLease.objects.get(user=self.users[0]))
+		motion_sampler.leases[self.motion_files[0].id] = (self.users[0].id, timezone.now() - timedelta(seconds=1))
+		self.assertEqual(motion_sampler.leased_by_others(self.users[1].id), set())
+		self.assertNotIn(self.users[0].id, motion_sampler.user_leases)
+		selected_ids = set(sampler.select_motion_file(self.users[1]).id for _ in xrange(50))
+		self.assertEqual(selected_ids, set(motion_file.id for motion_file in self.motion_files))
+
+	def test_leased_motions_are_given_out_if_nothing_else_is_left(self):
+		sampler.lease_motion_file(self.users[0], self.motion_files[0])
+		Annotation.objects.create(user=self.users[1], motion_file=self.motion_files[1], description='A person walks.')
+		self.assertEqual(sampler.select_motion_file(self.users[1]), self.motion_files[0])
+
+
+
+class FenwickTreeTestCase(TestCase):
+	def test_prefix_sums(self):
+		rng = random.Random(0)
+		weights = [rng.uniform(0., 5.) for _ in xrange(37)]
+		tree = FenwickTree(weights)
+		for _ in xrange(100):
+			idx = rng.randrange(len(weights))
+			weights[idx] = rng.uniform(0., 5.)
+			tree[idx] = weights[idx]
+		for idx in xrange(len(weights) + 1):
+			self.assertAlmostEqual(tree.prefix_sum(idx), sum(weights[:idx]))
+		tree.resize(50)
+		self.assertAlmostEqual(tree.total(), sum(weights))
+
+	def test_find(self):
+		tree = FenwickTree([1., 0., 2., 3.])
+		self.assertEqual([tree.find(value) for value in [0., 0.99, 1., 2.99, 3., 5.99]], [0, 0, 2, 2, 3, 3])
+
+
+class WeightedIndexTestCase(TestCase):
+	def test_insert_and_discard(self):
+		index = WeightedIndex([(10, 1.), (11, 2.)])
+		for key in xrange(20, 60):
+			index[key] = 1.
+		index.discard(11)
+		index.discard(12)
+		self.assertNotIn(11, index)
+		self.assertEqual(len(index), 41)
+		self.assertAlmostEqual(index.total(), 41.)
+		# The freed slot is reused.
+		index[99] = 5.
+		self.assertEqual(index.slots[99], 1)
+		self.assertEqual(index[99], 5.)
+		self.assertAlmostEqual(index.total(), 46.)
+
+	def test_sample_proportionally(self):
+		index = WeightedIndex([(1, 1.), (2, 3.), (3, 0.)])
+		rng = random.Random(0)
+		counts = collections.Counter(index.sample(rng=rng) for _ in xrange(4000))
+		self.assertEqual(counts[3], 0)
+		self.assertAlmostEqual(counts[2] / 4000., 0.75, delta=0.03)
+
+	def test_sample_with_exclusions(self):
+		# Most of the weight is excluded, so rejection sampling gives up and the weights are removed instead.
+		index = WeightedIndex([(1, 1000.), (2, 1.), (3, 1.)])
+		rng = random.Random(0)
+		self.assertEqual(set(index.sample(exclude=set([1, 2]), rng=rng, max_rejections=2) for _ in xrange(20)), set([3]))
+		self.assertIsNone(index.sample(exclude=set([1, 2, 3]), rng=rng))
+		self.assertAlmostEqual(index.total(), 1002.)
+
+
+class UserAnnotationCountTestCase(TestCase):
+	def setUp(self):
+		self.users = [User.objects.create_user('annotator{}'.format(i)) for i in xrange(3)]
+		self.motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i)) for i in xrange(3)]
+
+	def annotate(self, user, motion_file):
+		return Annotation.objects.create(user=user, motion_file=motion_file, description='A person walks.')
+
+	def test_counts_follow_annotations(self):
+		self.assertEqual(UserAnnotationCount.count_for_user(self.users[0]), 0)
+		annotations = [self.annotate(self.users[0], motion_file) for motion_file in self.motion_files]
+		self.assertEqual(UserAnnotationCount.count_for_user(self.users[0]), 3)
+		annotations[0].description = 'A person runs.'
+		annotations[0].save()
+		self.assertEqual(UserAnnotationCount.count_for_user(self.users[0]), 3)
+		annotations[1].delete()
+		self.assertEqual(UserAnnotationCount.count_for_user(self.users[0]), 2)
+
+	def test_missing_counter_is_rebuilt(self):
+		self.annotate(self.users[0], self.motion_files[0])
+		UserAnnotationCount.objects.filter(user=self.users[0]).delete()
+		self.annotate(self.users[0], self.motion_files[1])
+		self.assertEqual(UserAnnotationCount.count_for_user(self.users[0]), 2)
+
+	def test_users_with_the_same_count_share_their_rank(self):
+		for user, n in zip(self.users, [2, 2, 1]):
+			for motion_file in self.motion_files[:n]:
+				self.annotate(user, motion_file)
+		self.assertEqual(UserAnnotationCount.rank_for_count(3), 1)
+		self.assertEqual(UserAnnotationCount.rank_for_count(2), 1)
+		self.assertEqual(UserAnnotationCount.rank_for_count(1), 3)
+		self.assertEqual(UserAnnotationCount.rank_for_count(0), 4)
+
+
+class StatisticsTestCase(TestCase):
+	FIELDS = ['total_motions', 'total_annotations', 'distinct_annotations', 'total_users', 'perplexity_count']
+
+	def assertSnapshotIsUpToDate(self):
+		snapshot = Statistics.objects.get(pk=Statistics.SNAPSHOT_ID)
+		rebuilt = Statistics.rebuild()
+		for field in self.FIELDS:
+			self.assertEqual(getattr(snapshot, field), getattr(rebuilt, field), field)
+		self.assertAlmostEqual(snapshot.perplexity_sum, rebuilt.perplexity_sum)
+
+	def test_deltas_match_rebuild(self):
+		Statistics.rebuild()
+		users = [User.objects.create_user('annotator{}'.format(i)) for i in xrange(3)]
+		motion_files = [MotionFile.objects.create(motion_db_id=i, motion_db_file_id=i, filename='{}.motion'.format(i), mean_perplexity=float(i)) for i in xrange(3)]
+		annotations = [Annotation.objects.create(user=user, motion_file=motion_files[0], description='A person walks.') for user in users[:2]]
+		annotations.append(Annotation.objects.create(user=users[0], motion_file=motion_files[1], description='A person runs.'))
+		self.assertSnapshotIsUpToDate()
+
+		motion_files[1].is_broken_reported = True
+		motion_files[1].mean_perplexity = 5.
+		motion_files[1].save()
+		self.assertSnapshotIsUpToDate()
+		motion_files[1].is_broken_reported = False
+		motion_files[1].save()
+		self.assertSnapshotIsUpToDate()
+
+		annotations.pop().delete()
+		annotations.pop().delete()
+		self.assertSnapshotIsUpToDate()
+		users[2].delete()
+		motion_files[2].delete()
+		self.assertSnapshotIsUpToDate()
+
+	def test_mean_perplexity(self):
+		self.assertIsNone(Statistics.rebuild().mean_perplexity())
+		MotionFile.objects.create(motion_db_id=1, motion_db_file_id=1, filename='a.motion', mean_perplexity=1.)
+		MotionFile.objects.create(motion_db_id=2, motion_db_file_id=2, filename='b.motion', mean_perplexity=2.)
+		self.assertAlmostEqual(Statistics.get().mean_perplexity(), 1.5)
+
+
+@override_settings(LEADERBOARD_PAGE_SIZE=2)
+class LeaderboardTestCase(TestCase):
+	COUNTS = [5, 3, 3, 3, 1, 0, 0]
+
+	def setUp(self):
+		self.users = [User.objects.create_user('annotator{}'.format(i)) for i in xrange(len(self.COUNTS))]
+		for user, annotation_count in zip(self.users, self.COUNTS):
+			UserAnnotationCount.objects.filter(user=user).update(annotation_count=annotation_count)
+
+	def test_pages(self):
+		entries = []
+		after = None
+		while True:
+			context = leaderboard_context(total_motions=10, after=after)
+			self.assertLessEqual(len(context['leaderboard']), 2)
+			entries.extend(context['leaderboard'])
+			if context['next_cursor'] is None:
+				break
+			after = parse_leaderboard_cursor(context['next_cursor'])
+		self.assertEqual([entry.user_id for entry in entries], [user.id for user in self.users])
+		# Users with the same number of annotations share the same rank, even across pages.
+		self.assertEqual([entry.rank for entry in entries], [1, 2, 2, 2, 5, 6, 6])
+		self.assertEqual([entry.total_progress for entry in entries], [50, 30, 30, 30, 10, 0, 0])
+
+	def test_cursor(self):
+		self.assertEqual(parse_leaderboard_cursor('3.17'), (3, 17))
+		self.assertIsNone(parse_leaderboard_cursor('3'))
+		self.assertIsNone(parse_leaderboard_cursor('a.b'))
+		self.assertEqual(leaderboard_context(total_motions=10, after=(0, self.users[-1].id)), {'leaderboard': [], 'next_cursor': None})
+
+
+def random_motion(n_frames, n_markers, seed=0):
+	# A smooth random walk in meters, like the normalized markers of an imported motion.
+	rng = np.random.RandomState(seed)
+	steps = rng.normal(scale=0.005, size=(n_frames, 3 * n_markers))
+	return np.cumsum(steps, axis=0) + rng.uniform(-1., 1., size=3 * n_markers)
+
+
+class Float32MotionFormatTestCase(TestCase):
+	def test_round_trip(self):
+		for markers in [['C7'], ['C7', 'CLAV', 'T10'], ['RFHD', 'LFHD']]:
+			frames = random_motion(50, len(markers))
+			data = motionformat.dumps(markers, frames, 10, 'kit')
+			motion = motionformat.loads(data)
+			self.assertEqual(motion['markers'], markers)
+			self.assertEqual(motion['marker_set'], 'kit')
+			self.assertEqual(motion['interval'], 10)
+			self.assertEqual(motion['encoding'], motionformat.MOTION_ENCODING_FLOAT32)
+			np.testing.assert_array_equal(motion['frames'], frames.astype('float32'))
+			# The viewer uses the frames as a Float32Array, which has to be aligned.
+			header_size = motionformat.MOTION_HEADER.unpack_from(data, 0)[2]
+			self.assertEqual(header_size % 4, 0)
+			self.assertEqual(len(data), header_size + frames.size * 4)
+
+	def test_empty_motion(self):
+		motion = motionformat.loads(motionformat.dumps(['C7'], np.zeros((0, 3)), 10, 'kit'))
+		self.assertEqual(motion['frames'].shape, (0, 3))
+
+	def test_invalid_data(self):
+		data = motionformat.dumps(['C7'], random_motion(5, 1), 10, 'kit')
+		with self.assertRaises(ValueError):
+			motionformat.loads(b'NOMOTION' + data[8:])
+
+	def test_content_filename(self):
+		data = motionformat.dumps(['C7'], random_motion(5, 1), 10, 'kit')
+		self.assertNotEqual(motionformat.content_filename(data), motionformat.content_filename(data + b'\0'))
+		self.assertTrue(motionformat.content_filename(data).endswith(motionformat.MOTION_EXTENSION))
+
+
+class Delta16MotionFormatTestCase(TestCase):
+	PRECISION = 0.0001
+
+	def encode(self, frames, **kwargs):
+		data = motionformat.dumps(['C7', 'CLAV'], frames, 10, 'kit', precision=self.PRECISION, **kwargs)
+		header_size = motionformat.MOTION_HEADER.unpack_from(data, 0)[2]
+		_, _, n_keyframes = motionformat.QUANTIZATION_HEADER.unpack_from(data, header_size)
+		return motionformat.loads(data), n_keyframes
+
+	def assertDecoded(self, frames, motion):
+		self.assertEqual(motion['encoding'], motionformat.MOTION_ENCODING_DELTA16)
+		self.assertEqual(motion['frames'].shape, frames.shape)
+		# Half the precision plus the rounding error of float32 values.
+		self.assertLessEqual(motionformat.max_error(frames, motion['frames']), self.PRECISION / 2. + 1e-6)
+
+	def test_round_trip(self):
+		frames = random_motion(250, 2)
+		motion, n_keyframes = self.encode(frames, keyframe_interval=100)
+		self.assertDecoded(frames, motion)
+		self.assertEqual(n_keyframes, 3)
+
+	def test_large_jumps_become_keyframes(self):
+		frames = random_motion(250, 2)
+		frames[120:] += 10.  # 100000 steps of the precision, more than an int16 can hold
+		motion, n_keyframes = self.encode(frames, keyframe_interval=100)
+		self.assertDecoded(frames, motion)
+		self.assertEqual(n_keyframes, 4)
+
+	def test_keyframes_only(self):
+		frames = random_motion(20, 2)
+		motion, n_keyframes = self.encode(frames, keyframe_interval=1)
+		self.assertDecoded(frames, motion)
+		self.assertEqual(n_keyframes, 20)
+
+	def test_short_motions(self):
+		for n_frames in [0, 1, 2]:
+			frames = random_motion(n_frames, 2)
+			motion, _ = self.encode(frames)
+			self.assertDecoded(frames, motion)
+
+	def test_smaller_than_float32(self):
+		frames = random_motion(250, 2)
+		data = motionformat.dumps(['C7', 'CLAV'], frames, 10, 'kit', precision=self.PRECISION)
+		self.assertLess(len(data), len(motionformat.dumps(['C7', 'CLAV'], frames, 10, 'kit')) * 0.6)
+
+
+class CompressionTestCase(TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'abc123.motion')
+		self.data = motionformat.dumps(['C7'], random_motion(100, 1), 10, 'kit')
+		with open(self.path, 'wb') as f:
+			f.write(self.data)
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_parse_accept_encoding(self):
+		self.assertEqual(parse_accept_encoding('gzip, deflate, br'), {'gzip': 1., 'deflate': 1., 'br': 1.})
+		self.assertEqual(parse_accept_encoding('GZIP;q=0.5, br;q=0, *;q=0.1'), {'gzip': .5, 'br': 0., '*': .1})
+		self.assertEqual(parse_accept_encoding('gzip;q=high'), {'gzip': 0.})
+		self.assertEqual(parse_accept_encoding(''), {})
+
+	def test_variants_round_trip(self):
+		paths = write_compressed_variants(self.path)
+		self.assertIn(self.path + '.gz', paths)
+		self.assertTrue(has_compressed_variants(self.path))
+		with gzip.open(self.path + '.gz', 'rb') as f:
+			self.assertEqual(f.read(), self.data)
+
+	def test_select_variant(self):
+		write_compressed_variants(self.path)
+		preferred = (self.path + '.br', 'br') if os.path.exists(self.path + '.br') else (self.path + '.gz', 'gzip')
+		self.assertEqual(select_variant(self.path, 'gzip, br'), preferred)
+		self.assertEqual(select_variant(self.path, '*'), preferred)
+		self.assertEqual(select_variant(self.path, 'gzip, br;q=0'), (self.path + '.gz', 'gzip'))
+		self.assertEqual(select_variant(self.path, '*;q=0'), (self.path, None))
+		self.assertEqual(select_variant(self.path, 'identity'), (self.path, None))
+		self.assertEqual(select_variant(self.path, None), (self.path, None))
+
+	def test_missing_variants(self):
+		self.assertFalse(has_compressed_variants(self.path))
+		self.assertEqual(select_variant(self.path, 'gzip, br'), (self.path, None))
+		write_compressed_variants(self.path)
+		os.remove(self.path + '.gz')
+		self.assertFalse(has_compressed_variants(self.path))
+		self.assertEqual(select_variant(self.path, 'gzip'), (self.path, None))
+
+
+class MotionCachingTestCase(TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.data = motionformat.dumps(['C7'], random_motion(100, 1), 10, 'kit')
+		self.filename = motionformat.content_filename(self.data)
+		path = os.path.join(self.directory, self.filename)
+		with open(path, 'wb') as f:
+			f.write(self.data)
+		write_compressed_variants(path)
+		self.settings = override_settings(MOTION_FILES_ROOT=self.directory)
+		self.settings.enable()
+		self.url = reverse('dataset:motion', args=[self.filename])
+
+	def tearDown(self):
+		self.settings.disable()
+		shutil.rmtree(self.directory)
+
+	def test_motions_are_immutable(self):
+		response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='identity')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(b''.join(response.streaming_content), self.data)
+		self.assertEqual(response['ETag'], '"{}"'.format(self.filename))
+		self.assertIn('immutable', response['Cache-Control'])
+		self.assertIn('public', response['Cache-Control'])
+
+	def test_etags_differ_per_variant(self):
+		identity = self.client.get(self.url, HTTP_ACCEPT_ENCODING='identity')
+		compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+		self.assertEqual(compressed['Content-Encoding'], 'gzip')
+		self.assertNotEqual(identity['ETag'], compressed['ETag'])
+
+	def test_not_modified(self):
+		etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+		response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH='"other", ' + etag)
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response['ETag'], etag)
+		self.assertIn('immutable', response['Cache-Control'])
+		response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH='*')
+		self.assertEqual(response.status_code, 304)
+		# The ETag of the compressed variant does not validate the uncompressed file.
+		response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='identity', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+
+	def test_missing_motion(self):
+		response = self.client.get(reverse('dataset:motion', args=['0123abcd.motion']))
+		self.assertEqual(response.status_code, 404)
+
+	def test_legacy_names_are_revalidated(self):
+		# Older motions were named after their ids in the motion database and are replaced when they are imported again.
+		filename = '0' * 40 + '.motion'
+		path = os.path.join(self.directory, filename)
+		with open(path, 'wb') as f:
+			f.write(self.data)
+		url = reverse('dataset:motion', args=[filename])
+		response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+		self.assertNotIn('immutable', response['Cache-Control'])
+		self.assertIn('no-cache', response['Cache-Control'])
+		etag = response['ETag']
+		self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='identity', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		with open(path, 'wb') as f:
+			f.write(self.data + b'\0')
+		os.utime(path, (0, 0))
+		response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_welcome_motion(self):
+		filename = '0059ac190ecdcf04e0700e9c9827bf3e917bbddd.json'
+		with open(os.path.join(self.directory, filename), 'w') as f:
+			f.write('{}')
+		with override_settings(WELCOME_MOTION_FILENAME=filename):
+			response = self.client.get(reverse('dataset:index'))
+			url = reverse('dataset:motion', args=[filename])
+			self.assertContains(response, url)
+			self.assertEqual(self.client.get(url).status_code, 200)
+
+
+def json_motion(frames):
+	return json.dumps({'markers': ['C7'], 'frames': frames.tolist(), 'interval': 10, 'marker_set': 'kit'})
+
+
+class MotionFilesRootTestCase(TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.settings = override_settings(MOTION_FILES_ROOT=self.directory, MOTION_LEVELS_OF_DETAIL=[15])
+		self.settings.enable()
+
+	def tearDown(self):
+		self.settings.disable()
+		shutil.rmtree(self.directory)
+
+	def write_motion(self, filename, data):
+		with open(os.path.join(self.directory, filename), 'wb') as f:
+			f.write(data)
+		return MotionFile.objects.create(motion_db_id=len(filename), motion_db_file_id=MotionFile.objects.count(), filename=filename)
+
+	def test_rename_motions(self):
+		data = motionformat.dumps(['C7'], random_motion(10, 1), 10, 'kit')
+		motion_file = self.write_motion('1' * 40 + '.motion', data)
+		with open(motionformat.level_of_detail_path(os.path.join(self.directory, motion_file.filename), 15), 'wb') as f:
+			f.write(b'level of detail')
+		welcome_motion_file = self.write_motion(settings.WELCOME_MOTION_FILENAME, b'{}')
+		call_command('renamemotions', stdout=StringIO.StringIO())
+
+		filename = motionformat.content_filename(data)
+		self.assertEqual(MotionFile.objects.get(pk=motion_file.pk).filename, filename)
+		self.assertEqual(sorted(os.listdir(self.directory)), sorted([filename, motionformat.level_of_detail_path(filename, 15),
+			settings.WELCOME_MOTION_FILENAME]))
+		# The welcome page refers to its motion by name.
+		self.assertEqual(MotionFile.objects.get(pk=welcome_motion_file.pk).filename, settings.WELCOME_MOTION_FILENAME)
+
+	def test_convert_motions(self):
+		frames = random_motion(10, 1)
+		motion_file = self.write_motion('2' * 40 + '.json', json_motion(frames))
+		welcome_motion_file = self.write_motion(settings.WELCOME_MOTION_FILENAME, json_motion(frames + 1.))
+		call_command('convertmotions', delete_json=True, stdout=StringIO.StringIO())
+
+		filename = motionformat.content_filename(motionformat.dumps(['C7'], frames, 10, 'kit'))
+		self.assertEqual(MotionFile.objects.get(pk=motion_file.pk).filename, filename)
+		self.assertTrue(MotionFile.objects.get(pk=welcome_motion_file.pk).filename.endswith(motionformat.MOTION_EXTENSION))
+		self.assertFalse(os.path.exists(os.path.join(self.directory, motion_file.filename)))
+		# The welcome page still loads the JSON file.
+		self.assertTrue(os.path.exists(os.path.join(self.directory, settings.WELCOME_MOTION_FILENAME)))
+		motion = motionformat.loads(open(os.path.join(self.directory, filename), 'rb').read())
+		np.testing.assert_array_equal(motion['frames'], frames.astype('float32'))
+
+	def test_compression_report(self):
+		with self.assertRaises(CommandError):
+			call_command('compressionreport', stdout=StringIO.StringIO())
+		self.write_motion('a.motion', motionformat.dumps(['C7'], random_motion(10, 1), 10, 'kit'))
+		stdout = StringIO.StringIO()
+		call_command('compressionreport', stdout=stdout)
+		self.assertIn('1 motions', stdout.getvalue())
+
+
+def write_c3d(names, points, fps):
+	# The c3d module names the markers M000, M001 and so on and can only write float point data without analog
+	# channels, so the labels are replaced afterwards.
+	writer = c3d.Writer(point_rate=float(fps))
+	for frame in points:
+		frame_points = np.zeros((len(names), 5), dtype='float32')
+		frame_points[:, 0:3] = frame
+		writer.add_frames([(frame_points, np.zeros((0, 0)))])
+	f = tempfile.TemporaryFile()
+	with warnings.catch_warnings():
+		# The writer warns about the analog parameters that it leaves out.
+		warnings.simplefilter('ignore', UserWarning)
+		writer.write(f)
+	f.seek(0)
+	c3d_data = f.read()
+	f.close()
+	labels = ''.join('M%03d ' % i for i in xrange(len(names)))
+	return c3d_data.replace(labels, ''.join('{:<5}'.format(name) for name in names))
+
+
+def write_mmm(fps, position, rotation):
+	frame = '<MotionFrame><RootPosition>{}</RootPosition><RootRotation>{}</RootRotation><Timestep>{{}}</Timestep></MotionFrame>'.format(
+		' '.join(str(x) for x in position), ' '.join(str(x) for x in rotation))
+	return '<MMM><Motion><MotionFrames>{}{}</MotionFrames></Motion></MMM>'.format(frame.format(0.), frame.format(1. / fps))
+
+
+def parse_motion_per_frame(c3d_data, mmm_data, marker_set):
+	# How importmotions used to parse motions: every frame is decoded and every marker is transformed separately.
+	# Returns all frames, without downsampling.
+	c3d_reader = c3d.Reader(StringIO.StringIO(c3d_data))
+	xml_root = ElementTree.fromstring(mmm_data)
+	pose_pos = [float(x) for x in xml_root.find('./Motion/MotionFrames/MotionFrame/RootPosition').text.split(' ')]
+	pose_rot = [float(x) for x in xml_root.find('./Motion/MotionFrames/MotionFrame/RootRotation').text.split(' ')]
+	marker_names = [marker.rstrip().split(':')[-1] for marker in c3d_reader.point_labels]
+	supported_indexes = [idx for idx, name in enumerate(marker_names) if name in SUPPORTED_MARKER_NAMES[marker_set]]
+	frames = np.array([points[supported_indexes, 0:3].flatten() for _, points, _ in c3d_reader.read_frames()])
+	pose_inv = np.linalg.inv(pose_matrix([pose_pos[0], pose_pos[1], 0.], [0., 0., pose_rot[2]]))
+	for i in xrange(len(supported_indexes)):
+		pos = np.hstack([frames[:, i * 3:i * 3 + 3], np.ones((len(frames), 1))])
+		frames[:, i * 3:i * 3 + 3] = np.dot(pose_inv, pos.T).T[:, 0:3]
+	return frames / 100.
+
+
+def interpolate_frames(frames, interval, target_interval):
+	times = np.arange(len(frames)) * interval
+	target_times = np.arange(0., times[-1] + 1e-6, target_interval)
+	return np.column_stack([np.interp(target_times, times, frames[:, i]) for i in xrange(frames.shape[1])])
+
+
+class ParseMotionTestCase(TestCase):
+	MARKERS = ['C7', 'CLAV', 'RFWT', 'T10']  # RFWT only belongs to the CMU marker set
+
+	def parse(self, fps, n_frames=200, downsample_factor=2):
+		rng = np.random.RandomState(0)
+		points = np.cumsum(rng.uniform(-1., 1., size=(n_frames, len(self.MARKERS), 3)), axis=0) + 500.
+		c3d_data = write_c3d(self.MARKERS, points, fps)
+		mmm_data = write_mmm(fps, [120., -35., 950.], [0., 0., 0.7])
+		expected = parse_motion_per_frame(c3d_data, mmm_data, MotionFile.MARKER_SET_KIT)
+		return parse_motion(c3d_data, mmm_data, downsample_factor, MotionFile.MARKER_SET_KIT), expected
+
+	def test_downsampling(self):
+		# At 100 fps, every second frame is kept, just like before.
+		(markers, frames, interval), expected = self.parse(100)
+		self.assertEqual(markers, ['C7', 'CLAV', 'T10'])
+		self.assertEqual(interval, 20)
+		self.assertEqual(frames.shape, (100, 9))
+		np.testing.assert_allclose(frames, expected[::2], atol=1e-5)
+
+	def test_slow_motions_are_not_downsampled(self):
+		(_, frames, interval), expected = self.parse(60)
+		self.assertEqual(interval, 16)
+		self.assertEqual(len(frames), len(resampling_weights(200, 1000. / 60, 16)[0]))
+		np.testing.assert_allclose(frames, interpolate_frames(expected, 1000. / 60, 16), atol=1e-5)
+
+	def test_truncated_interval(self):
+		# At 120 fps, two frames are 16.7 ms apart, but the interval is truncated to 16 ms. Instead of keeping every
+		# second frame and playing the motion back faster, it is resampled at 16 ms, which yields more frames.
+		(_, frames, interval), expected = self.parse(120, n_frames=600)
+		self.assertEqual(interval, 16)
+		self.assertEqual(len(expected[::2]), 300)
+		self.assertEqual(len(frames), 312)
+		np.testing.assert_allclose(frames, interpolate_frames(expected, 1000. / 120, 16), atol=1e-5)
+
+
+class LevelOfDetailTestCase(TestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.settings = override_settings(MOTION_FILES_ROOT=self.directory, MOTION_LEVELS_OF_DETAIL=[30, 15])
+		self.settings.enable()
+
+	def tearDown(self):
+		self.settings.disable()
+		shutil.rmtree(self.directory)
+
+	def test_resampling_weights(self):
+		lower, weights = motionformat.resampling_weights(7, 10., 20.)
+		np.testing.assert_array_equal(lower, [0, 2, 4, 5])
+		np.testing.assert_allclose(weights, [0., 0., 0., 1.])
+		lower, weights = motionformat.resampling_weights(5, 10., 15.)
+		np.testing.assert_array_equal(lower, [0, 1, 3])
+		np.testing.assert_allclose(weights, [0., .5, 0.])
+		for n_frames in [0, 1]:
+			lower, weights = motionformat.resampling_weights(n_frames, 10., 20.)
+			self.assertEqual(len(lower), n_frames)
+
+	def test_resample(self):
+		# A linear motion stays linear at any frame rate.
+		frames = np.column_stack([np.arange(101) * 10., np.arange(101) * -2.])
+		resampled = motionformat.resample(frames, 10, 33)
+		self.assertEqual(len(resampled), 31)  # one frame every 33 ms within 1 s
+		times = np.arange(31) * 33.
+		np.testing.assert_allclose(resampled, np.column_stack([times, times * -.2]))
+
+	def test_levels_of_detail(self):
+		frames = random_motion(100, 2)
+		filename = motionformat.save(self.directory, ['C7', 'CLAV'], frames, 10, 'kit', levels_of_detail=[30, 15, 200])
+		path = os.path.join(self.directory, filename)
+		for fps, interval, n_frames in [(30, 33, 31), (15, 67, 15)]:
+			motion = motionformat.loads(open(motionformat.level_of_detail_path(path, fps), 'rb').read())
+			self.assertEqual(motion['interval'], interval)
+			self.assertEqual(motion['frames'].shape, (n_frames, 6))
+			expected = motionformat.resample(frames, 10, interval)
+			np.testing.assert_allclose(motion['frames'], expected, atol=1e-5)
+		# Levels above the frame rate of the motion itself are left out.
+		self.assertFalse(os.path.exists(motionformat.level_of_detail_path(path, 200)))
+
+	def test_serve_levels_of_detail(self):
+		data = motionformat.dumps(['C7'], random_motion(100, 1), 10, 'kit')
+		filename = motionformat.content_filename(data)
+		path = os.path.join(self.directory, filename)
+		with open(path, 'wb') as f:
+			f.write(data)
+		level_data = motionformat.dumps(['C7'], random_motion(15, 1), 67, 'kit')
+		with open(motionformat.level_of_detail_path(path, 15), 'wb') as f:
+			f.write(level_data)
+		url = reverse('dataset:motion', args=[filename])
+
+		response = self.client.get(url, {'fps': 15}, HTTP_ACCEPT_ENCODING='identity')
+		self.assertEqual(b''.join(response.streaming_content), level_data)
+		self.assertEqual(response['ETag'], '"{}"'.format(os.path.basename(motionformat.level_of_detail_path(path, 15))))
+		# There is no level for 30 fps, e.g. because it was not generated yet, and 20 fps is not a level at all.
+		for fps in [30, 20, 'abc']:
+			response = self.client.get(url, {'fps': fps}, HTTP_ACCEPT_ENCODING='identity')
+			self.assertEqual(b''.join(response.streaming_content), data)
+			self.assertEqual(response['ETag'], '"{}"'.format(filename))
+
+
+def serve_motion_database(files):
+	"""Serves a motion database session on a local port for the commands that talk to the database.
+
+	`files` maps motion IDs to lists of (C3D data, MMM data, institution) of that motion. Returns the communicator,
+	which has to be destroyed to stop serving, and the proxy of the session.
+	"""
+	MotionDatabase = util.load_motion_database_module()
+
+	class FileReaderI(MotionDatabase.FileReader):
+		def __init__(self, data):
+			self.reader = FileReader(data)
+
+		def getSize(self, current=None):
+			return self.reader.getSize()
+
+		def readChunk(self, length, current=None):
+			return self.reader.readChunk(length)
+
+		def seek(self, position, current=None):
+			self.reader.seek(position)
+
+		def destroy(self, current=None):
+			current.adapter.remove(current.id)
+
+	class MotionDatabaseSessionI(MotionDatabase.MotionDatabaseSession):
+		def __init__(self):
+			self.motions = []
+			self.files = {}
+			self.contents = {}
+			for motion_id, pairs in sorted(files.items()):
+				institution = MotionDatabase.Institution(len(pairs), pairs[0][2], pairs[0][2])
+				self.motions.append(MotionDatabase.Motion(id=motion_id, associatedInstitution=institution, associatedSubjects=[], associatedObjects=[]))
+				self.files[motion_id] = []
+				for c3d_data, mmm_data, _ in pairs:
+					c3d_file = self.add_file(motion_id, 'Vicon C3D File', c3d_data)
+					self.add_file(motion_id, 'Converted MMM Motion', mmm_data, c3d_file)
+
+		def add_file(self, motion_id, file_type, data, originated_from=None):
+			file_id = len(self.contents) + 1
+			self.contents[file_id] = data
+			f = MotionDatabase.File(id=file_id, fileType=file_type, attachedToId=motion_id, originatedFrom=originated_from,
+				visibility=MotionDatabase.VisibilityLevel.Public)
+			self.files[motion_id].append(f)
+			return f
+
+		def countMotions(self, *args, **kwargs):
+			return len(self.motions)
+
+		def listMotions(self, filter_description, filter_project, filter_institution, filter_subject, filter_object, search_term, sort_field, limit, offset, current=None):
+			return self.motions[offset:offset + limit]
+
+		def listFiles(self, database_object_id, current=None):
+			return self.files.get(database_object_id, [])
+
+		def getFileReader(self, file_id, current=None):
+			return MotionDatabase.FileReaderPrx.uncheckedCast(current.adapter.addWithUUID(FileReaderI(self.contents[file_id])))
+
+	communicator = Ice.initialize()
+	adapter = communicator.createObjectAdapterWithEndpoints('MotionDatabase', 'tcp -h 127.0.0.1')
+	proxy = adapter.add(MotionDatabaseSessionI(), communicator.stringToIdentity('MotionDatabase'))
+	adapter.activate()
+	return communicator, communicator.proxyToString(proxy)
+
+
+class ImportMotionsTestCase(TestCase):
+	MARKERS = ['C7', 'CLAV', 'T10', 'STRN']
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		# Motions of both marker sets, some of them with several files, at frame rates with and without a truncated
+		# interval.
+		rng = np.random.RandomState(0)
+		files = {}
+		for motion_id in xrange(1, 7):
+			fps = [100, 120][motion_id % 2]
+			files[motion_id] = []
+			for _ in xrange(1 + motion_id % 2):
+				points = np.cumsum(rng.uniform(-1., 1., size=(60, len(self.MARKERS), 3)), axis=0) + 500.
+				files[motion_id].append((write_c3d(self.MARKERS, points, fps), write_mmm(fps, [120., -35., 950.], [0., 0., rng.uniform()]),
+					['KIT', 'CMU'][motion_id % 3 == 0]))
+		self.communicator, self.proxy = serve_motion_database(files)
+
+	def tearDown(self):
+		self.communicator.destroy()
+		shutil.rmtree(self.directory)
+
+	def import_motions(self, workers):
+		# Returns the imported rows and the written files by name, and removes the rows again.
+		root = os.path.join(self.directory, str(workers))
+		stdin, stdout = sys.stdin, sys.stdout
+		# Leave all filters blank.
+		sys.stdin, sys.stdout = StringIO.StringIO('\n' * 5), StringIO.StringIO()
+		try:
+			with override_settings(MOTION_FILES_ROOT=root):
+				call_command('importmotions', proxy=self.proxy, workers=workers, no_cache=True, stdout=StringIO.StringIO())
+		finally:
+			sys.stdin, sys.stdout = stdin, stdout
+		rows = list(MotionFile.objects.order_by('id').values_list('motion_db_id', 'motion_db_file_id', 'filename', 'marker_set', 'is_hidden'))
+		MotionFile.objects.all().delete()
+		files = {}
+		for filename in os.listdir(root):
+			with open(os.path.join(root, filename), 'rb') as f:
+				files[filename] = f.read()
+		return rows, files
+
+	def test_workers(self):
+		rows, files = self.import_motions(1)
+		self.assertEqual([(motion_db_id, marker_set) for motion_db_id, _, _, marker_set, _ in rows], [(1, MotionFile.MARKER_SET_KIT),
+			(1, MotionFile.MARKER_SET_KIT), (2, MotionFile.MARKER_SET_KIT), (3, MotionFile.MARKER_SET_CMU),
+			(3, MotionFile.MARKER_SET_CMU), (4, MotionFile.MARKER_SET_KIT), (5, MotionFile.MARKER_SET_KIT),
+			(5, MotionFile.MARKER_SET_KIT), (6, MotionFile.MARKER_SET_CMU)])
+		for _, _, filename, _, _ in rows:
+			self.assertIn(filename, files)
+		self.assertEqual(self.import_motions(2), (rows, files))
@@ -8,9 +8,12 @@ from . import views
 app_name = 'dataset'
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^annotate/$', views.annotate, name='annotate'),
+    url(r'^motions/(?P<filename>[0-9a-f]+\.(?:json|motion))$', views.motion, name='motion'),
     url(r'^sign-in/$', auth_views.login, {'template_name': 'dataset/sign-in.html'}, name='sign-in'),
     url(r'^logout/$', views.logout, name='logout'),
     url(r'^register/', views.register, name='register'),
+    url(r'^stats/leaderboard/', views.leaderboard, name='leaderboard'),
     url(r'^stats/', views.stats, name='stats'),
     url(r'^dataset/', views.dataset, name='dataset'),
     url(r'^downloads/([0-9]+)/', views.download_dataset, name='download_dataset'),
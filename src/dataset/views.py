@@ -1,12 +1,18 @@
+import math
+import os
 import random
+import re
 import time
-import numpy as np
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Count, Avg
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, FileResponse, Http404
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST, require_GET
+from django.utils.cache import patch_vary_headers, patch_cache_control
+from django.utils.http import quote_etag, parse_etags
+from django.db.models import Q
 from django.contrib import messages, auth
 from django.utils import timezone
-from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
 from django.core.validators import validate_email
@@ -17,7 +23,10 @@ from django.conf import settings
 
 from ipware.ip import get_ip
 
-from .models import MotionFile, Annotation, Dataset, Download
+from .models import MotionFile, Annotation, UserAnnotationCount, Statistics, Dataset, Download
+from .sampler import select_motion_file, get_motion_file_for_user, lease_motion_file
+from .compression import select_variant
+from .motionformat import MOTION_EXTENSION, content_filename, level_of_detail_path
 
 
 MOTIVATIONAL_MESSAGES = ['We have saved your annotation. Thank you for helping, and keep going!',
@@ -27,6 +36,16 @@ MOTIVATIONAL_MESSAGES = ['We have saved your annotation. Thank you for helping,
 						 'Who would\'ve thought that annotating motions can be this much fun, right? Thank you so much and keep going!']
 
 
+MALFORMED_ANNOTATION_MESSAGE = 'Your annotation could not be submitted. Please reload the page and try again.'
+
+
+# The motion that is shown next is selected one page ahead and remembered in the session.
+NEXT_MOTION_FILE_SESSION_KEY = 'next_motion_file_id'
+
+# The viewer stores the frame rate that suits the connection and device of the user in this cookie.
+MOTION_FPS_COOKIE = 'motion_fps'
+
+
 LEVELS = [
 	(0., 9, 'Novice', 'info'),
 	(10, 49, 'Research Assistant', 'success'),
@@ -44,32 +63,134 @@ def level_for_number_of_annotations(nb_annotations):
 	return None
 
 
+def parse_annotation_form(request):
+	# Returns the motion file, description and start time of a submitted annotation, or None if the form is incomplete
+	# or refers to a motion that does not exist.
+	try:
+		motion_file_id = int(request.POST['motion_file_id'])
+		description = request.POST['description'].strip()
+		start_time = float(request.POST['start_time'])
+		if math.isnan(start_time) or math.isinf(start_time):
+			return None
+		return MotionFile.objects.get(pk=motion_file_id), description, start_time
+	except (KeyError, ValueError, MotionFile.DoesNotExist):
+		return None
+
+
+def is_annotated_by(user, motion_file):
+	# Forms are submitted twice after a double click or if the response got lost, so the annotation might exist.
+	return Annotation.objects.filter(user=user, motion_file=motion_file).exists()
+
+
+def create_annotation(request, motion_file, description, start_time):
+	duration = max(0, int(time.time() - start_time))
+	annotation = Annotation(user=request.user, motion_file=motion_file, description=description, duration=duration)
+	annotation.accept_language = request.META.get('HTTP_ACCEPT_LANGUAGE')
+	annotation.ip_address = get_ip(request)
+	return annotation
+
+
+def save_annotation(motion_file, annotation):
+	# Update motion file and save annotation. Returns False if the user has annotated the motion in the meantime.
+	motion_file.mean_perplexity = 0.  # reset mean perplexity until it is re-computed
+	try:
+		with transaction.atomic():
+			motion_file.save()
+			annotation.save()
+	except IntegrityError:
+		return False
+	return True
+
+
+def invalid_annotation_message(motion_file):
+	problem_url = '&#109;&#097;&#105;&#108;&#116;&#111;:&#109;&#097;&#116;&#116;&#104;&#105;&#097;&#115;&#046;&#112;&#108;&#097;&#112;&#112;&#101;&#114;&#116;&#064;&#115;&#116;&#117;&#100;&#101;&#110;&#116;&#046;&#107;&#105;&#116;&#046;&#101;&#100;&#117;?subject=Problem%20with%20motion%20{}'.format(motion_file.id)
+	skip_url = '{}?skip={}'.format(reverse('dataset:index'), motion_file.id)
+	return 'We think that your description of this motion is not a single, complete sentence in English. Please try again. You can also <a href="{}" class="alert-link">report a problem</a> or <a href="{}" class="alert-link">skip this motion</a>.'.format(problem_url, skip_url)
+
+
+def assign_motion_file(request, skip_id=-1):
+	# Use the motion that the previous page has prefetched, as long as the user can still annotate it. Otherwise,
+	# select the next motion. Motions that nobody has annotated yet are selected uniformly, afterwards
+	# perplexity-based sampling is used.
+	motion_file = None
+	next_motion_file_id = request.session.pop(NEXT_MOTION_FILE_SESSION_KEY, None)
+	if next_motion_file_id is not None and next_motion_file_id != skip_id:
+		motion_file = get_motion_file_for_user(request.user, next_motion_file_id)
+	if motion_file is None:
+		motion_file = select_motion_file(request.user, exclude_ids=[skip_id])
+	if motion_file is None or motion_file.id == skip_id:
+		# Nothing more to annotate, at least nothing but the motion that the user has just skipped.
+		return None, None
+	lease_motion_file(request.user, motion_file)
+
+	# Select the following motion right away so that the browser can download it while the user is typing.
+	next_motion_file = select_motion_file(request.user, exclude_ids=[skip_id, motion_file.id])
+	if next_motion_file is not None:
+		request.session[NEXT_MOTION_FILE_SESSION_KEY] = next_motion_file.id
+	return motion_file, next_motion_file
+
+
+def parse_motion_fps(value):
+	# Returns the requested level of detail, if there is such a level.
+	try:
+		fps = int(value)
+	except (TypeError, ValueError):
+		return None
+	return fps if fps in settings.MOTION_LEVELS_OF_DETAIL else None
+
+
+def preferred_motion_fps(request):
+	return parse_motion_fps(request.COOKIES.get(MOTION_FPS_COOKIE))
+
+
+def motion_file_url(motion_file, fps=None):
+	url = reverse('dataset:motion', args=[motion_file.filename])
+	if fps is not None and motion_file.filename.endswith(MOTION_EXTENSION):
+		url += '?fps={}'.format(fps)
+	return url
+
+
+def progress_context(user):
+	user_count_annotations = UserAnnotationCount.count_for_user(user)
+	user_rank = UserAnnotationCount.rank_for_count(user_count_annotations)
+	snapshot = Statistics.get()
+	lower_threshold, upper_threshold, name, klass = level_for_number_of_annotations(user_count_annotations)
+
+	context = {}
+	context['level_class'] = klass
+	context['level_progress'] = int(round(float(user_count_annotations - lower_threshold) / float(upper_threshold - lower_threshold + 1) * 100.))
+	context['level_name'] = name
+	context['user_count_annotations'] = user_count_annotations
+	context['total_count_motions'] = snapshot.total_motions
+	context['user_rank'] = user_rank
+	context['total_count_users'] = snapshot.total_users
+	context['overall_mean_perplexity'] = snapshot.mean_perplexity()
+	return context
+
+
 def index(request):
 	if not request.user.is_authenticated():
-		return render(request, 'dataset/welcome.html', {})
+		context = {'welcome_motion_url': reverse('dataset:motion', args=[settings.WELCOME_MOTION_FILENAME])}
+		return render(request, 'dataset/welcome.html', context)
 
 	context = {}
-	if 'motion_file_id' in request.POST:
-		motion_file = get_object_or_404(MotionFile, pk=request.POST['motion_file_id'])
-		description = request.POST['description'].strip()
-		start_time = float(request.POST['start_time'])
-		duration = int(time.time() - start_time)
-		annotation = Annotation(user=request.user, motion_file=motion_file, description=description, duration=duration)
-		annotation.accept_language = request.META.get('HTTP_ACCEPT_LANGUAGE')
-		annotation.ip_address = get_ip(request)
+	if request.method == 'POST':
+		form = parse_annotation_form(request)
+		if form is None:
+			messages.error(request, MALFORMED_ANNOTATION_MESSAGE)
+			return redirect('dataset:index')
+		motion_file, description, start_time = form
+		if is_annotated_by(request.user, motion_file):
+			messages.success(request, random.choice(MOTIVATIONAL_MESSAGES))
+			return redirect('dataset:index')
+		annotation = create_annotation(request, motion_file, description, start_time)
 		if annotation.is_valid():
-			# Update motion file and save annotation.
-			motion_file.mean_perplexity = 0.  # reset mean perplexity until it is re-computed
-			with transaction.atomic():
-				motion_file.save()
-				annotation.save()
+			save_annotation(motion_file, annotation)
 			messages.success(request, random.choice(MOTIVATIONAL_MESSAGES))
 			return redirect('dataset:index')
 		
 		# Annotation is invalid, prepare context.
-		problem_url = '&#109;&#097;&#105;&#108;&#116;&#111;:&#109;&#097;&#116;&#116;&#104;&#105;&#097;&#115;&#046;&#112;&#108;&#097;&#112;&#112;&#101;&#114;&#116;&#064;&#115;&#116;&#117;&#100;&#101;&#110;&#116;&#046;&#107;&#105;&#116;&#046;&#101;&#100;&#117;?subject=Problem%20with%20motion%20{}'.format(motion_file.id)
-		skip_url = '{}?skip={}'.format(reverse('dataset:index'), motion_file.id)
-		messages.error(request, 'We think that your description of this motion is not a single, complete sentence in English. Please try again. You can also <a href="{}" class="alert-link">report a problem</a> or <a href="{}" class="alert-link">skip this motion</a>.'.format(problem_url, skip_url))
+		messages.error(request, invalid_annotation_message(motion_file))
 		context['motion_file'] = motion_file
 		context['description'] = description
 		context['invalid'] = True
@@ -90,98 +211,142 @@ def index(request):
 		except:
 			pass
 
-		# Get all annotations that haven't been annotated yet.
-		q = MotionFile.objects.exclude(annotation__user=request.user)  # get all MotionFiles that haven't been annotated by the user
-		q = q.annotate(annotation_count=Count('annotation__id'))  # annotate each motion file with the number of annotations
-		q = q.filter(is_hidden=False, is_broken_reported=False, is_broken_confirmed=False, annotation_count=0)
-		values = q.values('id')
-		ids = [v['id'] for v in values if v['id'] != skip_id]
+		prefetched_motion_file_id = request.session.get(NEXT_MOTION_FILE_SESSION_KEY)
+		motion_file, next_motion_file = assign_motion_file(request, skip_id)
+		if motion_file is None:
+			return render(request, 'dataset/all_done.html', {})
+		# The previous page has downloaded this motion into the browser cache already, so the viewer should load it
+		# from there instead of streaming it.
+		context['motion_file_prefetched'] = motion_file.id == prefetched_motion_file_id
+		if next_motion_file is not None:
+			context['next_motion_file_url'] = motion_file_url(next_motion_file, preferred_motion_fps(request))
 
-		if len(ids) > 0:
-			# There are still un-annotated motions, select uniformly from them.
-			selected_id = np.random.choice(ids)
-		else:
-			# All motions have been annotated, use perplexity-based sampling.
-			q = MotionFile.objects.exclude(annotation__user=request.user)  # get all MotionFiles that haven't been annotated by the user
-			q = q.filter(is_hidden=False, is_broken_reported=False, is_broken_confirmed=False)
-			values = q.values('id', 'mean_perplexity')
-			ids = [v['id'] for v in values if v['id'] != skip_id]
-			perplexities = np.array([v['mean_perplexity'] for v in values if v['id'] != skip_id])
-			assert len(ids) == len(perplexities)
-
-			if len(ids) == 0:
-				# Nothing more to annotate.
-				return render(request, 'dataset/all_done.html', {})
-
-			# Select randomly.
-			probabilities = perplexities / np.sum(perplexities)
-			assert np.allclose(np.sum(probabilities), 1.)
-			selected_id = np.random.choice(ids, p=probabilities)
-		assert selected_id != skip_id
-		motion_file = MotionFile.objects.get(id=selected_id)
-
-		motion_file.annotation_count = motion_file.annotation_set.count()
-		context['overall_mean_perplexity'] = MotionFile.objects.all().aggregate(Avg('mean_perplexity'))['mean_perplexity__avg']
 		context['motion_file'] = motion_file
 		context['invalid'] = False
 		context['start_time'] = time.time()
 
 	# Fetch stats.
-	users = User.objects.annotate(annotation_count=Count('annotation__id')).order_by('-annotation_count').all()
-	all_user_ids = [user.id for user in users]
-	all_annotation_counts = [user.annotation_count for user in users]
-	ranked_user_idx = all_user_ids.index(request.user.id)
-	user_count_annotations = all_annotation_counts[ranked_user_idx]
-	total_count_motions = MotionFile.objects.filter(is_hidden=False).count()
-	percentage_complete = float(user_count_annotations) / float(total_count_motions)
-	lower_threshold, upper_threshold, name, klass = level_for_number_of_annotations(user_count_annotations)
-
-	context['level_class'] = klass
-	context['level_progress'] = int(round(float(user_count_annotations - lower_threshold) / float(upper_threshold - lower_threshold + 1) * 100.))
-	context['level_name'] = name
-	context['user_count_annotations'] = user_count_annotations
-	context['total_count_motions'] = total_count_motions
-	context['user_rank'] = ranked_user_idx + 1
-	context['total_count_users'] = len(users)
+	context.update(progress_context(request.user))
 
 	# Render result.
-	context['motion_file_url'] = static('motions/' + context['motion_file'].filename)
+	context['motion_file_url'] = motion_file_url(context['motion_file'], preferred_motion_fps(request))
 	return render(request, 'dataset/annotate.html', context)
 
 
+@require_POST
+def annotate(request):
+	# Same as submitting the annotation form, but responds with the next motion instead of a new page so that the
+	# viewer does not have to be set up again.
+	if not request.user.is_authenticated():
+		return JsonResponse({'error': 'You are not signed in.'}, status=403)
+
+	form = parse_annotation_form(request)
+	if form is None:
+		return JsonResponse({'error': MALFORMED_ANNOTATION_MESSAGE}, status=400)
+	motion_file, description, start_time = form
+	# An annotation that has been saved already is answered like a new one, with the next motion.
+	if not is_annotated_by(request.user, motion_file):
+		annotation = create_annotation(request, motion_file, description, start_time)
+		if not annotation.is_valid():
+			return JsonResponse({'valid': False, 'message': invalid_annotation_message(motion_file)})
+		save_annotation(motion_file, annotation)
+
+	motion_file, next_motion_file = assign_motion_file(request)
+	if motion_file is None:
+		return JsonResponse({'valid': True, 'all_done': True})
+	progress = progress_context(request.user)
+	response = {
+		'valid': True,
+		'all_done': False,
+		'message': random.choice(MOTIVATIONAL_MESSAGES),
+		'motion_file_id': motion_file.id,
+		'motion_file_url': motion_file_url(motion_file, preferred_motion_fps(request)),
+		'next_motion_file_url': motion_file_url(next_motion_file, preferred_motion_fps(request)) if next_motion_file is not None else None,
+		'start_time': time.time(),
+		'user_count_annotations': progress['user_count_annotations'],
+		'user_rank': progress['user_rank'],
+		'total_count_users': progress['total_count_users'],
+		'progress_html': render_to_string('dataset/progress.html', progress, request=request),
+	}
+	return JsonResponse(response)
+
+
+def parse_leaderboard_cursor(value):
+	# Cursors have the form "<annotation_count>.<user_id>" and point at the last entry of the previous page.
+	try:
+		annotation_count, user_id = [int(x) for x in value.split('.')]
+	except:
+		return None
+	return annotation_count, user_id
+
+
+def leaderboard_context(total_motions, after=None):
+	page_size = settings.LEADERBOARD_PAGE_SIZE
+	q = UserAnnotationCount.objects.select_related('user').order_by('-annotation_count', 'user_id')
+	if after is not None:
+		annotation_count, user_id = after
+		q = q.filter(Q(annotation_count__lt=annotation_count) | Q(annotation_count=annotation_count, user_id__gt=user_id))
+	entries = list(q[:page_size + 1])
+	has_next = len(entries) > page_size
+	entries = entries[:page_size]
+	if len(entries) == 0:
+		return {'leaderboard': [], 'next_cursor': None}
+
+	# Users with the same number of annotations share the same rank. Compute the rank and the position of the first
+	# entry, the rest of the page follows from there.
+	top = UserAnnotationCount.objects.order_by('-annotation_count').first()
+	max_annotation_count = max(1, top.annotation_count)
+	first = entries[0]
+	rank = UserAnnotationCount.rank_for_count(first.annotation_count)
+	position = rank + UserAnnotationCount.objects.filter(annotation_count=first.annotation_count, user_id__lt=first.user_id).count()
+	for idx, entry in enumerate(entries):
+		if idx > 0 and entry.annotation_count != entries[idx - 1].annotation_count:
+			rank = position + idx
+		percentage_complete = float(entry.annotation_count) / float(max(1, total_motions))
+		_, _, name, klass = level_for_number_of_annotations(entry.annotation_count)
+		entry.level_class = klass
+		entry.level_name = name
+		entry.rank = rank
+		entry.progress = float(entry.annotation_count) / float(max_annotation_count) * 100.
+		entry.total_progress = int(round(percentage_complete * 100.))
+
+	last = entries[-1]
+	return {
+		'leaderboard': entries,
+		'next_cursor': '{}.{}'.format(last.annotation_count, last.user_id) if has_next else None,
+	}
+
+
 def stats(request):
 	if not request.user.is_authenticated():
 		return redirect('dataset:sign-in')
 
 	# Fetch stats.
-	users = User.objects.annotate(annotation_count=Count('annotation__id')).order_by('-annotation_count').all()
-	max_annotation_count = users[0].annotation_count
-	total_motions = MotionFile.objects.filter(is_hidden=False, is_broken_reported=False, is_broken_confirmed=False).count()
-	total_annotations = Annotation.objects.filter(motion_file__is_hidden=False, motion_file__is_broken_reported=False, motion_file__is_broken_confirmed=False).count()
-	total_users = len(users)
-	distinct_annotations = Annotation.objects.filter(motion_file__is_hidden=False, motion_file__is_broken_reported=False, motion_file__is_broken_confirmed=False).values('motion_file_id').distinct().count()
-	
-	for idx, user in enumerate(users):
-		percentage_complete = float(user.annotation_count) / float(total_motions)
-		_, _, name, klass = level_for_number_of_annotations(user.annotation_count)
-		user.level_class = klass
-		user.level_name = name
-		user.rank = idx + 1
-		user.progress = float(user.annotation_count) / float(max_annotation_count) * 100.
-		user.total_progress = int(round(percentage_complete * 100.))
-
+	snapshot = Statistics.get()
+	total_motions = max(1, snapshot.total_motions)
 	context = {
-		'users': users,
-		'total_motions': total_motions,
-		'total_annotations': total_annotations,
-		'total_users': total_users,
-		'distinct_annotations': distinct_annotations,
-		'percentage_complete': int(round(float(distinct_annotations) / float(total_motions) * 100.)),
-		'annotations_per_motion': float(total_annotations) / float(total_motions),
+		'total_motions': snapshot.total_motions,
+		'total_annotations': snapshot.total_annotations,
+		'total_users': snapshot.total_users,
+		'distinct_annotations': snapshot.distinct_annotations,
+		'percentage_complete': int(round(float(snapshot.distinct_annotations) / float(total_motions) * 100.)),
+		'annotations_per_motion': float(snapshot.total_annotations) / float(total_motions),
 	}
+	context.update(leaderboard_context(snapshot.total_motions))
 	return render(request, 'dataset/stats.html', context)
 
 
+def leaderboard(request):
+	if not request.user.is_authenticated():
+		return redirect('dataset:sign-in')
+
+	snapshot = Statistics.get()
+	after = parse_leaderboard_cursor(request.GET.get('after', ''))
+	context = leaderboard_context(snapshot.total_motions, after=after)
+	context['is_first_page'] = after is None
+	return render(request, 'dataset/leaderboard.html', context)
+
+
 def logout(request):
 	auth.logout(request)
 	return redirect('dataset:index')
@@ -255,3 +420,134 @@ def download_dataset(request, dataset_id):
 	download.save()
 
 	return redirect('/static/downloads/{}'.format(dataset.filename))
+
+
+MOTION_CONTENT_TYPES = {
+	'.json': 'application/json',
+	'.motion': 'application/octet-stream',
+}
+BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+MOTION_MAX_AGE = 365 * 24 * 60 * 60
+CONTENT_FILENAME_RE = re.compile(r'^[0-9a-f]{40}\.(json|motion)$')
+
+# Results of `is_content_addressed` by path, together with the modification time and size of the file.
+_content_addressed = {}
+
+
+def parse_byte_range(header, size):
+	# Returns the requested range as (start, stop) or None if the whole file should be served, which is also the
+	# case for multiple ranges. Raises ValueError if the range cannot be satisfied.
+	match = BYTE_RANGE_RE.match(header.strip())
+	if match is None:
+		return None
+	first, last = match.groups()
+	if first == '' and last == '':
+		return None
+	if first == '':
+		# Suffix range, i.e. the last bytes of the file.
+		start, stop = max(0, size - int(last)), size
+	else:
+		start = int(first)
+		stop = size if last == '' else min(size, int(last) + 1)
+	if start >= stop:
+		raise ValueError('unsatisfiable range')
+	return start, stop
+
+
+def is_content_addressed(path):
+	# Whether the motion is named after the hash of its content. Motions that have not been renamed yet have names that
+	# look the same, but are derived from their ids in the motion database, so their files can be replaced. Hashing
+	# the file is only repeated if it has changed.
+	filename = os.path.basename(path)
+	if CONTENT_FILENAME_RE.match(filename) is None:
+		return False
+	stat = os.stat(path)
+	cached = _content_addressed.get(path)
+	if cached is None or cached[0] != (stat.st_mtime, stat.st_size):
+		with open(path, 'rb') as f:
+			cached = ((stat.st_mtime, stat.st_size), content_filename(f.read(), os.path.splitext(filename)[1]) == filename)
+		_content_addressed[path] = cached
+	return cached[1]
+
+
+def motion_etag(path, immutable=True):
+	# Every representation of a motion (level of detail, content coding) is a file of its own, so the name of a motion
+	# that is named after its content is a strong validator. Other motions are validated by their modification time
+	# and size, like static files.
+	if immutable:
+		return quote_etag(os.path.basename(path))
+	stat = os.stat(path)
+	return quote_etag('{}-{:x}-{:x}'.format(os.path.basename(path), int(stat.st_mtime), stat.st_size))
+
+
+def is_not_modified(request, path, immutable=True):
+	if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+	if if_none_match is None:
+		return False
+	etags = [quote_etag(etag) for etag in parse_etags(if_none_match)]
+	return if_none_match.strip() == '*' or motion_etag(path, immutable) in etags
+
+
+def patch_motion_caching(response, path, immutable=True, vary=True):
+	# Motions that are named after the hash of their content never change, so browsers and proxies can keep them
+	# forever. All others have to be revalidated.
+	response['ETag'] = motion_etag(path, immutable)
+	if immutable:
+		patch_cache_control(response, public=True, max_age=MOTION_MAX_AGE, immutable=True)
+	else:
+		patch_cache_control(response, public=True, no_cache=True)
+	if vary:
+		patch_vary_headers(response, ['Accept-Encoding'])
+	return response
+
+
+def motion(request, filename):
+	# Serves the precompressed variant of the motion that the client accepts, so that nothing has to be
+	# compressed per request. The viewer streams motions frame block by frame block from `?stream=1`, which is never
+	# compressed: byte ranges then refer to the motion file itself, and caches cannot apply them to a compressed
+	# variant that they have stored for the same URL. Otherwise, ranges are only served for the uncompressed file.
+	path = os.path.join(settings.MOTION_FILES_ROOT, filename)
+	if not os.path.isfile(path):
+		raise Http404
+	# Levels of detail and variants are named after the motion, so they can be cached as long as the motion itself.
+	immutable = is_content_addressed(path)
+	fps = parse_motion_fps(request.GET.get('fps'))
+	if fps is not None and os.path.isfile(level_of_detail_path(path, fps)):
+		# Not every motion has every level of detail, e.g. if its own frame rate is already lower.
+		path = level_of_detail_path(path, fps)
+	content_type = MOTION_CONTENT_TYPES[os.path.splitext(filename)[1]]
+
+	stream = request.GET.get('stream') == '1'
+	if stream:
+		encoding = None
+	else:
+		path, encoding = select_variant(path, request.META.get('HTTP_ACCEPT_ENCODING'))
+	if 'HTTP_RANGE' in request.META and encoding is None:
+		size = os.path.getsize(path)
+		try:
+			byte_range = parse_byte_range(request.META['HTTP_RANGE'], size)
+		except ValueError:
+			response = HttpResponse(status=416)
+			response['Content-Range'] = 'bytes */{}'.format(size)
+			return response
+		if byte_range is not None:
+			if is_not_modified(request, path, immutable):
+				return patch_motion_caching(HttpResponseNotModified(), path, immutable, vary=not stream)
+			start, stop = byte_range
+			with open(path, 'rb') as f:
+				f.seek(start)
+				response = HttpResponse(f.read(stop - start), status=206, content_type=content_type)
+			response['Content-Range'] = 'bytes {}-{}/{}'.format(start, stop - 1, size)
+			response['Content-Length'] = stop - start
+			response['Accept-Ranges'] = 'bytes'
+			return patch_motion_caching(response, path, immutable, vary=not stream)
+
+	if is_not_modified(request, path, immutable):
+		return patch_motion_caching(HttpResponseNotModified(), path, immutable, vary=not stream)
+	response = FileResponse(open(path, 'rb'), content_type=content_type)
+	response['Content-Length'] = os.path.getsize(path)
+	if encoding is not None:
+		response['Content-Encoding'] = encoding
+	else:
+		response['Accept-Ranges'] = 'bytes'
+	return patch_motion_caching(response, path, immutable, vary=not stream)
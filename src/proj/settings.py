@@ -153,6 +153,48 @@ LOGGING = {
     },
 }
 
+# Initialize the dictionary, the motion sampler, etc. when the WSGI application is loaded instead of on first
+# use. Enable this if your server loads the application before forking its workers (e.g. gunicorn --preload).
+PRELOAD_ON_STARTUP = False
+
+# Spell checking of annotations. Once the word index has been created with `python manage.py builddictionary`, use
+# `dataset.dictionary.WordIndexDictionary` (with the option `path` set to `ANNOTATION_WORD_INDEX_PATH`) instead of
+# enchant, so that the words are memory-mapped and shared by all worker processes.
+ANNOTATION_DICTIONARY = {
+    'BACKEND': 'dataset.dictionary.EnchantDictionary',
+    'OPTIONS': {
+        'tag': 'en_US',
+    },
+}
+ANNOTATION_WORD_INDEX_PATH = os.path.join(BASE_DIR, '..', 'dictionaries', 'en_US.words')
+
+# Motion sampling
+MOTION_SAMPLER_MAX_AGE = 300  # in seconds, rebuild the in-memory sampler afterwards to pick up changes from other processes
+MOTION_SAMPLER_USER_CACHE_SIZE = 1000  # number of users whose annotated motions are kept in memory
+MOTION_LEASE_DURATION = 600  # in seconds, other users are not assigned a motion that is leased by someone else
+
+# Motion files are served by `dataset.views.motion` from this directory, which also contains their precompressed
+# variants (see `python manage.py compressmotions`). All commands that import, convert, rename or remove motions
+# write to it.
+MOTION_FILES_ROOT = os.path.join(BASE_DIR, 'dataset', 'static', 'motions')
+MOTION_LEVELS_OF_DETAIL = [30, 15]  # frame rates of the reduced versions that are created for every motion
+# Motion that is shown on the welcome page. `renamemotions` leaves it alone so that it keeps this name and
+# `convertmotions --delete-json` keeps its JSON file.
+WELCOME_MOTION_FILENAME = '0059ac190ecdcf04e0700e9c9827bf3e917bbddd.json'
+
+# Raw C3D and MMM files from the motion database are cached in this directory by `importmotions` and `exportdataset`,
+# so that they are only downloaded again if they have changed. Set the size to 0 to disable the cache.
+MOTION_DB_CACHE_ROOT = os.path.join(BASE_DIR, '..', 'cache', 'motiondb')
+MOTION_DB_CACHE_MAX_SIZE = 20 * 1024 ** 3  # in bytes, least recently used files are removed beyond this size
+# Results of metadata calls, e.g. the list of motions, are cached as well. Files are always fetched from the database,
+# because their visibility can change. Pass `--refresh-metadata` to a command to discard the cached results earlier or
+# set the age to 0 to disable the cache.
+MOTION_DB_METADATA_CACHE_PATH = os.path.join(BASE_DIR, '..', 'cache', 'motiondb-metadata.sqlite3')
+MOTION_DB_METADATA_MAX_AGE = 24 * 60 * 60  # in seconds
+
+# Statistics
+LEADERBOARD_PAGE_SIZE = 50
+
 # SRILM
 if platform.platform().startswith('Darwin'):
     SRILM_ROOT_PATH = '/Users/matze/Studium/Faecher/PdF/srilm'
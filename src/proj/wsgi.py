@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "proj.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings
+if settings.PRELOAD_ON_STARTUP:
+    from dataset.preload import preload
+    preload()